@@ -11,6 +11,7 @@
     'data': [
         # Data
         'data/ir_sequence_data.xml',
+        'data/ir_cron_data.xml',
         # Security
         'security/security.xml',
         'security/ir.model.access.csv',
@@ -21,9 +22,19 @@
         'views/account_payment_view_inherit_withdrawal.xml',
         'views/contributions_manager_dashboard_view.xml',
         'views/contributions_partner_contribution_popup_form.xml',
+        'views/contributions_manager_interest_simulation_view.xml',
         'views/contributions_manager_contribution_types_view.xml',
         'views/contributions_manager_contributions_view.xml',
         'views/contributions_manager_withdrawals_view.xml',
+        'views/contributions_manager_interest_view.xml',
+        'views/contributions_manager_import_view.xml',
+        'views/contributions_manager_statement_report.xml',
+        'views/contributions_manager_statement_view.xml',
+        'views/contributions_manager_reconciliation_view.xml',
+        'views/contributions_manager_registration_queue_view.xml',
+        'views/contributions_manager_period_close_view.xml',
+        'views/contributions_manager_standing_order_view.xml',
+        'views/contributions_manager_perf_stats_view.xml',
         'views/contributions_manager_menu.xml',
 
     ],
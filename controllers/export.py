@@ -0,0 +1,147 @@
+import csv
+import datetime
+import io
+import json
+
+from werkzeug.exceptions import BadRequest, NotFound
+
+from odoo import http
+from odoo.http import request
+from odoo.tools import SQL
+
+EXPORT_FETCH_SIZE = 2000
+# write_date is the start time of the writing transaction, so a row committed late can carry a write_date older
+# than rows already exported. Only rows older than this lag are served, so a cursor never passes a row that is
+# still uncommitted; transactions running longer than the lag are not covered.
+EXPORT_SAFETY_LAG = datetime.timedelta(minutes=5)
+
+# dataset: (model, select list, FROM clause); every query exposes t.write_date and t.id for the keyset.
+EXPORT_DATASETS = {
+    'contributions': ('contributions.manager.contribution', """
+        t.id, t.reference, t.partner_id, p.vat AS partner_vat, t.contribution_type_id, t.company_id,
+        t.amount, t.date, t.contribution_status AS status, t.move_id, t.external_key, t.write_date
+    """, "contributions_manager_contribution t LEFT JOIN res_partner p ON p.id = t.partner_id"),
+    'withdrawals': ('contributions.manager.withdrawal', """
+        t.id, t.reference, t.partner_id, p.vat AS partner_vat, t.contribution_type_id, t.company_id,
+        t.amount, t.date, t.withdrawal_status AS status, t.internal_use, t.move_id, t.external_key, t.write_date
+    """, "contributions_manager_withdrawal t LEFT JOIN res_partner p ON p.id = t.partner_id"),
+    'balances': ('contributions.manager.partner.contribution', """
+        t.id, t.partner_id, p.vat AS partner_vat, t.contribution_type_id, t.company_id,
+        t.current_amount, t.enabled, t.write_date
+    """, "contributions_manager_partner_contribution t LEFT JOIN res_partner p ON p.id = t.partner_id"),
+}
+
+
+class ContributionsExportController(http.Controller):
+    """
+        DOCSTRING: Streaming export of transactions and balances for BI and core-banking extracts.
+        Rows changed after the given cursor are read in (write_date, id) order through a server-side SQL cursor
+        and written to the response as they are fetched, so memory stays flat and every page costs the same
+        index range scan whatever its position. Each row carries the cursor to resume from.
+        Rows written during the last EXPORT_SAFETY_LAG are held back until the next call, and the record rules of
+        the requesting user apply as in any search.
+    """
+
+    @http.route('/tel_capp_csm/export/<string:dataset>', type='http', auth='bearer', methods=['GET'], readonly=True)
+    def export(self, dataset, since=None, format='ndjson', limit=None, company_ids=None, **kwargs):
+        if dataset not in EXPORT_DATASETS:
+            raise NotFound()
+        if format not in ('ndjson', 'csv'):
+            raise BadRequest("format must be 'ndjson' or 'csv'.")
+        model, select, from_clause = EXPORT_DATASETS[dataset]
+        request.env[model].check_access('read')
+
+        allowed_company_ids = request.env.user.company_ids.ids
+        if company_ids:
+            allowed_company_ids = [cid for cid in self._parse_ids(company_ids) if cid in allowed_company_ids]
+        query = SQL(
+            "SELECT %s FROM %s WHERE t.company_id = ANY(%s) AND %s AND %s AND %s ORDER BY t.write_date, t.id %s",
+            SQL(select), SQL(from_clause), allowed_company_ids,
+            self._keyset_condition(since),
+            SQL("t.write_date < (now() AT TIME ZONE 'UTC') - %s", EXPORT_SAFETY_LAG),
+            self._record_rules_condition(model, allowed_company_ids),
+            SQL("LIMIT %s", self._parse_limit(limit)) if limit else SQL(),
+        )
+        mimetype = 'application/x-ndjson' if format == 'ndjson' else 'text/csv'
+        return request.make_response(
+            self._stream(request.env.registry, query, format),
+            headers=[
+                ('Content-Type', f'{mimetype}; charset=utf-8'),
+                ('Content-Disposition', f'attachment; filename="{dataset}.{format}"'),
+                ('Cache-Control', 'no-store'),
+            ],
+        )
+
+    # Helpers
+    def _keyset_condition(self, since):
+        """
+            Cursor format: '<write_date ISO>,<id>', as returned in the cursor column of every exported row.
+        """
+        if not since:
+            return SQL("TRUE")
+        try:
+            write_date, record_id = since.rsplit(',', 1)
+            write_date, record_id = datetime.datetime.fromisoformat(write_date), int(record_id)
+        except ValueError:
+            raise BadRequest("since must be '<write_date>,<id>'.")
+        return SQL("(t.write_date, t.id) > (%s, %s)", write_date, record_id)
+
+    def _record_rules_condition(self, model, company_ids):
+        """
+            The raw query bypasses the ORM, so the ir.rule domains of the user are applied through a search
+            subquery, evaluated for the exported companies.
+        """
+        records = request.env[model].with_context(allowed_company_ids=company_ids, active_test=False)
+        if records.env.su:
+            return SQL("TRUE")
+        return SQL("t.id IN %s", records._search([]).subselect())
+
+    def _parse_limit(self, limit):
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise BadRequest("limit must be an integer.")
+        if limit <= 0:
+            raise BadRequest("limit must be positive.")
+        return limit
+
+    def _parse_ids(self, ids):
+        try:
+            return [int(value) for value in ids.split(',') if value.strip()]
+        except ValueError:
+            raise BadRequest("company_ids must be a comma-separated list of ids.")
+
+    def _stream(self, registry, query, format):
+        """
+            Runs the query on its own cursor (the request cursor is closed once the response starts) through a
+            server-side cursor fetched EXPORT_FETCH_SIZE rows at a time.
+        """
+        with registry.cursor(readonly=True) as cr:
+            cr.execute(SQL("DECLARE csm_export NO SCROLL CURSOR FOR %s", query))
+            columns = None
+            while True:
+                cr.execute(f"FETCH {EXPORT_FETCH_SIZE} FROM csm_export")
+                rows = cr.fetchall()
+                if columns is None:
+                    columns = [column.name for column in cr.description] + ['cursor']
+                    if format == 'csv':
+                        yield self._csv_chunk([columns])
+                if not rows:
+                    break
+                write_date_index = columns.index('write_date')
+                rows = [
+                    (*row, f"{row[write_date_index].isoformat()},{row[0]}")
+                    for row in rows
+                ]
+                if format == 'csv':
+                    yield self._csv_chunk(rows)
+                else:
+                    yield ''.join(
+                        json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + '\n' for row in rows
+                    ).encode()
+            cr.execute("CLOSE csm_export")
+
+    def _csv_chunk(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
@@ -1,6 +1,22 @@
+from . import ir_sequence
+from . import registration_queue
+from . import transaction_posting
+from . import transaction_idempotency
 from . import contributions_configuration
 from . import contributions
 from . import res_partner
 from . import account_journal
 from . import account_payment
 from . import withdrawals
+from . import contributions_interest
+from . import contributions_interest_simulation
+from . import contributions_archive
+from . import contributions_balance
+from . import contributions_report
+from . import contributions_import
+from . import contributions_statement
+from . import contributions_reconciliation
+from . import contributions_period_close
+from . import contributions_standing_order
+from . import contributions_perf_stats
+from . import registration_queue_status
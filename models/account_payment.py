@@ -1,16 +1,28 @@
+from collections import defaultdict
+
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
+from .profiling import profiled
+
 
 class AccountPaymentRegister(models.TransientModel):
     _inherit = 'account.payment.register'
 
     journal_internal_use = fields.Boolean(compute='_compute_journal_internal_use', store=False)
-    internal_withdrawal_id = fields.Many2one(
+    available_internal_withdrawal_ids = fields.Many2many(
         'contributions.manager.withdrawal',
-        string='Retiro Uso Interno',
-        domain="[('internal_use', '=', True), ('internal_used', '=', False), ('withdrawal_status', '=', 'registered'), ('partner_id', '=', partner_id)]",
-        help="Selecciona un retiro marcado como uso interno del cliente."
+        compute='_compute_available_internal_withdrawal_ids',
+        help="Retiros de uso interno pendientes de los clientes de las facturas a pagar."
+    )
+    internal_withdrawal_ids = fields.Many2many(
+        'contributions.manager.withdrawal',
+        string='Retiros Uso Interno',
+        compute='_compute_internal_withdrawal_ids',
+        store=True,
+        readonly=False,
+        domain="[('id', 'in', available_internal_withdrawal_ids)]",
+        help="Retiros marcados como uso interno que se aplicarán a las facturas de cada cliente."
     )
 
     @api.depends('journal_id')
@@ -18,34 +30,159 @@ class AccountPaymentRegister(models.TransientModel):
         for w in self:
             w.journal_internal_use = bool(w.journal_id.internal_use)
 
-    @api.onchange('journal_id')
-    def _onchange_journal_id(self):
-        if self.journal_id and getattr(self.journal_id, 'internal_use', False):
-            return {'domain': {'internal_withdrawal_id': [
-                ('internal_use', '=', True),
-                ('internal_used', '=', False),
-                ('withdrawal_status', '=', 'registered'),
-                ('partner_id', '=', self.partner_id.id),
-            ]}}
-        else:
-            self.internal_withdrawal_id = False
-        return {}
-
-    @api.onchange('internal_withdrawal_id')
-    def _onchange_internal_withdrawal_id(self):
-        if self.internal_withdrawal_id:
-            self.amount = self.internal_withdrawal_id.amount
+    @api.depends('line_ids')
+    def _compute_available_internal_withdrawal_ids(self):
+        """
+            Eligible withdrawals only depend on the invoices being paid, so they are fetched once per wizard
+            with a single query for every partner involved.
+        """
+        partners = self.line_ids.partner_id
+        withdrawals = self.env['contributions.manager.withdrawal'].search([
+            ('internal_use', '=', True),
+            ('internal_used', '=', False),
+            ('withdrawal_status', '=', 'registered'),
+            ('partner_id', 'in', partners.ids),
+            ('company_id', 'in', self.line_ids.company_id.ids),
+        ], order='date, id') if partners else self.env['contributions.manager.withdrawal']
+        by_partner = withdrawals.grouped('partner_id')
+        for w in self:
+            w.available_internal_withdrawal_ids = withdrawals.browse([
+                withdrawal.id
+                for partner in w.line_ids.partner_id
+                for withdrawal in by_partner.get(partner, [])
+                if withdrawal.company_id in w.line_ids.company_id
+            ])
 
-    def _create_payments(self):
-        payments = super()._create_payments()
-        if self.internal_withdrawal_id:
-            payments.write({'internal_withdrawal_id': self.internal_withdrawal_id.id})
-            self.internal_withdrawal_id.mark_as_used(
-                payment=payments,
-                invoice=self.line_ids.move_id if self.line_ids and self.line_ids.move_id else None
+    @api.depends('journal_id', 'available_internal_withdrawal_ids')
+    def _compute_internal_withdrawal_ids(self):
+        """
+            Preselects only the withdrawals the invoices need, see _allocate_internal_withdrawals.
+        """
+        for w in self:
+            if w.journal_internal_use:
+                allocation = w._allocate_internal_withdrawals(w.available_internal_withdrawal_ids)
+                w.internal_withdrawal_ids = w.available_internal_withdrawal_ids.browse(
+                    [withdrawal_id for withdrawal_ids in allocation.values() for withdrawal_id in withdrawal_ids]
+                )
+            else:
+                w.internal_withdrawal_ids = False
+
+    @api.onchange('internal_withdrawal_ids')
+    def _onchange_internal_withdrawal_ids(self):
+        if self.internal_withdrawal_ids and self.can_edit_wizard:
+            allocation = self._allocate_internal_withdrawals(self.internal_withdrawal_ids)
+            self.amount = sum(self.internal_withdrawal_ids.browse(
+                [withdrawal_id for withdrawal_ids in allocation.values() for withdrawal_id in withdrawal_ids]
+            ).mapped('amount'))
+
+    @api.constrains('internal_withdrawal_ids')
+    def _check_internal_withdrawal_ids(self):
+        for w in self:
+            invalid = w.internal_withdrawal_ids - w.available_internal_withdrawal_ids
+            if invalid:
+                raise ValidationError(
+                    f"Los retiros {', '.join(invalid.mapped('reference'))} no están disponibles para los clientes de las facturas seleccionadas."
+                )
+
+    def _allocate_internal_withdrawals(self, withdrawals):
+        """
+            Assigns withdrawals to the invoices of their partner before any payment exists and returns
+            {invoice_id: [withdrawal_id, ...]}. Invoices are taken in date order and each one receives the partner's
+            withdrawals, in date order, until its residual amount is covered (the last one may exceed it, the
+            payment is capped at the residual); the withdrawals left over are not used.
+        """
+        self.ensure_one()
+        residuals = defaultdict(float)
+        invoices_by_partner = defaultdict(list)
+        for line in self.line_ids.sorted(lambda line: (line.move_id.invoice_date or line.date, line.move_id.id)):
+            residuals[line.move_id] += abs(line.amount_residual)
+            if line.move_id not in invoices_by_partner[line.partner_id]:
+                invoices_by_partner[line.partner_id].append(line.move_id)
+
+        allocation = {}
+        for partner, partner_withdrawals in withdrawals.sorted(lambda rec: (rec.date, rec.id)).grouped('partner_id').items():
+            pool = list(partner_withdrawals)
+            for invoice in invoices_by_partner[partner]:
+                currency = invoice.company_id.currency_id
+                remaining = residuals[invoice]
+                while pool and currency.compare_amounts(remaining, 0.0) > 0:
+                    withdrawal = pool.pop(0)
+                    allocation.setdefault(invoice.id, []).append(withdrawal.id)
+                    remaining -= withdrawal.amount
+        return allocation
+
+    def _create_payment_vals_from_wizard(self, batch_result):
+        vals = super()._create_payment_vals_from_wizard(batch_result)
+        funded_amount = self._get_internal_withdrawal_amount(batch_result)
+        if funded_amount is not None:
+            vals['amount'] = min(vals['amount'], funded_amount)
+        return vals
+
+    def _create_payment_vals_from_batch(self, batch_result):
+        """
+            The payment of a batch carries the withdrawals allocated to the invoices of that batch only.
+        """
+        vals = super()._create_payment_vals_from_batch(batch_result)
+        funded_amount = self._get_internal_withdrawal_amount(batch_result)
+        if funded_amount is not None:
+            vals['amount'] = funded_amount
+        return vals
+
+    def _get_internal_withdrawal_amount(self, batch_result):
+        """
+            Returns the amount the withdrawals allocated to the invoices of the batch can pay, capped at the batch
+            residual (the last withdrawal of an invoice may exceed it), or None outside internal-use payments.
+            Raises a ValidationError for a batch without withdrawals: the internal-use journal has no other funds.
+        """
+        allocation = self.env.context.get('internal_withdrawal_allocation')
+        if allocation is None:
+            return None
+        invoices = batch_result['lines'].move_id
+        withdrawal_ids = [withdrawal_id for invoice in invoices for withdrawal_id in allocation.get(invoice.id, [])]
+        if not withdrawal_ids:
+            raise ValidationError(
+                f"Las facturas {', '.join(invoices.mapped('name'))} no tienen retiros de uso interno asignados "
+                "para pagarse con este diario."
             )
+        residual = abs(sum(batch_result['lines'].mapped('amount_residual')))
+        withdrawn = sum(self.env['contributions.manager.withdrawal'].browse(withdrawal_ids).mapped('amount'))
+        return min(withdrawn, residual)
+
+    @profiled('create_payments', count=lambda self: len(self.line_ids.move_id))
+    def _create_payments(self):
+        if not self.internal_withdrawal_ids:
+            return super()._create_payments()
+        allocation = self._allocate_internal_withdrawals(self.internal_withdrawal_ids)
+        return super(AccountPaymentRegister, self.with_context(internal_withdrawal_allocation=allocation))._create_payments()
+
+    def _init_payments(self, to_process, edit_mode=False):
+        payments = super()._init_payments(to_process, edit_mode=edit_mode)
+        allocation = self.env.context.get('internal_withdrawal_allocation')
+        if allocation:
+            self._apply_internal_withdrawals(to_process, allocation)
         return payments
 
+    def _apply_internal_withdrawals(self, to_process, allocation):
+        """
+            Links every allocated withdrawal to the payment created for the batch holding its invoice and marks
+            them all as used in bulk.
+        """
+        Withdrawal = self.env['contributions.manager.withdrawal']
+        allocations = [
+            (withdrawal, vals['payment'], invoice)
+            for vals in to_process
+            for invoice in vals['batch']['lines'].move_id
+            for withdrawal in Withdrawal.browse(allocation.get(invoice.id, []))
+        ]
+        Withdrawal._mark_as_used_batch(allocations)
+
+        withdrawals_by_payment = defaultdict(list)
+        for withdrawal, payment, _invoice in allocations:
+            withdrawals_by_payment[payment].append(withdrawal.id)
+        for payment, withdrawal_ids in withdrawals_by_payment.items():
+            if len(withdrawal_ids) == 1:
+                payment.internal_withdrawal_id = withdrawal_ids[0]
+
 
 class AccountPayment(models.Model):
     _inherit = 'account.payment'
@@ -55,4 +192,11 @@ class AccountPayment(models.Model):
         string='Retiro Uso Interno',
         readonly=True,
         help="Retiro utilizado como fuente del pago."
-    )
\ No newline at end of file
+    )
+    internal_withdrawal_ids = fields.One2many(
+        'contributions.manager.withdrawal',
+        'payment_id',
+        string='Retiros Uso Interno',
+        readonly=True,
+        help="Retiros de uso interno aplicados en este pago."
+    )
@@ -1,6 +1,10 @@
-from odoo import api, fields, models, _
+from collections import defaultdict
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 import logging
+
+from .profiling import profile_stage, profiled
 _logger = logging.getLogger(__name__)
 
 class PartnerContribution(models.Model):
@@ -8,6 +12,8 @@ class PartnerContribution(models.Model):
         DOCSTRING:
         PartnerContribution model responsible for linking partners with their contribution types.
         Tracks contribution type, current amount, and activation status.
+        Confirmed withdrawals not registered yet hold their amount in reserved_amount, so available_amount (current
+        minus reserved) is what new withdrawals can take; both are updated in-database with the balance.
     """
     _name = 'contributions.manager.partner.contribution'
     _description = 'Partner Contributions'
@@ -17,17 +23,45 @@ class PartnerContribution(models.Model):
     partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', required=True, tracking=True, ondelete='restrict')
     contribution_type_id = fields.Many2one('contributions.manager.contribution.type', string='Tipo de Contribución', required=True, tracking=True, ondelete='restrict')
     current_amount = fields.Float(string='Monto Actual', required=True, tracking=True, default=0.0, help="Monto total actualmente acumulado en esta contribución.")
+    reserved_amount = fields.Float(string='Monto Reservado', readonly=True, default=0.0, copy=False, help="Monto de los retiros confirmados pendientes de contabilizar.")
+    available_amount = fields.Float(string='Monto Disponible', compute='_compute_available_amount', store=True, help="Monto actual menos el monto reservado por retiros confirmados.")
     enabled = fields.Boolean(string='Activo', default=True, tracking=True, help="Indica si esta contribución está activa para el cliente.")
     deposit_bank_account = fields.Many2one(string='Cuenta de Banco Deposito de Ahorros', related='contribution_type_id.deposit_bank_account', readonly=True, store=False)
     saving_account = fields.Many2one(string='Cuenta de Ahorro de Cliente', related='contribution_type_id.saving_account', readonly=True, store=False)
     interest_payment_account = fields.Many2one(string='Cuenta Gasto por Intereses Pagados', related='contribution_type_id.interest_payment_account', readonly=True, store=False)
     company_id = fields.Many2one('res.company', string='Empresa', default=lambda self: self.env.company, tracking=True, required=True)
+    last_capitalization_date = fields.Date(string='Última Capitalización', readonly=True, copy=False, help="Fecha en que se capitalizaron intereses por última vez.")
+    interest_line_ids = fields.One2many('contributions.manager.interest.line', 'partner_contribution_id', string='Intereses Capitalizados', readonly=True)
     display_name = fields.Char(string='Nombre para Mostrar', compute='_compute_display_name', store=False)
 
     _sql_constraints = [
         ('unique_contribution_partner_type', 'UNIQUE(partner_id, contribution_type_id, company_id)', 'El socio solo puede asignar este tipo de contribución una vez.'),
     ]
 
+    def _auto_init(self):
+        new_reservations = not tools.column_exists(self.env.cr, self._table, 'reserved_amount')
+        res = super()._auto_init()
+        if new_reservations:
+            # The withdrawal table may not exist yet at this point: reserve once every model is ready.
+            self.pool.post_init(self._rebuild_reservations)
+        return res
+
+    def init(self):
+        # Partner-first lookups are served by the unique constraint index; this one serves type-wide scans
+        # (interest, reports) over enabled rows only.
+        tools.create_index(
+            self.env.cr, 'contributions_manager_partner_contribution_type_company_enabled_idx', self._table,
+            ['contribution_type_id', 'company_id', 'partner_id'], where='enabled'
+        )
+        # Keyset pagination of the export API.
+        tools.create_index(self.env.cr, 'contributions_manager_partner_contribution_write_date_id_idx', self._table, ['write_date', 'id'])
+
+    # Computed Fields
+    @api.depends('current_amount', 'reserved_amount')
+    def _compute_available_amount(self):
+        for record in self:
+            record.available_amount = record.current_amount - record.reserved_amount
+
     # Validations
     @api.constrains('current_amount')
     def _check_non_negative_amount(self):
@@ -45,6 +79,163 @@ class PartnerContribution(models.Model):
                 )
         return super().unlink()
 
+    # Batch helpers
+    @api.model
+    def _get_active_partner_contributions(self, transactions):
+        """
+            Returns a dict mapping (partner_id, contribution_type_id, company_id) to the active
+            partner contribution of every transaction in the given recordset, using a single search.
+        """
+        if not transactions:
+            return {}
+        return self._get_active_partner_contribution_map(
+            transactions.partner_id.ids, transactions.contribution_type_id.ids, transactions.company_id.ids
+        )
+
+    @api.model
+    def _get_active_partner_contribution_map(self, partner_ids, contribution_type_ids, company_ids):
+        partner_contributions = self.search([
+            ('partner_id', 'in', list(partner_ids)),
+            ('contribution_type_id', 'in', list(contribution_type_ids)),
+            ('company_id', 'in', list(company_ids)),
+            ('enabled', '=', True)
+        ])
+        result = {}
+        for pc in partner_contributions:
+            result.setdefault((pc.partner_id.id, pc.contribution_type_id.id, pc.company_id.id), pc)
+        return result
+
+    @api.model
+    def _get_enabled_types_by_partner(self, partner_ids, withdrawal_only=False):
+        """
+            Returns {partner_id: [contribution_type_id, ...]} of the enabled partner contributions of the
+            given partners, grouped in a single query.
+        """
+        if not partner_ids:
+            return {}
+        domain = [('partner_id', 'in', list(partner_ids)), ('enabled', '=', True)]
+        if withdrawal_only:
+            domain.append(('contribution_type_id.allow_withdrawal', '=', True))
+        return {
+            partner.id: type_ids
+            for partner, type_ids in self._read_group(domain, ['partner_id'], ['contribution_type_id:array_agg'])
+        }
+
+    @api.model
+    @profiled('balances', count=lambda self, movements, *args, **kwargs: len(movements))
+    def _apply_balance_deltas(self, movements, flow=None):
+        """
+            Applies signed balance movements given as [(partner_contribution_id, date, amount), ...] to
+            current_amount, the daily balance ledger, the monthly report and the savings totals of the partners,
+            where flow ('contribution' or 'withdrawal') says which year-to-date total they count in.
+            The increment is done in-database, so concurrent registrations never lose updates, and rows
+            are locked in id order, so concurrent batches touching several rows cannot deadlock.
+            Raises a ValidationError if any resulting available balance (current minus reserved) would be negative.
+            Outside bulk mode the change of current_amount is tracked as if it had been written by the ORM.
+        """
+        deltas = defaultdict(float)
+        for partner_contribution_id, _date, amount in movements:
+            deltas[partner_contribution_id] += amount
+        ids = sorted(pc_id for pc_id, delta in deltas.items() if delta)
+        if not ids:
+            return
+        self.flush_model(['current_amount'])
+        self.env.cr.execute(f"""
+            SELECT id FROM {self._table} WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE
+        """, [ids])
+        if not self.env.context.get('contributions_bulk_mode'):
+            self.browse(ids)._track_prepare(['current_amount'])
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS pc
+               SET current_amount = pc.current_amount + v.delta,
+                   available_amount = pc.available_amount + v.delta,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::float8[]) AS v(id, delta)
+             WHERE pc.id = v.id
+               AND ROUND((pc.available_amount + v.delta)::numeric, 2) >= 0
+         RETURNING pc.id
+        """, [self.env.uid, ids, [deltas[pc_id] for pc_id in ids]])
+        updated_ids = {row[0] for row in self.env.cr.fetchall()}
+        partner_contributions = self.browse(ids)
+        partner_contributions.invalidate_recordset(['current_amount', 'available_amount', 'write_uid', 'write_date'])
+        if len(updated_ids) != len(ids):
+            failing = partner_contributions.filtered(lambda pc: pc.id not in updated_ids)
+            raise ValidationError(
+                "Saldo insuficiente. El monto actual no puede ser negativo en: "
+                + ", ".join(f"{pc.partner_id.name} - {pc.contribution_type_id.contribution_name}" for pc in failing)
+            )
+        self.env['contributions.manager.balance.snapshot']._record_movements(movements)
+        self.env['contributions.manager.report.monthly']._record_movements(movements, flow)
+        self.env['res.partner']._record_savings_movements(movements, flow)
+
+    @api.model
+    def _apply_reservation_deltas(self, deltas):
+        """
+            Adds {partner_contribution_id: amount} to reserved_amount (negative amounts release reservations) with
+            one guarded UPDATE, locking the rows in id order like _apply_balance_deltas.
+            Raises a ValidationError if a reservation exceeds the available amount or a release exceeds the
+            reserved amount.
+        """
+        ids = sorted(pc_id for pc_id, amount in deltas.items() if amount)
+        if not ids:
+            return
+        self.flush_model(['current_amount', 'reserved_amount', 'available_amount'])
+        self.env.cr.execute(f"""
+            SELECT id FROM {self._table} WHERE id = ANY(%s) ORDER BY id FOR NO KEY UPDATE
+        """, [ids])
+        # GREATEST only absorbs float residue: the guard rejects any release larger than the reservation.
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS pc
+               SET reserved_amount = GREATEST(pc.reserved_amount + v.amount, 0.0),
+                   available_amount = pc.current_amount - GREATEST(pc.reserved_amount + v.amount, 0.0)
+              FROM unnest(%s::int[], %s::float8[]) AS v(id, amount)
+             WHERE pc.id = v.id
+               AND CASE WHEN v.amount < 0 THEN ROUND((pc.reserved_amount + v.amount)::numeric, 2) >= 0
+                        ELSE ROUND((pc.available_amount - v.amount)::numeric, 2) >= 0
+                   END
+         RETURNING pc.id
+        """, [ids, [deltas[pc_id] for pc_id in ids]])
+        updated_ids = {row[0] for row in self.env.cr.fetchall()}
+        partner_contributions = self.browse(ids)
+        partner_contributions.invalidate_recordset(['reserved_amount', 'available_amount'])
+        if len(updated_ids) != len(ids):
+            failing = partner_contributions.filtered(lambda pc: pc.id not in updated_ids)
+            over_released = failing.filtered(lambda pc: deltas[pc.id] < 0)
+            if over_released:
+                raise ValidationError(
+                    "La liberación supera el monto reservado en: "
+                    + ", ".join(f"{pc.partner_id.name} - {pc.contribution_type_id.contribution_name} ({pc.reserved_amount:.2f})" for pc in over_released)
+                )
+            raise ValidationError(
+                "Saldo disponible insuficiente para reservar los retiros en: "
+                + ", ".join(f"{pc.partner_id.name} - {pc.contribution_type_id.contribution_name} ({pc.available_amount:.2f})" for pc in failing)
+            )
+
+    @api.model
+    def _rebuild_reservations(self):
+        """
+            Recomputes reserved_amount and available_amount of every partner contribution from the confirmed
+            withdrawals in a single statement.
+        """
+        self.env['contributions.manager.withdrawal'].flush_model()
+        self.flush_model()
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS pc
+               SET reserved_amount = COALESCE(r.amount, 0.0),
+                   available_amount = pc.current_amount - COALESCE(r.amount, 0.0)
+              FROM {self._table} AS pc2
+              LEFT JOIN (SELECT partner_id, contribution_type_id, company_id, SUM(amount) AS amount
+                           FROM contributions_manager_withdrawal
+                          WHERE withdrawal_status = 'confirmed'
+                          GROUP BY partner_id, contribution_type_id, company_id) AS r
+                ON r.partner_id = pc2.partner_id
+               AND r.contribution_type_id = pc2.contribution_type_id
+               AND r.company_id = pc2.company_id
+             WHERE pc.id = pc2.id
+        """)
+        self.invalidate_model(['reserved_amount', 'available_amount'])
+
     # Methods
     def action_save_popup(self):
         self.ensure_one()
@@ -103,8 +294,14 @@ class Contribution(models.Model):
     """
     _name = 'contributions.manager.contribution'
     _description = 'Partner Contribution Transactions'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'contributions.manager.registration.queue.mixin',
+                'contributions.manager.idempotency.mixin',
+                'contributions.manager.transaction.posting.mixin']
     _rec_name = 'display_name'
+    _registration_status_field = 'contribution_status'
+    _posting_label = 'Aportación'
+    _saving_side = 'credit'
+    _balance_sign = 1
 
     reference = fields.Char(string='Referencia', readonly=True, copy=False, default=lambda self: _('New'), tracking=True)
     partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', required=True, tracking=True)
@@ -115,9 +312,10 @@ class Contribution(models.Model):
     contribution_status = fields.Selection([
         ('draft', 'Borrador'),
         ('confirmed', 'Confirmado'),
-        ('registered', 'Contabilizado')
+        ('registered', 'Contabilizado'),
+        ('reversed', 'Reversado'),
     ], string='Estado', required=True, default='draft', readonly=True, tracking=True)
-    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, copy=False)
+    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, copy=False, index='btree_not_null')
     display_name = fields.Char(string='Nombre para Mostrar', compute='_compute_display_name', store=False)
 
     allowed_contribution_type_ids = fields.Many2many(
@@ -127,15 +325,36 @@ class Contribution(models.Model):
         store=False
     )
 
+    def init(self):
+        super().init()
+        tools.create_index(
+            self.env.cr, 'contributions_manager_contribution_partner_type_status_date_idx', self._table,
+            ['partner_id', 'contribution_type_id', 'contribution_status', 'date']
+        )
+        tools.create_index(
+            self.env.cr, 'contributions_manager_contribution_type_company_date_registered_idx', self._table,
+            ['contribution_type_id', 'company_id', 'date'], where="contribution_status = 'registered'"
+        )
+        # Keyset pagination of the export API.
+        tools.create_index(self.env.cr, 'contributions_manager_contribution_write_date_id_idx', self._table, ['write_date', 'id'])
+
     # Overrides
-    @api.model
-    def create(self, vals):
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('contributions.manager.contribution') or _('New')
-        return super(Contribution, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        pending = [vals for vals in vals_list if vals.get('reference', _('New')) == _('New')]
+        if pending:
+            references = self.env['ir.sequence']._next_by_code_batch('contributions.manager.contribution', len(pending))
+            for vals, reference in zip(pending, references):
+                vals['reference'] = reference or _('New')
+        return super(Contribution, self).create(vals_list)
+
+    def _track_finalize(self):
+        tracked = self.env.cr.precommit.data.get(f'mail.tracking.{self._name}', {})
+        with profile_stage(self, 'tracking', len(tracked)):
+            return super()._track_finalize()
 
     def unlink(self):
-        raise ValidationError("No se puede eliminar una aportación registrada. Contacte a administración para reversas.")
+        raise ValidationError("No se puede eliminar una aportación. Utilice la reversión para anular aportaciones contabilizadas.")
 
     # Computed Fields
     @api.depends('partner_id', 'contribution_type_id', 'amount')
@@ -147,79 +366,90 @@ class Contribution(models.Model):
 
     # Validations
     @api.constrains('partner_id', 'contribution_type_id', 'amount')
+    @profiled('constraints')
     def _check_partner_contribution_validity(self):
-        for rec in self:
-            if rec.contribution_status in ('confirmed', 'registered'):
-                continue
+        to_check = self.filtered(lambda rec: rec.contribution_status not in ('confirmed', 'registered'))
+        for rec in to_check:
             if rec.amount <= 0:
                 raise ValidationError("El monto de la aportación debe ser mayor que 0.")
 
-            partner_contribution = self.env['contributions.manager.partner.contribution'].search([
-                ('partner_id', '=', rec.partner_id.id),
-                ('contribution_type_id', '=', rec.contribution_type_id.id),
-                ('company_id', '=', rec.company_id.id),
-                ('enabled', '=', True)
-            ], limit=1)
-
-            if not partner_contribution:
+        partner_contributions = self.env['contributions.manager.partner.contribution']._get_active_partner_contributions(to_check)
+        for rec in to_check:
+            if (rec.partner_id.id, rec.contribution_type_id.id, rec.company_id.id) not in partner_contributions:
                 raise ValidationError(
                     "Este asociado no tiene asignado este tipo de contribución activa. "
                     "No se puede registrar esta aportación."
                 )
 
     # State Change Methods
+    @profiled('confirm')
     def action_confirm(self):
         for rec in self:
             if rec.amount <= 0:
                 raise ValidationError("El monto de la aportación debe ser mayor que 0.")
             if rec.contribution_status != 'draft':
                 raise ValidationError("Solo se pueden confirmar aportaciones en estado borrador.")
-            rec.write({'contribution_status': 'confirmed'})
+        records = self._bulk_records()
+        records.write({'contribution_status': 'confirmed'})
+        records._post_bulk_summary("Confirmación")
 
+    @profiled('register')
     def action_register(self):
         for rec in self:
             if rec.contribution_status != 'confirmed':
                 raise ValidationError("Solo se pueden contabilizar aportaciones confirmadas.")
             if rec.move_id:
                 raise ValidationError("Esta aportación ya fue contabilizada.")
-            move = rec._create_accounting_move()
-            partner_contribution = self.env['contributions.manager.partner.contribution'].search([
-                ('partner_id', '=', rec.partner_id.id),
-                ('contribution_type_id', '=', rec.contribution_type_id.id),
-                ('company_id', '=', rec.company_id.id),
-                ('enabled', '=', True)
-            ], limit=1)
+        if not self:
+            return
+        self = self._bulk_records()
+        partner_contributions = self.env['contributions.manager.partner.contribution']._get_active_partner_contributions(self)
+        movements = []
+        for rec in self:
+            partner_contribution = partner_contributions.get((rec.partner_id.id, rec.contribution_type_id.id, rec.company_id.id))
             if not partner_contribution:
                 raise ValidationError(
                     "No se encontró la relación activa entre el asociado y el tipo de contribución."
                 )
-            partner_contribution.current_amount += rec.amount
-            rec.write({
-                'move_id': move.id,
-                'contribution_status': 'registered'
-            })
+            movements.append((partner_contribution.id, rec.date, rec.amount))
+        moves, lines = self._create_accounting_moves()
+        self._set_move_links(moves, lines)
+        self.env['contributions.manager.partner.contribution']._apply_balance_deltas(movements, flow='contribution')
+        self.write({'contribution_status': 'registered'})
+        self._post_bulk_summary("Contabilización")
+
+    def action_reverse(self):
+        self._bulk_records()._reverse_transactions()
 
     # Internal methods
     def _create_accounting_move(self):
         self.ensure_one()
-        contrib_type = self.contribution_type_id
+        return self._create_accounting_moves()[0]
+
+    def _create_accounting_moves(self):
+        """
+            Creates and posts the accounting moves of the whole recordset at once.
+            Returns (moves, lines) in the same order as the records, see _post_accounting_moves.
+        """
+        for contrib_type in self.contribution_type_id:
+            if not contrib_type.journal:
+                raise ValidationError("No se ha definido un diario contable para este tipo de contribución.")
+            if not contrib_type.deposit_bank_account or not contrib_type.saving_account:
+                raise ValidationError(
+                    "Las cuentas contables no están configuradas correctamente en el tipo de contribución."
+                )
 
-        journal = contrib_type.journal
-        if not journal:
-            raise ValidationError("No se ha definido un diario contable para este tipo de contribución.")
+        return self._post_accounting_moves()
 
+    def _prepare_accounting_move_vals(self):
+        self.ensure_one()
+        contrib_type = self.contribution_type_id
         debit_account = contrib_type.deposit_bank_account
         credit_account = contrib_type.saving_account
-
-        if not debit_account or not credit_account:
-            raise ValidationError(
-                "Las cuentas contables no están configuradas correctamente en el tipo de contribución."
-            )
-
-        move_vals = {
+        return {
             'ref': self.reference,
             'date': self.date,
-            'journal_id': journal.id,
+            'journal_id': contrib_type.journal.id,
             'company_id': self.company_id.id,
             'line_ids': [
                 (0, 0, {
@@ -238,19 +468,12 @@ class Contribution(models.Model):
                 })
             ]
         }
-        move = self.env['account.move'].create(move_vals)
-        move.action_post()
-        return move
 
     # UI Changes
     @api.depends('partner_id')
+    @profiled('allowed_types')
     def _compute_allowed_contribution_types(self):
+        types_by_partner = self.env['contributions.manager.partner.contribution']._get_enabled_types_by_partner(self.partner_id.ids)
+        ContributionType = self.env['contributions.manager.contribution.type']
         for rec in self:
-            if rec.partner_id:
-                allowed_types = self.env['contributions.manager.partner.contribution'].search([
-                    ('partner_id', '=', rec.partner_id.id),
-                    ('enabled', '=', True)
-                ]).mapped('contribution_type_id')
-                rec.allowed_contribution_type_ids = allowed_types
-            else:
-                rec.allowed_contribution_type_ids = [(5, 0, 0)]
+            rec.allowed_contribution_type_ids = ContributionType.browse(types_by_partner.get(rec.partner_id.id, []))
@@ -0,0 +1,57 @@
+from odoo import fields, models, tools
+from odoo.exceptions import ValidationError
+
+
+class ArchivedTransactionMixin(models.AbstractModel):
+    """
+        DOCSTRING: Read-only copy of a registered transaction moved out of the active tables by a period close.
+    """
+    _name = 'contributions.manager.archived.transaction.mixin'
+    _description = 'Archived Transaction'
+    _inherit = ['mail.thread']
+    _order = 'date desc, id desc'
+    _rec_name = 'reference'
+
+    original_id = fields.Integer(string='ID Original', readonly=True, index=True)
+    reference = fields.Char(string='Referencia', readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', readonly=True, ondelete='restrict')
+    contribution_type_id = fields.Many2one('contributions.manager.contribution.type', string='Tipo de Contribución', readonly=True, ondelete='restrict')
+    company_id = fields.Many2one('res.company', string='Empresa', readonly=True)
+    amount = fields.Float(string='Monto', readonly=True)
+    date = fields.Date(string='Fecha', readonly=True)
+    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, index='btree_not_null')
+    move_line_id = fields.Many2one('account.move.line', string='Apunte Contable', readonly=True)
+    period_close_id = fields.Many2one('contributions.manager.period.close', string='Cierre', readonly=True, ondelete='restrict', index=True)
+    external_key = fields.Char(string='Clave Externa', readonly=True)
+
+    def init(self):
+        super().init()
+        if self._abstract:
+            return
+        tools.create_index(
+            self.env.cr, f'{self._table}_partner_type_date_idx', self._table, ['partner_id', 'contribution_type_id', 'date']
+        )
+        # Idempotency lookups of new transactions also check the archived keys.
+        tools.create_index(
+            self.env.cr, f'{self._table}_company_external_key_idx', self._table, ['company_id', 'external_key'],
+            where='external_key IS NOT NULL'
+        )
+
+    def unlink(self):
+        raise ValidationError("No se pueden eliminar transacciones archivadas.")
+
+
+class ContributionArchive(models.Model):
+    _name = 'contributions.manager.contribution.archive'
+    _description = 'Archived Contribution'
+    _inherit = ['contributions.manager.archived.transaction.mixin']
+
+
+class WithdrawalArchive(models.Model):
+    _name = 'contributions.manager.withdrawal.archive'
+    _description = 'Archived Withdrawal'
+    _inherit = ['contributions.manager.archived.transaction.mixin']
+
+    internal_use = fields.Boolean(string='Uso Interno', readonly=True)
+    payment_id = fields.Many2one('account.payment', string='Pago Realizado', readonly=True)
+    invoice_id = fields.Many2one('account.move', string='Factura Pagada', readonly=True)
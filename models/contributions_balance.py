@@ -0,0 +1,174 @@
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+
+# Signed balance movements (pc_id, date, amount) of every registered transaction, archived transaction and
+# capitalized interest.
+REGISTERED_FLOWS_QUERY = """
+    SELECT pc.id AS pc_id, c.date, c.amount
+      FROM contributions_manager_contribution c
+      JOIN contributions_manager_partner_contribution pc
+        ON pc.partner_id = c.partner_id
+       AND pc.contribution_type_id = c.contribution_type_id
+       AND pc.company_id = c.company_id
+     WHERE c.contribution_status = 'registered'
+     UNION ALL
+    SELECT pc.id, w.date, -w.amount
+      FROM contributions_manager_withdrawal w
+      JOIN contributions_manager_partner_contribution pc
+        ON pc.partner_id = w.partner_id
+       AND pc.contribution_type_id = w.contribution_type_id
+       AND pc.company_id = w.company_id
+     WHERE w.withdrawal_status = 'registered'
+     UNION ALL
+    SELECT l.partner_contribution_id, l.date, l.amount
+      FROM contributions_manager_interest_line l
+     UNION ALL
+    SELECT pc.id, c.date, c.amount
+      FROM contributions_manager_contribution_archive c
+      JOIN contributions_manager_partner_contribution pc
+        ON pc.partner_id = c.partner_id
+       AND pc.contribution_type_id = c.contribution_type_id
+       AND pc.company_id = c.company_id
+     UNION ALL
+    SELECT pc.id, w.date, -w.amount
+      FROM contributions_manager_withdrawal_archive w
+      JOIN contributions_manager_partner_contribution pc
+        ON pc.partner_id = w.partner_id
+       AND pc.contribution_type_id = w.contribution_type_id
+       AND pc.company_id = w.company_id
+"""
+
+
+class BalanceSnapshot(models.Model):
+    """
+        DOCSTRING: BalanceSnapshot model holding the daily balance ledger of each partner contribution.
+        One row per partner contribution and day with movements: the net movement of the day and the closing
+        balance. It is maintained incrementally by PartnerContribution._apply_balance_deltas.
+    """
+    _name = 'contributions.manager.balance.snapshot'
+    _description = 'Partner Contribution Daily Balance'
+    _order = 'partner_contribution_id, date desc'
+
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, readonly=True, ondelete='cascade')
+    date = fields.Date(string='Fecha', required=True, readonly=True)
+    delta = fields.Float(string='Movimiento del Día', readonly=True)
+    balance = fields.Float(string='Saldo al Cierre', readonly=True)
+
+    _sql_constraints = [
+        ('unique_snapshot_partner_contribution_date', 'UNIQUE(partner_contribution_id, date)', 'Solo puede existir un saldo diario por aportación y fecha.'),
+    ]
+
+    def init(self):
+        self.env.cr.execute(f"SELECT 1 FROM {self._table} LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild_snapshots()
+
+    @api.model
+    def _record_movements(self, movements):
+        """
+            Adds signed movements [(partner_contribution_id, date, amount), ...] to the ledger: missing day rows
+            are seeded with the previous closing balance, the day's delta is increased, and the amount is
+            carried into every closing balance from that day on (backdated movements included).
+        """
+        amounts = defaultdict(float)
+        for pc_id, date, amount in movements:
+            amounts[(pc_id, date)] += amount
+        keys = sorted(key for key, amount in amounts.items() if amount)
+        if not keys:
+            return
+        pc_ids = [pc_id for pc_id, _date in keys]
+        dates = [date for _pc_id, date in keys]
+        values = [amounts[key] for key in keys]
+        self.flush_model()
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (partner_contribution_id, date, delta, balance, create_uid, create_date, write_uid, write_date)
+            SELECT v.pc_id, v.date, 0.0,
+                   COALESCE((SELECT s.balance
+                               FROM {self._table} s
+                              WHERE s.partner_contribution_id = v.pc_id AND s.date < v.date
+                              ORDER BY s.date DESC
+                              LIMIT 1), 0.0),
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM unnest(%(pc_ids)s::int[], %(dates)s::date[]) AS v(pc_id, date)
+                ON CONFLICT (partner_contribution_id, date) DO NOTHING
+        """, {'uid': self.env.uid, 'pc_ids': pc_ids, 'dates': dates})
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS s
+               SET delta = s.delta + v.amount
+              FROM unnest(%(pc_ids)s::int[], %(dates)s::date[], %(values)s::float8[]) AS v(pc_id, date, amount)
+             WHERE s.partner_contribution_id = v.pc_id AND s.date = v.date
+        """, {'pc_ids': pc_ids, 'dates': dates, 'values': values})
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS s
+               SET balance = s.balance + x.amount,
+                   write_uid = %(uid)s,
+                   write_date = (now() at time zone 'UTC')
+              FROM (
+                    SELECT s2.id, SUM(v.amount) AS amount
+                      FROM {self._table} s2
+                      JOIN unnest(%(pc_ids)s::int[], %(dates)s::date[], %(values)s::float8[]) AS v(pc_id, date, amount)
+                        ON s2.partner_contribution_id = v.pc_id AND s2.date >= v.date
+                     GROUP BY s2.id
+                   ) AS x
+             WHERE s.id = x.id
+        """, {'uid': self.env.uid, 'pc_ids': pc_ids, 'dates': dates, 'values': values})
+        self.invalidate_model(['delta', 'balance', 'write_uid', 'write_date'])
+
+    @api.model
+    def _rebuild_snapshots(self):
+        """
+            Rebuilds the whole ledger from the registered transaction history in a single statement.
+        """
+        for model in ('contributions.manager.contribution', 'contributions.manager.withdrawal', 'contributions.manager.interest.line'):
+            self.env[model].flush_model()
+        self.env.cr.execute(f"DELETE FROM {self._table}")
+        self.env.cr.execute(f"""
+            WITH flows AS ({REGISTERED_FLOWS_QUERY}),
+            days AS (
+                SELECT pc_id, date, SUM(amount) AS delta
+                  FROM flows
+                 GROUP BY pc_id, date
+            )
+            INSERT INTO {self._table} (partner_contribution_id, date, delta, balance, create_uid, create_date, write_uid, write_date)
+            SELECT pc_id, date, delta,
+                   SUM(delta) OVER (PARTITION BY pc_id ORDER BY date),
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM days
+        """, {'uid': self.env.uid})
+        self.invalidate_model()
+
+
+class PartnerContribution(models.Model):
+    _inherit = 'contributions.manager.partner.contribution'
+
+    # As-of Balances
+    def balance_at(self, date):
+        """
+            Returns the closing balance of this partner contribution on the given date.
+        """
+        self.ensure_one()
+        return self.balances_at(date, [('id', '=', self.id)]).get(self.id, 0.0)
+
+    @api.model
+    def balances_at(self, date, domain=None):
+        """
+            Returns {partner_contribution_id: closing balance on date} for every partner contribution matching
+            domain, in a single query answered by the (partner_contribution_id, date) unique index.
+        """
+        self.env['contributions.manager.balance.snapshot'].flush_model()
+        query = self._search(domain or [])
+        self.env.cr.execute(SQL("""
+            SELECT pc.id, COALESCE(s.balance, 0.0)
+              FROM contributions_manager_partner_contribution pc
+              LEFT JOIN LATERAL (
+                    SELECT balance
+                      FROM contributions_manager_balance_snapshot
+                     WHERE partner_contribution_id = pc.id AND date <= %s
+                     ORDER BY date DESC
+                     LIMIT 1
+              ) s ON TRUE
+             WHERE pc.id IN %s
+        """, fields.Date.to_date(date), query.subselect()))
+        return dict(self.env.cr.fetchall())
@@ -41,6 +41,7 @@ class ContributionsTypes(models.Model):
         ]
     )
     journal = fields.Many2one('account.journal', string='Diario Contable', required=True, tracking=True)
+    consolidated_posting = fields.Boolean(string='Asiento Consolidado', tracking=True, help="Contabiliza las transacciones en un solo asiento por diario, fecha y tipo, con una línea por socio y una contrapartida bancaria sumada.")
     company_id = fields.Many2one(
         comodel_name='res.company',
         string='Empresa',
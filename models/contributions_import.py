@@ -0,0 +1,333 @@
+import csv
+import datetime
+import io
+import logging
+import re
+from contextlib import contextmanager
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError, ValidationError
+
+from .transaction_posting import BULK_MODE_CONTEXT
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+COLUMN_ALIASES = {
+    'partner': ('partner', 'socio', 'asociado', 'vat', 'nit', 'ref', 'referencia'),
+    'contribution_type': ('contribution_type', 'tipo', 'tipo de contribucion', 'tipo de contribución'),
+    'amount': ('amount', 'monto'),
+    'date': ('date', 'fecha'),
+}
+OPTIONAL_COLUMNS = {
+    'external_key': ('external_key', 'clave', 'clave externa', 'id externo'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+AMOUNT_PATTERN = re.compile(r'^[+-]?\d+([.,]\d+)*$')
+
+
+class ContributionImport(models.TransientModel):
+    """
+        DOCSTRING: ContributionImport wizard importing payroll contribution files (CSV/XLSX).
+        The file is streamed from its attachment in chunks; partners, contribution types and active partner
+        contributions are resolved with one lookup per chunk, each chunk is created in bulk and committed on its
+        own together with its error lines and the import progress, and invalid rows are reported per row
+        instead of aborting the whole file. An interrupted import resumes after the last committed row.
+    """
+    _name = 'contributions.manager.contribution.import'
+    _description = 'Payroll Contributions Import'
+
+    file = fields.Binary(string='Archivo', required=True, attachment=True)
+    filename = fields.Char(string='Nombre del Archivo')
+    decimal_separator = fields.Selection([
+        ('auto', 'Automático'),
+        ('.', 'Punto (1,234.56)'),
+        (',', 'Coma (1.234,56)'),
+    ], string='Separador Decimal', required=True, default='auto', help="En modo automático, los montos como '1,234' o '1.234' se rechazan por ambiguos.")
+    action_after_import = fields.Selection([
+        ('draft', 'Dejar en Borrador'),
+        ('confirm', 'Confirmar'),
+        ('register', 'Confirmar y Contabilizar'),
+    ], string='Al Importar', required=True, default='draft')
+    chunk_size = fields.Integer(string='Filas por Lote', required=True, default=1000)
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, default=lambda self: self.env.company)
+    state = fields.Selection([('draft', 'Borrador'), ('in_progress', 'En Proceso'), ('done', 'Importado')], default='draft', readonly=True)
+    processed_row = fields.Integer(string='Última Fila Procesada', readonly=True, help="Última fila del archivo ya importada y confirmada en la base de datos.")
+    imported_count = fields.Integer(string='Filas Importadas', readonly=True)
+    error_count = fields.Integer(string='Filas con Error', readonly=True)
+    duplicate_count = fields.Integer(string='Filas Duplicadas', readonly=True, help="Filas cuya clave externa ya había sido importada; se omitieron.")
+    error_line_ids = fields.One2many('contributions.manager.contribution.import.error', 'import_id', string='Errores', readonly=True)
+
+    # Actions
+    def action_import(self):
+        """
+            Imports the file chunk by chunk, skipping the rows already committed by an interrupted run.
+        """
+        self.ensure_one()
+        if self.chunk_size <= 0:
+            raise ValidationError("El tamaño del lote debe ser mayor que 0.")
+        if self.state == 'done':
+            raise ValidationError("Este archivo ya fue importado.")
+        self.state = 'in_progress'
+        chunk = []
+        for row_number, row in self._iter_rows():
+            if row_number <= self.processed_row:
+                continue
+            chunk.append((row_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        self.state = 'done'
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    # Reading
+    @contextmanager
+    def _open_file(self):
+        """
+            Yields a binary stream over the uploaded file, read from the filestore when the attachment is stored
+            there, so the file is never decoded into memory as a whole.
+        """
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name), ('res_field', '=', 'file'), ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError("Debe adjuntar un archivo.")
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as stream:
+                yield stream
+        else:
+            yield io.BytesIO(attachment.raw)
+
+    def _iter_rows(self):
+        """
+            Yields (row_number, {column: value}) for every data row of the file without building the whole
+            table in memory. Amounts of CSV files are parsed with the decimal separator of the wizard; in
+            automatic mode, ';' and tab separated files are expected to use decimal commas.
+        """
+        filename = (self.filename or '').lower()
+        with self._open_file() as stream:
+            if filename.endswith('.xlsx'):
+                if openpyxl is None:
+                    raise UserError("Se requiere la librería openpyxl para importar archivos XLSX.")
+                workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+                rows = workbook.active.iter_rows(values_only=True)
+                decimal_separator = self.decimal_separator
+            else:
+                text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+                sample = text.read(4096)
+                text.seek(0)
+                try:
+                    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+                except csv.Error:
+                    dialect = csv.excel
+                rows = csv.reader(text, dialect)
+                decimal_separator = self.decimal_separator
+                if decimal_separator == 'auto' and dialect.delimiter != ',':
+                    decimal_separator = ','
+
+            header = next(rows, None)
+            if not header:
+                raise UserError("El archivo está vacío.")
+            columns = self._map_columns(header)
+            for row_number, row in enumerate(rows, start=2):
+                if not row or not any(cell not in (None, '') for cell in row):
+                    continue
+                values = {column: row[index] if index < len(row) else None for column, index in columns.items()}
+                values['decimal_separator'] = decimal_separator
+                yield row_number, values
+
+    def _map_columns(self, header):
+        normalized = [str(cell or '').strip().lower() for cell in header]
+        columns = {}
+        for column, aliases in COLUMN_ALIASES.items():
+            index = next((i for i, name in enumerate(normalized) if name in aliases), None)
+            if index is None:
+                raise UserError(f"No se encontró la columna requerida '{column}' en el archivo.")
+            columns[column] = index
+        for column, aliases in OPTIONAL_COLUMNS.items():
+            index = next((i for i, name in enumerate(normalized) if name in aliases), None)
+            if index is not None:
+                columns[column] = index
+        return columns
+
+    # Importing
+    def _import_chunk(self, chunk):
+        """
+            Validates and creates one chunk of rows, then saves its error lines and the progress of the import
+            and commits them together with the chunk.
+        """
+        errors = []
+        partner_keys = {str(row['partner'] or '').strip() for _row_number, row in chunk} - {''}
+        type_names = {str(row['contribution_type'] or '').strip().lower() for _row_number, row in chunk} - {''}
+
+        partners_by_key = {}
+        for partner in self.env['res.partner'].search_read(
+            ['|', ('vat', 'in', list(partner_keys)), ('ref', 'in', list(partner_keys))], ['vat', 'ref']
+        ):
+            for key in (partner['vat'], partner['ref']):
+                if key:
+                    partners_by_key.setdefault(key, partner['id'])
+        types_by_name = {
+            contrib_type.contribution_name.lower(): contrib_type.id
+            for contrib_type in self.env['contributions.manager.contribution.type'].search([
+                ('contribution_name', 'in', [name.title() for name in type_names]),
+                ('company_id', '=', self.company_id.id),
+            ])
+        }
+        partner_contributions = self.env['contributions.manager.partner.contribution']._get_active_partner_contribution_map(
+            set(partners_by_key.values()), set(types_by_name.values()), [self.company_id.id]
+        )
+
+        valid_rows = []
+        for row_number, row in chunk:
+            key = str(row['partner'] or '').strip()
+            try:
+                partner_id = partners_by_key.get(key)
+                if not partner_id:
+                    raise ValidationError(f"No se encontró el asociado '{key}'.")
+                type_id = types_by_name.get(str(row['contribution_type'] or '').strip().lower())
+                if not type_id:
+                    raise ValidationError(f"No se encontró el tipo de contribución '{row['contribution_type']}'.")
+                if (partner_id, type_id, self.company_id.id) not in partner_contributions:
+                    raise ValidationError("Este asociado no tiene asignado este tipo de contribución activa.")
+                amount = self._parse_amount(row['amount'], row['decimal_separator'])
+                if amount <= 0:
+                    raise ValidationError("El monto de la aportación debe ser mayor que 0.")
+                valid_rows.append((row_number, key, {
+                    'partner_id': partner_id,
+                    'contribution_type_id': type_id,
+                    'amount': amount,
+                    'date': self._parse_date(row['date']),
+                    'company_id': self.company_id.id,
+                    'external_key': str(row.get('external_key') or '').strip() or False,
+                }))
+            except (ValidationError, ValueError) as error:
+                errors.append((row_number, key, str(error.args[0] if error.args else error)))
+
+        imported = self._create_contributions(valid_rows, errors)
+        self.env['contributions.manager.contribution.import.error'].create([
+            {'import_id': self.id, 'row_number': row_number, 'partner_key': key, 'message': message}
+            for row_number, key, message in errors
+        ])
+        self.write({
+            'processed_row': chunk[-1][0],
+            'imported_count': self.imported_count + imported,
+            'error_count': self.error_count + len(errors),
+            'duplicate_count': self.duplicate_count + len(chunk) - imported - len(errors),
+        })
+        if not self.env.registry.in_test_mode():
+            self.env.cr.commit()
+
+    def _create_contributions(self, valid_rows, errors):
+        """
+            Creates the whole chunk in one batch; if the batch fails, rows are retried one by one so only
+            the offending rows are reported. Rows are processed in bulk mode with one summary message per chunk.
+            Rows whose external key was already imported are skipped, so a file can be imported again safely.
+        """
+        Contribution = self.env['contributions.manager.contribution'].with_context(
+            **BULK_MODE_CONTEXT, contributions_bulk_summary=False
+        )
+        try:
+            with self.env.cr.savepoint():
+                _records, contributions = Contribution._create_or_get([vals for _row_number, _key, vals in valid_rows])
+                self._process_contributions(contributions)
+            self._post_import_summary(contributions)
+            return len(contributions)
+        except (ValidationError, UserError) as error:
+            _logger.info("Batch import failed (%s), retrying row by row.", error)
+
+        contributions = Contribution
+        for row_number, key, vals in valid_rows:
+            try:
+                with self.env.cr.savepoint():
+                    _records, contribution = Contribution._create_or_get([vals])
+                    self._process_contributions(contribution)
+                contributions |= contribution
+            except (ValidationError, UserError) as error:
+                errors.append((row_number, key, str(error.args[0] if error.args else error)))
+        self._post_import_summary(contributions)
+        return len(contributions)
+
+    def _post_import_summary(self, contributions):
+        action = dict(self._fields['action_after_import']._description_selection(self.env))[self.action_after_import]
+        contributions.with_context(contributions_bulk_summary=True)._post_bulk_summary(f"Importación ({action})")
+
+    def _process_contributions(self, contributions):
+        if self.action_after_import in ('confirm', 'register'):
+            contributions.action_confirm()
+        if self.action_after_import == 'register':
+            contributions.action_register()
+
+    @api.model
+    def _parse_amount(self, value, decimal_separator='auto'):
+        """
+            Parses an amount written with '.' or ',' as decimal separator and the other one as thousands
+            separator. A value holding both uses the rightmost one as decimal separator. With a single kind of
+            separator, decimal_separator decides; in 'auto' mode a separator repeated is a thousands separator,
+            and one followed by exactly three digits ('1,234', '1.234') is rejected as ambiguous.
+        """
+        if isinstance(value, (int, float)):
+            return float(value)
+        text = str(value or '').strip().replace(' ', '')
+        if not AMOUNT_PATTERN.match(text):
+            raise ValueError(f"Monto inválido '{value}'.")
+        separators = {char for char in text if char in '.,'}
+        if len(separators) == 2:
+            decimal = text[max(text.rfind('.'), text.rfind(','))]
+        elif separators:
+            separator = separators.pop()
+            if decimal_separator != 'auto':
+                decimal = decimal_separator
+            elif text.count(separator) > 1:
+                decimal = ',' if separator == '.' else '.'
+            elif len(text) - text.rfind(separator) - 1 == 3:
+                raise ValueError(f"Monto ambiguo '{value}': indique el separador decimal del archivo.")
+            else:
+                decimal = separator
+        else:
+            return float(text)
+        thousands = ',' if decimal == '.' else '.'
+        if text.count(decimal) > 1 or thousands in text.partition(decimal)[2]:
+            raise ValueError(f"Monto inválido '{value}'.")
+        whole, _separator, fraction = text.partition(decimal)
+        if thousands in whole and not re.match(rf'^[+-]?\d{{1,3}}(\{thousands}\d{{3}})+$', whole):
+            raise ValueError(f"Monto inválido '{value}'.")
+        return float(f"{whole.replace(thousands, '')}.{fraction or 0}")
+
+    @api.model
+    def _parse_date(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        if not value:
+            return fields.Date.context_today(self)
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(str(value).strip(), date_format).date()
+            except ValueError:
+                continue
+        raise ValueError(f"Fecha inválida '{value}'.")
+
+
+class ContributionImportError(models.TransientModel):
+    _name = 'contributions.manager.contribution.import.error'
+    _description = 'Payroll Contributions Import Error'
+    _order = 'row_number'
+
+    import_id = fields.Many2one('contributions.manager.contribution.import', required=True, ondelete='cascade')
+    row_number = fields.Integer(string='Fila')
+    partner_key = fields.Char(string='Asociado')
+    message = fields.Char(string='Error')
@@ -0,0 +1,256 @@
+import calendar
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models, tools
+from odoo.exceptions import ValidationError
+
+from .transaction_posting import BULK_MODE_CONTEXT
+
+INTEREST_MOVE_CHUNK = 1000
+
+
+class InterestLine(models.Model):
+    """
+        DOCSTRING: InterestLine model storing the interest capitalized on a partner contribution for one period.
+        Interest lines are part of the balance history used by the daily average balance (DAV) calculation.
+    """
+    _name = 'contributions.manager.interest.line'
+    _description = 'Capitalized Interest'
+    _order = 'date desc, id desc'
+
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, ondelete='restrict')
+    partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', required=True, readonly=True)
+    contribution_type_id = fields.Many2one('contributions.manager.contribution.type', string='Tipo de Contribución', required=True, readonly=True)
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, readonly=True)
+    date = fields.Date(string='Fecha de Capitalización', required=True, readonly=True)
+    period_start = fields.Date(string='Inicio del Periodo', required=True, readonly=True)
+    average_balance = fields.Float(string='Saldo Promedio Diario', readonly=True)
+    interest_rate = fields.Float(string='Tasa de Interés (%)', readonly=True)
+    amount = fields.Float(string='Interés Capitalizado', required=True, readonly=True)
+    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, copy=False)
+
+    def init(self):
+        tools.create_index(
+            self.env.cr, 'contributions_manager_interest_line_pc_date_idx', self._table,
+            ['partner_contribution_id', 'date']
+        )
+
+
+class ContributionsTypes(models.Model):
+    _inherit = 'contributions.manager.contribution.type'
+
+    # Actions
+    def action_capitalize_interest(self):
+        """
+            Capitalizes the capitalization dates due up to today, like the cron, so a manual run never moves
+            last_capitalization_date off the capitalization day. Raises if no date is due.
+        """
+        if not self._capitalize_due_interest(fields.Date.context_today(self)):
+            raise ValidationError("No hay fechas de capitalización pendientes hasta hoy.")
+
+    @api.model
+    def _cron_capitalize_interest(self):
+        """
+            Capitalizes the due dates of every DAV type with an interest rate. Each date is committed on its own
+            outside tests.
+        """
+        contrib_types = self.search([('calculation_method', '=', 'DAV'), ('interest_rate', '>', 0)])
+        contrib_types._capitalize_due_interest(
+            fields.Date.context_today(self), commit=not self.env.registry.in_test_mode()
+        )
+
+    def _capitalize_due_interest(self, until, commit=False):
+        """
+            Capitalizes, in date order, every capitalization date of each type since its last capitalization up
+            to until, so missed periods are caught up on the next run. Types never capitalized start one month
+            back. Returns the number of capitalized dates.
+        """
+        last_dates = dict(self.env['contributions.manager.partner.contribution']._read_group(
+            [('contribution_type_id', 'in', self.ids)], ['contribution_type_id'], ['last_capitalization_date:max']
+        ))
+        count = 0
+        for contrib_type in self:
+            last_date = last_dates.get(contrib_type) or until - relativedelta(months=1)
+            for capitalization_date in contrib_type._get_due_capitalization_dates(last_date, until):
+                contrib_type.with_company(contrib_type.company_id)._capitalize_interest(capitalization_date)
+                count += 1
+                if commit:
+                    self.env.cr.commit()
+        return count
+
+    def _get_due_capitalization_dates(self, last_date, until):
+        """
+            Returns the capitalization dates of this type after last_date up to until (included), in order.
+            The capitalization day moves to the last day of shorter months.
+        """
+        self.ensure_one()
+        day = int(self.capitalization_date)
+        dates = []
+        month = last_date.replace(day=1)
+        while month <= until:
+            date = month.replace(day=min(day, calendar.monthrange(month.year, month.month)[1]))
+            if last_date < date <= until:
+                dates.append(date)
+            month += relativedelta(months=1)
+        return dates
+
+    # Interest Engine
+    def _capitalize_interest(self, capitalization_date):
+        """
+            Computes the DAV interest of every partner contribution of this type up to capitalization_date
+            (excluded), posts the interest moves in bulk and credits current_amount.
+            Partner contributions already capitalized on that date are skipped, so re-running is safe.
+        """
+        self.ensure_one()
+        if self.calculation_method != 'DAV':
+            raise ValidationError("Solo se soporta el cálculo de intereses por promedio diario.")
+        if not self.journal or not self.saving_account or not self.interest_payment_account:
+            raise ValidationError(
+                "Las cuentas contables no están configuradas correctamente en el tipo de contribución."
+            )
+
+        currency = self.company_id.currency_id
+        days_per_year = int(self.days_per_year)
+        accruals = []
+        capitalized_ids = []
+        for pc_id, period_start, balance_days in self._get_dav_balance_days(capitalization_date):
+            capitalized_ids.append(pc_id)
+            amount = currency.round(balance_days * self.interest_rate / 100.0 / days_per_year)
+            if amount <= 0:
+                continue
+            days = (capitalization_date - period_start).days or 1
+            accruals.append((pc_id, period_start, balance_days / days, amount))
+
+        bulk_env = self.with_context(**BULK_MODE_CONTEXT).env
+        partner_contributions = bulk_env['contributions.manager.partner.contribution'].browse(capitalized_ids)
+        partner_by_pc = {pc.id: pc.partner_id.id for pc in partner_contributions}
+        for start in range(0, len(accruals), INTEREST_MOVE_CHUNK):
+            chunk = accruals[start:start + INTEREST_MOVE_CHUNK]
+            moves = bulk_env['account.move'].create([
+                self._prepare_interest_move_vals(partner_by_pc[pc_id], amount, capitalization_date)
+                for pc_id, _start, _average, amount in chunk
+            ])
+            moves.action_post()
+            bulk_env['contributions.manager.interest.line'].create([{
+                'partner_contribution_id': pc_id,
+                'partner_id': partner_by_pc[pc_id],
+                'contribution_type_id': self.id,
+                'company_id': self.company_id.id,
+                'date': capitalization_date,
+                'period_start': period_start,
+                'average_balance': average,
+                'interest_rate': self.interest_rate,
+                'amount': amount,
+                'move_id': move.id,
+            } for (pc_id, period_start, average, amount), move in zip(chunk, moves)])
+            partner_contributions._apply_balance_deltas([
+                (pc_id, capitalization_date, amount) for pc_id, _start, _average, amount in chunk
+            ])
+        partner_contributions.write({'last_capitalization_date': capitalization_date})
+        if accruals:
+            total = currency.round(sum(amount for _pc_id, _start, _average, amount in accruals))
+            self.sudo().message_post(
+                body=f"Capitalización de intereses en lote al {capitalization_date}: {len(accruals)} registros, "
+                     f"total {total:,.{currency.decimal_places}f}, usuario {self.env.user.name}."
+            )
+
+    def _get_dav_balance_days(self, end_date):
+        """
+            Returns [(partner_contribution_id, period_start, balance_days), ...] where balance_days is the
+            sum of each daily balance over the period, computed from balance intervals in a single query:
+            registered contributions, withdrawals, capitalized interest and the opening balances of closed
+            periods are collapsed into one event per day, the running sum gives the balance of each interval
+            and LEAD() gives its length in days. Partner contributions never capitalized start one capitalization
+            period (a month) before end_date, earlier history being carried in as their opening balance.
+        """
+        self.ensure_one()
+        self.env['contributions.manager.contribution'].flush_model()
+        self.env['contributions.manager.withdrawal'].flush_model()
+        self.env['contributions.manager.interest.line'].flush_model()
+        self.env['contributions.manager.opening.balance'].flush_model()
+        self.env['contributions.manager.partner.contribution'].flush_model()
+        self.env.cr.execute("""
+            WITH pcs AS (
+                SELECT id, partner_id, company_id, last_capitalization_date
+                  FROM contributions_manager_partner_contribution
+                 WHERE contribution_type_id = %(type_id)s
+                   AND enabled
+                   AND (last_capitalization_date IS NULL OR last_capitalization_date < %(end_date)s)
+            ),
+            flows AS (
+                SELECT pcs.id AS pc_id, c.date, c.amount
+                  FROM contributions_manager_contribution c
+                  JOIN pcs ON pcs.partner_id = c.partner_id AND pcs.company_id = c.company_id
+                 WHERE c.contribution_type_id = %(type_id)s
+                   AND c.contribution_status = 'registered'
+                   AND c.date < %(end_date)s
+                 UNION ALL
+                SELECT pcs.id, w.date, -w.amount
+                  FROM contributions_manager_withdrawal w
+                  JOIN pcs ON pcs.partner_id = w.partner_id AND pcs.company_id = w.company_id
+                 WHERE w.contribution_type_id = %(type_id)s
+                   AND w.withdrawal_status = 'registered'
+                   AND w.date < %(end_date)s
+                 UNION ALL
+                SELECT l.partner_contribution_id, l.date, l.amount
+                  FROM contributions_manager_interest_line l
+                  JOIN pcs ON pcs.id = l.partner_contribution_id
+                 WHERE l.date < %(end_date)s
+                 UNION ALL
+                SELECT o.partner_contribution_id, o.date, o.amount
+                  FROM contributions_manager_opening_balance o
+                  JOIN pcs ON pcs.id = o.partner_contribution_id
+                 WHERE o.date < %(end_date)s
+            ),
+            bounds AS (
+                SELECT f.pc_id, COALESCE(MAX(pcs.last_capitalization_date), %(first_start)s::date) AS start_date
+                  FROM flows f
+                  JOIN pcs ON pcs.id = f.pc_id
+                 GROUP BY f.pc_id
+            ),
+            events AS (
+                SELECT f.pc_id, GREATEST(f.date, b.start_date) AS date, SUM(f.amount) AS amount
+                  FROM flows f
+                  JOIN bounds b ON b.pc_id = f.pc_id
+                 GROUP BY f.pc_id, GREATEST(f.date, b.start_date)
+            ),
+            intervals AS (
+                SELECT pc_id,
+                       SUM(amount) OVER w AS balance,
+                       LEAD(date, 1, %(end_date)s::date) OVER w - date AS days
+                  FROM events
+                WINDOW w AS (PARTITION BY pc_id ORDER BY date)
+            )
+            SELECT i.pc_id, b.start_date, SUM(GREATEST(i.balance, 0) * i.days)
+              FROM intervals i
+              JOIN bounds b ON b.pc_id = i.pc_id
+             GROUP BY i.pc_id, b.start_date
+             ORDER BY i.pc_id
+        """, {'type_id': self.id, 'end_date': end_date, 'first_start': end_date - relativedelta(months=1)})
+        return self.env.cr.fetchall()
+
+    def _prepare_interest_move_vals(self, partner_id, amount, date):
+        self.ensure_one()
+        return {
+            'ref': f"Intereses {self.contribution_name} {date}",
+            'date': date,
+            'journal_id': self.journal.id,
+            'company_id': self.company_id.id,
+            'line_ids': [
+                (0, 0, {
+                    'account_id': self.interest_payment_account.id,
+                    'debit': amount,
+                    'credit': 0.0,
+                    'partner_id': partner_id,
+                    'name': f"Intereses {self.contribution_name}"
+                }),
+                (0, 0, {
+                    'account_id': self.saving_account.id,
+                    'credit': amount,
+                    'debit': 0.0,
+                    'partner_id': partner_id,
+                    'name': f"Intereses {self.contribution_name}"
+                })
+            ]
+        }
@@ -0,0 +1,195 @@
+import base64
+import calendar
+import csv
+import io
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+
+class InterestSimulation(models.TransientModel):
+    """
+        DOCSTRING: InterestSimulation wizard projecting the DAV interest cost of a contribution type under several
+        candidate rates before changing them. Balances and the net flows of the last twelve months of every
+        partner contribution are loaded with one query; as capitalization is monthly and flows are assumed
+        to arrive at the start of each month, the projected interest of each member is linear in its balance
+        and monthly flow, so each scenario reduces to two coefficients applied to the arrays. Nothing is written
+        outside the wizard.
+    """
+    _name = 'contributions.manager.interest.simulation'
+    _description = 'Interest Rate What-If Simulation'
+
+    contribution_type_id = fields.Many2one('contributions.manager.contribution.type', string='Tipo de Contribución', required=True, ondelete='cascade')
+    rates = fields.Char(string='Tasas a Simular (%)', required=True, help="Tasas de interés anuales separadas por comas, por ejemplo: 3.5, 4, 4.5")
+    days_per_year = fields.Selection([('360', '360'), ('365', '365')], string='Dias por Año', required=True, default='365')
+    horizon_months = fields.Integer(string='Meses a Proyectar', required=True, default=12)
+    project_flows = fields.Boolean(string='Proyectar Flujos', default=True, help="Suma cada mes el flujo neto mensual promedio de los últimos doce meses de cada socio.")
+    state = fields.Selection([('draft', 'Borrador'), ('done', 'Simulado')], default='draft', readonly=True)
+    member_count = fields.Integer(string='Socios', readonly=True)
+    scenario_ids = fields.One2many('contributions.manager.interest.simulation.scenario', 'simulation_id', string='Escenarios', readonly=True)
+    breakdown_file = fields.Binary(string='Detalle por Socio', readonly=True, attachment=False)
+    breakdown_filename = fields.Char(string='Nombre del Archivo', readonly=True)
+
+    @api.onchange('contribution_type_id')
+    def _onchange_contribution_type_id(self):
+        if self.contribution_type_id:
+            self.days_per_year = self.contribution_type_id.days_per_year
+            if not self.rates:
+                self.rates = f"{self.contribution_type_id.interest_rate:g}"
+
+    # Actions
+    def action_simulate(self):
+        self.ensure_one()
+        if self.horizon_months <= 0:
+            raise ValidationError("La cantidad de meses a proyectar debe ser mayor que 0.")
+        contrib_type = self.contribution_type_id
+        scenarios = [(contrib_type.interest_rate, int(contrib_type.days_per_year))] + [
+            (rate, int(self.days_per_year)) for rate in self._parse_rates()
+        ]
+        members = self._load_members()
+        interests = self._project_interest(members, scenarios)
+
+        currency = contrib_type.company_id.currency_id
+        baseline = currency.round(sum(interests[0]))
+        self.scenario_ids.unlink()
+        self.write({
+            'state': 'done',
+            'member_count': len(members),
+            'scenario_ids': [(0, 0, {
+                'interest_rate': rate,
+                'days_per_year': str(days_per_year),
+                'is_current': index == 0,
+                'total_interest': currency.round(sum(amounts)),
+                'difference': currency.round(sum(amounts)) - baseline,
+                'average_interest': currency.round(sum(amounts) / len(members)) if members else 0.0,
+            }) for index, ((rate, days_per_year), amounts) in enumerate(zip(scenarios, interests))],
+            'breakdown_file': base64.b64encode(self._breakdown_csv(members, scenarios, interests, currency)),
+            'breakdown_filename': f"simulacion_intereses_{contrib_type.contribution_name}.csv",
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    # Simulation
+    def _parse_rates(self):
+        try:
+            rates = [float(rate.strip().replace('%', '')) for rate in (self.rates or '').split(',') if rate.strip()]
+        except ValueError:
+            raise ValidationError("Las tasas deben ser números separados por comas.")
+        if not rates or any(rate < 0 for rate in rates):
+            raise ValidationError("Indique al menos una tasa de interés mayor o igual a 0.")
+        return rates
+
+    def _load_members(self):
+        """
+            Returns [(partner_contribution_id, partner name, vat, balance, monthly flow), ...] for the enabled
+            partner contributions of the type: current balances and the average monthly net flow of the last
+            twelve full months (from the monthly report, capitalized interest excluded), in a single query.
+        """
+        self.ensure_one()
+        for model in ('contributions.manager.partner.contribution', 'contributions.manager.report.monthly',
+                      'contributions.manager.interest.line'):
+            self.env[model].flush_model()
+        history_end = fields.Date.context_today(self).replace(day=1)
+        history_start = history_end - relativedelta(months=12)
+        self.env.cr.execute("""
+            SELECT pc.id, p.name, p.vat, pc.current_amount,
+                   (COALESCE(r.net_flow, 0.0) - COALESCE(i.amount, 0.0)) / 12.0
+              FROM contributions_manager_partner_contribution pc
+              JOIN res_partner p ON p.id = pc.partner_id
+              LEFT JOIN (SELECT partner_contribution_id, SUM(net_flow) AS net_flow
+                           FROM contributions_manager_report_monthly
+                          WHERE contribution_type_id = %(type_id)s AND month >= %(start)s AND month < %(end)s
+                          GROUP BY partner_contribution_id) r ON r.partner_contribution_id = pc.id
+              LEFT JOIN (SELECT partner_contribution_id, SUM(amount) AS amount
+                           FROM contributions_manager_interest_line
+                          WHERE contribution_type_id = %(type_id)s AND date >= %(start)s AND date < %(end)s
+                          GROUP BY partner_contribution_id) i ON i.partner_contribution_id = pc.id
+             WHERE pc.contribution_type_id = %(type_id)s AND pc.enabled
+             ORDER BY pc.id
+        """, {'type_id': self.contribution_type_id.id, 'start': history_start, 'end': history_end})
+        return self.env.cr.fetchall()
+
+    def _month_rates(self, rate, days_per_year):
+        """
+            Monthly DAV rates of the projected months, starting next month: rate * days of the month / days_per_year.
+        """
+        start = fields.Date.context_today(self).replace(day=1)
+        rates = []
+        for offset in range(1, self.horizon_months + 1):
+            month = start + relativedelta(months=offset)
+            rates.append(rate / 100.0 * calendar.monthrange(month.year, month.month)[1] / days_per_year)
+        return rates
+
+    def _project_interest(self, members, scenarios):
+        """
+            Returns one list per scenario with the projected interest of each member (same order as members).
+            With b' = (b + flow) * (1 + r) each month, the final balance is balance * P + flow * S, where
+            P = prod(1 + r) and S = sum over months of the product of the remaining (1 + r); interest is what
+            remains after removing the balance and the flows. Members whose balance would turn negative on the
+            way are projected month by month instead, as DAV never pays interest on negative balances.
+        """
+        balances = [max(balance, 0.0) for _pc_id, _name, _vat, balance, _flow in members]
+        flows = [flow if self.project_flows else 0.0 for _pc_id, _name, _vat, _balance, flow in members]
+        months = self.horizon_months
+        results = []
+        for rate, days_per_year in scenarios:
+            month_rates = self._month_rates(rate, days_per_year)
+            growth = 1.0
+            flow_growth = 0.0
+            for month_rate in reversed(month_rates):
+                growth *= 1.0 + month_rate
+                flow_growth += growth
+            interests = [
+                balance * (growth - 1.0) + flow * (flow_growth - months)
+                if flow >= 0 or balance + flow * months >= 0
+                else self._project_member(balance, flow, month_rates)
+                for balance, flow in zip(balances, flows)
+            ]
+            results.append(interests)
+        return results
+
+    @api.model
+    def _project_member(self, balance, flow, month_rates):
+        interest = 0.0
+        for month_rate in month_rates:
+            balance = max(balance + flow, 0.0)
+            accrued = balance * month_rate
+            interest += accrued
+            balance += accrued
+        return interest
+
+    def _breakdown_csv(self, members, scenarios, interests, currency):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(
+            ['partner_contribution_id', 'socio', 'nit', 'saldo_actual', 'flujo_mensual']
+            + [f"interes_{rate:g}%_{days_per_year}" + ('_actual' if index == 0 else '')
+               for index, (rate, days_per_year) in enumerate(scenarios)]
+        )
+        for index, (pc_id, name, vat, balance, flow) in enumerate(members):
+            writer.writerow(
+                [pc_id, name, vat or '', currency.round(balance), currency.round(flow)]
+                + [currency.round(amounts[index]) for amounts in interests]
+            )
+        return buffer.getvalue().encode()
+
+
+class InterestSimulationScenario(models.TransientModel):
+    _name = 'contributions.manager.interest.simulation.scenario'
+    _description = 'Interest Rate What-If Scenario'
+    _order = 'is_current desc, interest_rate'
+
+    simulation_id = fields.Many2one('contributions.manager.interest.simulation', required=True, ondelete='cascade')
+    interest_rate = fields.Float(string='Tasa de Interés (%)')
+    days_per_year = fields.Char(string='Dias por Año')
+    is_current = fields.Boolean(string='Tasa Actual')
+    total_interest = fields.Float(string='Interés Proyectado')
+    difference = fields.Float(string='Diferencia vs. Actual')
+    average_interest = fields.Float(string='Promedio por Socio')
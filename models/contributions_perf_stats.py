@@ -0,0 +1,72 @@
+from odoo import api, fields, models, tools
+
+PERF_RETENTION_DAYS_PARAM = 'tel_capp_csm.perf_retention_days'
+
+
+class PerfStat(models.Model):
+    """
+        DOCSTRING: PerfStat model holding one sample per hot-path stage of a sampled batch (see profiling.py):
+        records processed, SQL queries and wall time. Rows are inserted in bulk before commit and purged by a
+        cron after tel_capp_csm.perf_retention_days days (30 by default).
+    """
+    _name = 'contributions.manager.perf.stat'
+    _description = 'Savings Hot-Path Sample'
+    _order = 'date desc, id desc'
+    _log_access = False
+
+    date = fields.Datetime(string='Fecha', required=True, readonly=True, index=True)
+    stage = fields.Char(string='Etapa', required=True, readonly=True)
+    model = fields.Char(string='Modelo', required=True, readonly=True)
+    record_count = fields.Integer(string='Registros', readonly=True)
+    query_count = fields.Integer(string='Consultas SQL', readonly=True)
+    duration = fields.Float(string='Duración (ms)', readonly=True)
+    user_id = fields.Many2one('res.users', string='Usuario', readonly=True, ondelete='set null')
+
+    @api.model
+    def _cron_purge(self):
+        days = int(self.env['ir.config_parameter'].sudo().get_param(PERF_RETENTION_DAYS_PARAM, 30))
+        self.env.cr.execute(f"""
+            DELETE FROM {self._table} WHERE date < (now() at time zone 'UTC') - %s * interval '1 day'
+        """, [days])
+        self.invalidate_model()
+
+
+class PerfStatReport(models.Model):
+    """
+        DOCSTRING: PerfStatReport SQL view with the daily p50/p95 wall time and query count of each stage.
+    """
+    _name = 'contributions.manager.perf.stat.report'
+    _description = 'Savings Hot-Path Percentiles'
+    _auto = False
+    _order = 'day desc, model, stage'
+
+    day = fields.Date(string='Día', readonly=True)
+    stage = fields.Char(string='Etapa', readonly=True)
+    model = fields.Char(string='Modelo', readonly=True)
+    sample_count = fields.Integer(string='Muestras', readonly=True)
+    record_count = fields.Integer(string='Registros', readonly=True)
+    p50_duration = fields.Float(string='p50 (ms)', readonly=True, aggregator='max')
+    p95_duration = fields.Float(string='p95 (ms)', readonly=True, aggregator='max')
+    p50_query_count = fields.Float(string='p50 Consultas', readonly=True, aggregator='max')
+    p95_query_count = fields.Float(string='p95 Consultas', readonly=True, aggregator='max')
+    p95_duration_per_record = fields.Float(string='p95 por Registro (ms)', readonly=True, aggregator='max')
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT ROW_NUMBER() OVER (ORDER BY date_trunc('day', date), model, stage) AS id,
+                       date_trunc('day', date)::date AS day,
+                       stage,
+                       model,
+                       COUNT(*) AS sample_count,
+                       SUM(record_count) AS record_count,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY duration) AS p50_duration,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duration) AS p95_duration,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY query_count) AS p50_query_count,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY query_count) AS p95_query_count,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duration / GREATEST(record_count, 1)) AS p95_duration_per_record
+                  FROM contributions_manager_perf_stat
+                 GROUP BY date_trunc('day', date), model, stage
+            )
+        """)
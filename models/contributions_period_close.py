@@ -0,0 +1,252 @@
+import datetime
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+from .contributions_balance import REGISTERED_FLOWS_QUERY
+
+
+class PeriodClose(models.Model):
+    """
+        DOCSTRING: PeriodClose model closing a fiscal period for one company.
+        Registered contributions and withdrawals dated before the cutoff are moved into the archive tables with
+        set-based statements, one opening balance is written per partner contribution with archived transactions,
+        and the close is rolled back unless every opening balance agrees with the daily ledger and with
+        current_amount. Once closed, no transaction can be registered before the cutoff.
+    """
+    _name = 'contributions.manager.period.close'
+    _description = 'Savings Period Close'
+    _inherit = ['mail.thread']
+    _order = 'cutoff_date desc, id desc'
+
+    name = fields.Char(string='Descripción', required=True, default=lambda self: f"Cierre {fields.Date.context_today(self)}")
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, default=lambda self: self.env.company)
+    cutoff_date = fields.Date(string='Fecha de Corte', required=True, tracking=True, help="Las transacciones registradas con fecha anterior a esta se archivan.")
+    state = fields.Selection([('draft', 'Borrador'), ('done', 'Cerrado')], string='Estado', required=True, default='draft', readonly=True, tracking=True)
+    archived_contribution_count = fields.Integer(string='Aportaciones Archivadas', readonly=True)
+    archived_withdrawal_count = fields.Integer(string='Retiros Archivados', readonly=True)
+    opening_balance_ids = fields.One2many('contributions.manager.opening.balance', 'period_close_id', string='Saldos de Apertura', readonly=True)
+
+    # Validations
+    @api.constrains('cutoff_date', 'company_id')
+    def _check_cutoff_date(self):
+        for close in self:
+            if close.cutoff_date > fields.Date.context_today(close):
+                raise ValidationError("La fecha de corte no puede ser posterior a hoy.")
+
+    # Actions
+    def action_close(self):
+        for close in self:
+            if close.state != 'draft':
+                raise ValidationError("Solo se pueden ejecutar cierres en borrador.")
+            close._close()
+
+    # Processing
+    @api.model
+    def _get_closed_cutoffs(self, company_ids):
+        """
+            Returns {company_id: latest closed cutoff date} for the given companies in a single query.
+        """
+        return {
+            company.id: cutoff
+            for company, cutoff in self._read_group(
+                [('company_id', 'in', list(company_ids)), ('state', '=', 'done')], ['company_id'], ['cutoff_date:max']
+            )
+        }
+
+    def _close(self):
+        self.ensure_one()
+        previous = self._get_closed_cutoffs(self.company_id.ids).get(self.company_id.id)
+        if previous and self.cutoff_date <= previous:
+            raise ValidationError(f"La fecha de corte debe ser posterior al último cierre ({previous}).")
+        self._check_interest_capitalized()
+        for model in ('contributions.manager.contribution', 'contributions.manager.withdrawal',
+                      'contributions.manager.interest.line', 'contributions.manager.partner.contribution',
+                      'contributions.manager.balance.snapshot'):
+            self.env[model].flush_model()
+
+        # Lock the company's balances in id order, like _apply_balance_deltas, so no registration interleaves.
+        self.env.cr.execute("""
+            SELECT id FROM contributions_manager_partner_contribution
+             WHERE company_id = %s ORDER BY id FOR NO KEY UPDATE
+        """, [self.company_id.id])
+
+        params = {'company_id': self.company_id.id, 'cutoff': self.cutoff_date, 'close_id': self.id, 'uid': self.env.uid}
+        contribution_map = self._archive_transactions('contributions.manager.contribution', 'contribution_status', params)
+        withdrawal_map = self._archive_transactions('contributions.manager.withdrawal', 'withdrawal_status', params)
+        self._create_opening_balances(params)
+        self._check_opening_balances()
+        self.write({
+            'state': 'done',
+            'archived_contribution_count': len(contribution_map),
+            'archived_withdrawal_count': len(withdrawal_map),
+        })
+        self.message_post(
+            body=f"Período cerrado al {self.cutoff_date}: {len(contribution_map)} aportaciones y "
+                 f"{len(withdrawal_map)} retiros archivados, {len(self.opening_balance_ids)} saldos de apertura."
+        )
+
+    def _check_interest_capitalized(self):
+        """
+            Interest is computed from the opening balances afterwards, which is only exact when every
+            interest-bearing balance with history before the cutoff was capitalized up to the cutoff.
+        """
+        self.env.cr.execute("""
+            SELECT COUNT(*)
+              FROM contributions_manager_partner_contribution pc
+              JOIN contributions_manager_contribution_type t ON t.id = pc.contribution_type_id
+             WHERE pc.company_id = %(company_id)s
+               AND t.interest_rate > 0
+               AND (pc.last_capitalization_date IS NULL OR pc.last_capitalization_date < %(cutoff)s)
+               AND EXISTS (SELECT 1
+                             FROM contributions_manager_contribution c
+                            WHERE c.partner_id = pc.partner_id
+                              AND c.contribution_type_id = pc.contribution_type_id
+                              AND c.company_id = pc.company_id
+                              AND c.contribution_status = 'registered'
+                              AND c.date < %(cutoff)s)
+        """, {'company_id': self.company_id.id, 'cutoff': self.cutoff_date})
+        pending = self.env.cr.fetchone()[0]
+        if pending:
+            raise ValidationError(
+                f"Hay {pending} aportaciones con intereses sin capitalizar antes de la fecha de corte. "
+                "Capitalice los intereses antes de cerrar el período."
+            )
+
+    def _archive_transactions(self, model_name, status_field, params):
+        """
+            Moves the registered transactions of model_name dated before the cutoff into its archive table with
+            one DELETE ... RETURNING feeding an INSERT, re-points their chatter to the archived records and
+            returns {original_id: archive_id}.
+        """
+        Model = self.env[model_name]
+        Archive = self.env[f'{model_name}.archive']
+        extra_columns = ', internal_use, payment_id, invoice_id' if model_name == 'contributions.manager.withdrawal' else ''
+        # Internal-use withdrawals stay active: unused ones are still pending for the payment wizard, and used ones
+        # are referenced by their payment, whose internal_withdrawal_id the DELETE would silently clear.
+        extra_filter = """
+            AND NOT t.internal_use
+            AND NOT EXISTS (SELECT 1 FROM account_payment p WHERE p.internal_withdrawal_id = t.id)
+        """ if extra_columns else ''
+        self.env.cr.execute(f"""
+            WITH moved AS (
+                DELETE FROM {Model._table} t
+                 WHERE t.company_id = %(company_id)s
+                   AND t.{status_field} = 'registered'
+                   AND t.date < %(cutoff)s
+                   {extra_filter}
+             RETURNING t.*
+            )
+            INSERT INTO {Archive._table} (original_id, reference, partner_id, contribution_type_id, company_id, amount,
+                                          date, move_id, move_line_id, period_close_id, external_key{extra_columns},
+                                          create_uid, create_date, write_uid, write_date)
+            SELECT id, reference, partner_id, contribution_type_id, company_id, amount,
+                   date, move_id, move_line_id, %(close_id)s, external_key{extra_columns},
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM moved
+         RETURNING original_id, id
+        """, params)
+        mapping = dict(self.env.cr.fetchall())
+        if mapping:
+            self.env.cr.execute("""
+                UPDATE mail_message m
+                   SET model = %s, res_id = v.archive_id
+                  FROM unnest(%s::int[], %s::int[]) AS v(original_id, archive_id)
+                 WHERE m.model = %s AND m.res_id = v.original_id
+            """, [Archive._name, list(mapping), list(mapping.values()), Model._name])
+            self.env.cr.execute("DELETE FROM mail_followers WHERE res_model = %s AND res_id = ANY(%s)", [Model._name, list(mapping)])
+            self.env.cr.execute("""
+                DELETE FROM mail_activity
+                 WHERE res_model_id = (SELECT id FROM ir_model WHERE model = %s) AND res_id = ANY(%s)
+            """, [Model._name, list(mapping)])
+        self.env.invalidate_all()
+        return mapping
+
+    def _create_opening_balances(self, params):
+        """
+            Writes one opening balance per partner contribution with transactions archived by this close: the
+            net of its archived transactions, and its balance on the ledger at the end of the day before the cutoff.
+        """
+        OpeningBalance = self.env['contributions.manager.opening.balance']
+        self.env.cr.execute(f"""
+            WITH archived AS (
+                SELECT partner_id, contribution_type_id, company_id, amount
+                  FROM contributions_manager_contribution_archive
+                 WHERE period_close_id = %(close_id)s
+                 UNION ALL
+                SELECT partner_id, contribution_type_id, company_id, -amount
+                  FROM contributions_manager_withdrawal_archive
+                 WHERE period_close_id = %(close_id)s
+            )
+            INSERT INTO {OpeningBalance._table} (period_close_id, partner_contribution_id, company_id, date, amount, balance,
+                                                 create_uid, create_date, write_uid, write_date)
+            SELECT %(close_id)s, pc.id, pc.company_id, %(opening_date)s, SUM(a.amount),
+                   COALESCE((SELECT s.balance
+                               FROM contributions_manager_balance_snapshot s
+                              WHERE s.partner_contribution_id = pc.id AND s.date <= %(opening_date)s
+                              ORDER BY s.date DESC
+                              LIMIT 1), 0.0),
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM archived a
+              JOIN contributions_manager_partner_contribution pc
+                ON pc.partner_id = a.partner_id
+               AND pc.contribution_type_id = a.contribution_type_id
+               AND pc.company_id = a.company_id
+             GROUP BY pc.id, pc.company_id
+        """, dict(params, opening_date=self.cutoff_date - datetime.timedelta(days=1)))
+        self.env.invalidate_all()
+
+    def _check_opening_balances(self):
+        """
+            Every opening balance must equal the sum of all flows before the cutoff, and the opening balance plus
+            the flows from the cutoff on must equal current_amount. Raises (rolling the close back) otherwise.
+        """
+        self.env.cr.execute(f"""
+            WITH flows AS ({REGISTERED_FLOWS_QUERY}),
+            totals AS (
+                SELECT f.pc_id,
+                       SUM(f.amount) FILTER (WHERE f.date < %(cutoff)s) AS before_cutoff,
+                       SUM(f.amount) FILTER (WHERE f.date >= %(cutoff)s) AS after_cutoff
+                  FROM flows f
+                  JOIN contributions_manager_opening_balance o ON o.partner_contribution_id = f.pc_id
+                 WHERE o.period_close_id = %(close_id)s
+                 GROUP BY f.pc_id
+            )
+            SELECT pc.id
+              FROM contributions_manager_opening_balance o
+              JOIN contributions_manager_partner_contribution pc ON pc.id = o.partner_contribution_id
+              LEFT JOIN totals t ON t.pc_id = pc.id
+             WHERE o.period_close_id = %(close_id)s
+               AND (ROUND((o.balance - COALESCE(t.before_cutoff, 0.0))::numeric, 2) <> 0
+                    OR ROUND((o.balance + COALESCE(t.after_cutoff, 0.0) - pc.current_amount)::numeric, 2) <> 0)
+        """, {'close_id': self.id, 'cutoff': self.cutoff_date})
+        mismatched = self.env['contributions.manager.partner.contribution'].browse([row[0] for row in self.env.cr.fetchall()])
+        if mismatched:
+            raise ValidationError(
+                "Los saldos de apertura no cuadran con el libro de saldos o con el monto actual en: "
+                + ", ".join(f"{pc.partner_id.name} - {pc.contribution_type_id.contribution_name}" for pc in mismatched[:20])
+                + ". Ejecute una conciliación de saldos antes de cerrar el período."
+            )
+
+
+class OpeningBalance(models.Model):
+    """
+        DOCSTRING: OpeningBalance model holding, for one period close and partner contribution, the net amount of
+        the archived transactions and the balance at the end of the day before the cutoff.
+    """
+    _name = 'contributions.manager.opening.balance'
+    _description = 'Partner Contribution Opening Balance'
+    _order = 'date desc, id'
+
+    period_close_id = fields.Many2one('contributions.manager.period.close', string='Cierre', required=True, readonly=True, ondelete='restrict', index=True)
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, readonly=True, ondelete='restrict')
+    partner_id = fields.Many2one(related='partner_contribution_id.partner_id', string='Cliente / Asociado')
+    contribution_type_id = fields.Many2one(related='partner_contribution_id.contribution_type_id', string='Tipo de Contribución')
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, readonly=True)
+    date = fields.Date(string='Fecha', required=True, readonly=True)
+    amount = fields.Float(string='Neto Archivado', readonly=True, help="Aportaciones menos retiros archivados por este cierre.")
+    balance = fields.Float(string='Saldo de Apertura', readonly=True, help="Saldo de la aportación al cierre del día anterior al corte.")
+
+    _sql_constraints = [
+        ('unique_opening_balance_close_partner_contribution', 'UNIQUE(partner_contribution_id, period_close_id)', 'Solo puede existir un saldo de apertura por aportación y cierre.'),
+    ]
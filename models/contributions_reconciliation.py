@@ -0,0 +1,182 @@
+from odoo import api, fields, models
+
+from .contributions_balance import REGISTERED_FLOWS_QUERY
+
+
+class Reconciliation(models.Model):
+    """
+        DOCSTRING: Reconciliation model comparing, for every partner contribution, current_amount with the net of its
+        registered transactions, and for every partner and saving account, the sum of the current amounts of the
+        types using that account with the partner balance on it (types may share a saving account).
+        All companies are computed with one grouped aggregate query on the request cursor, so uncommitted changes
+        of the transaction are included, and only discrepancies are stored. Repair mode rewrites current_amount
+        from the transaction totals of each partner contribution. Saving accounts shared by several types are only
+        flagged: the ledger difference on them cannot be attributed to a single type.
+    """
+    _name = 'contributions.manager.reconciliation'
+    _description = 'Balance Reconciliation'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(string='Descripción', required=True, default=lambda self: f"Conciliación {fields.Date.context_today(self)}")
+    company_ids = fields.Many2many('res.company', string='Empresas', required=True, default=lambda self: self.env.companies)
+    repair = fields.Boolean(string='Reparar Saldos', tracking=True, help="Reescribe el monto actual de las aportaciones con diferencias usando el total de transacciones registradas.")
+    state = fields.Selection([('draft', 'Borrador'), ('done', 'Terminado')], string='Estado', required=True, default='draft', readonly=True, tracking=True)
+    checked_count = fields.Integer(string='Aportaciones Revisadas', readonly=True)
+    discrepancy_count = fields.Integer(string='Diferencias Encontradas', readonly=True)
+    line_ids = fields.One2many('contributions.manager.reconciliation.line', 'reconciliation_id', string='Diferencias', readonly=True)
+
+    # Actions
+    def action_run(self):
+        for reconciliation in self:
+            reconciliation._run()
+
+    @api.model
+    def _cron_reconcile(self):
+        self.create({'company_ids': [(6, 0, self.env['res.company'].search([]).ids)]})._run()
+
+    # Processing
+    def _run(self):
+        self.ensure_one()
+        for model in ('contributions.manager.contribution', 'contributions.manager.withdrawal',
+                      'contributions.manager.interest.line', 'contributions.manager.partner.contribution',
+                      'contributions.manager.contribution.type', 'account.move.line'):
+            self.env[model].flush_model()
+
+        checked, rows = self._compute_figures(self.company_ids.ids)
+        repairable = {
+            pc_id for pc_id, current_amount, transactions_amount, _expected, _ledger, _shared in rows
+            if round(current_amount - transactions_amount, 2) != 0
+        }
+        self.env['contributions.manager.reconciliation.line'].create([{
+            'reconciliation_id': self.id,
+            'partner_contribution_id': pc_id,
+            'current_amount': current_amount,
+            'transactions_amount': transactions_amount,
+            'account_expected_amount': account_expected_amount,
+            'ledger_amount': ledger_amount,
+            'shared_account': shared,
+            'repaired': self.repair and pc_id in repairable,
+        } for pc_id, current_amount, transactions_amount, account_expected_amount, ledger_amount, shared in rows])
+        if self.repair:
+            self._repair_balances([
+                (pc_id, transactions_amount)
+                for pc_id, _current, transactions_amount, _expected, _ledger, _shared in rows
+                if pc_id in repairable
+            ])
+        self.write({'state': 'done', 'checked_count': checked, 'discrepancy_count': len(rows)})
+
+    def _compute_figures(self, company_ids):
+        """
+            Returns (checked_count, [(pc_id, current_amount, transactions_amount, account_expected_amount,
+            ledger_amount, shared_account), ...]) for the partner contributions of the companies whose figures
+            disagree, using a single aggregate query. The ledger is compared per partner and saving account:
+            account_expected_amount sums the current amounts of every type of the partner on that account.
+        """
+        cr = self.env.cr
+        cr.execute(f"""
+            WITH flows AS ({REGISTERED_FLOWS_QUERY}),
+            pcs AS (
+                SELECT pc.id, pc.partner_id, pc.company_id, pc.current_amount, t.saving_account AS account_id
+                  FROM contributions_manager_partner_contribution pc
+                  JOIN contributions_manager_contribution_type t ON t.id = pc.contribution_type_id
+                 WHERE pc.company_id = ANY(%(company_ids)s)
+            ),
+            shared AS (
+                SELECT saving_account AS account_id
+                  FROM contributions_manager_contribution_type
+                 GROUP BY saving_account
+                HAVING COUNT(*) > 1
+            ),
+            transactions AS (
+                SELECT f.pc_id, SUM(f.amount) AS amount
+                  FROM flows f
+                  JOIN pcs ON pcs.id = f.pc_id
+                 GROUP BY f.pc_id
+            ),
+            accounts AS (
+                SELECT company_id, partner_id, account_id, SUM(current_amount) AS expected_amount
+                  FROM pcs
+                 GROUP BY company_id, partner_id, account_id
+            ),
+            ledger AS (
+                SELECT a.company_id, a.partner_id, a.account_id, -SUM(aml.balance) AS amount
+                  FROM accounts a
+                  JOIN account_move_line aml
+                    ON aml.company_id = a.company_id
+                   AND aml.partner_id = a.partner_id
+                   AND aml.account_id = a.account_id
+                 WHERE aml.parent_state = 'posted'
+                 GROUP BY a.company_id, a.partner_id, a.account_id
+            ),
+            figures AS (
+                SELECT pcs.id, pcs.current_amount,
+                       COALESCE(transactions.amount, 0.0) AS transactions_amount,
+                       accounts.expected_amount AS account_expected_amount,
+                       COALESCE(ledger.amount, 0.0) AS ledger_amount,
+                       shared.account_id IS NOT NULL AS shared_account
+                  FROM pcs
+                  JOIN accounts
+                    ON accounts.company_id = pcs.company_id
+                   AND accounts.partner_id = pcs.partner_id
+                   AND accounts.account_id = pcs.account_id
+                  LEFT JOIN transactions ON transactions.pc_id = pcs.id
+                  LEFT JOIN ledger
+                    ON ledger.company_id = accounts.company_id
+                   AND ledger.partner_id = accounts.partner_id
+                   AND ledger.account_id = accounts.account_id
+                  LEFT JOIN shared ON shared.account_id = pcs.account_id
+            )
+            SELECT id, current_amount, transactions_amount, account_expected_amount, ledger_amount, shared_account
+              FROM figures
+             WHERE ROUND((current_amount - transactions_amount)::numeric, 2) <> 0
+                OR ROUND((account_expected_amount - ledger_amount)::numeric, 2) <> 0
+        """, {'company_ids': company_ids})
+        rows = cr.fetchall()
+        cr.execute("SELECT COUNT(*) FROM contributions_manager_partner_contribution WHERE company_id = ANY(%s)", [company_ids])
+        return cr.fetchone()[0], rows
+
+    def _repair_balances(self, balances):
+        if not balances:
+            return
+        ids = [pc_id for pc_id, _amount in sorted(balances)]
+        amounts = [amount for _pc_id, amount in sorted(balances)]
+        PartnerContribution = self.env['contributions.manager.partner.contribution']
+        self.env.cr.execute(f"""
+            UPDATE {PartnerContribution._table} AS pc
+               SET current_amount = v.amount,
+                   available_amount = v.amount - pc.reserved_amount,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::float8[]) AS v(id, amount)
+             WHERE pc.id = v.id
+        """, [self.env.uid, ids, amounts])
+        PartnerContribution.browse(ids).invalidate_recordset(['current_amount', 'available_amount', 'write_uid', 'write_date'])
+        self.env['res.partner']._rebuild_savings_totals(PartnerContribution.browse(ids).partner_id.ids)
+        self.message_post(body=f"Saldos reparados: {len(ids)}.")
+
+
+class ReconciliationLine(models.Model):
+    _name = 'contributions.manager.reconciliation.line'
+    _description = 'Balance Reconciliation Discrepancy'
+    _order = 'id'
+
+    reconciliation_id = fields.Many2one('contributions.manager.reconciliation', required=True, ondelete='cascade', index=True)
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, ondelete='cascade')
+    partner_id = fields.Many2one(related='partner_contribution_id.partner_id', string='Cliente / Asociado')
+    contribution_type_id = fields.Many2one(related='partner_contribution_id.contribution_type_id', string='Tipo de Contribución')
+    saving_account_id = fields.Many2one(related='partner_contribution_id.contribution_type_id.saving_account', string='Cuenta de Ahorro')
+    current_amount = fields.Float(string='Monto Actual', readonly=True)
+    transactions_amount = fields.Float(string='Total Transacciones', readonly=True)
+    account_expected_amount = fields.Float(string='Saldo Esperado en la Cuenta', readonly=True, help="Suma de los montos actuales de todos los tipos del asociado que usan esta cuenta de ahorro.")
+    ledger_amount = fields.Float(string='Saldo Contable de la Cuenta', readonly=True, help="Saldo del asociado en la cuenta de ahorro.")
+    shared_account = fields.Boolean(string='Cuenta Compartida', readonly=True, help="La cuenta de ahorro es usada por varios tipos de contribución: la diferencia contable corresponde a todos ellos y no puede atribuirse a un solo tipo.")
+    transactions_difference = fields.Float(string='Diferencia vs Transacciones', compute='_compute_differences')
+    ledger_difference = fields.Float(string='Diferencia vs Contabilidad', compute='_compute_differences')
+    repaired = fields.Boolean(string='Reparado', readonly=True)
+
+    @api.depends('current_amount', 'transactions_amount', 'account_expected_amount', 'ledger_amount')
+    def _compute_differences(self):
+        for line in self:
+            line.transactions_difference = line.current_amount - line.transactions_amount
+            line.ledger_difference = line.account_expected_amount - line.ledger_amount
@@ -0,0 +1,141 @@
+from collections import defaultdict
+
+from odoo import api, fields, models, tools
+
+from .contributions_balance import REGISTERED_FLOWS_QUERY
+
+
+class MonthlyReport(models.Model):
+    """
+        DOCSTRING: MonthlyReport model holding the pre-aggregated monthly flows of each partner contribution.
+        One row per partner contribution and month with inflows, outflows, net flow and closing balance. It is
+        maintained incrementally by PartnerContribution._apply_balance_deltas, so dashboards never aggregate
+        the transaction tables.
+    """
+    _name = 'contributions.manager.report.monthly'
+    _description = 'Monthly Savings Report'
+    _order = 'month desc, partner_id'
+
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, readonly=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, readonly=True)
+    contribution_type_id = fields.Many2one('contributions.manager.contribution.type', string='Tipo de Contribución', required=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', required=True, readonly=True)
+    month = fields.Date(string='Mes', required=True, readonly=True, help="Primer día del mes.")
+    inflow = fields.Float(string='Entradas', readonly=True)
+    outflow = fields.Float(string='Salidas', readonly=True)
+    net_flow = fields.Float(string='Flujo Neto', readonly=True)
+    # Rows only exist for months with movements, so summing closing balances over a month would leave out the
+    # members without movements that month: balances by month or type come from balances_at instead.
+    closing_balance = fields.Float(string='Saldo al Cierre', readonly=True, aggregator=None, help="Saldo al cierre del mes de esta aportación. No se suma al agrupar: solo hay filas en los meses con movimientos.")
+
+    _sql_constraints = [
+        ('unique_report_partner_contribution_month', 'UNIQUE(partner_contribution_id, month)', 'Solo puede existir una fila mensual por aportación.'),
+    ]
+
+    def init(self):
+        tools.create_index(
+            self.env.cr, 'contributions_manager_report_monthly_company_type_month_idx', self._table,
+            ['company_id', 'contribution_type_id', 'month']
+        )
+        self.env.cr.execute(f"SELECT 1 FROM {self._table} LIMIT 1")
+        if not self.env.cr.fetchone():
+            self._rebuild_report()
+
+    @api.model
+    def _record_movements(self, movements, flow=None):
+        """
+            Adds signed movements [(partner_contribution_id, date, amount), ...] to their monthly rows and
+            carries the net amount into the closing balance of every later month.
+            flow ('contribution' or 'withdrawal') keeps the movements on that side whatever their sign, so a
+            reversal takes the original amount back out of its inflow or outflow, as if it had never been
+            registered (which is what _rebuild_report sees); other movements (interest) go by their sign.
+        """
+        inflows = defaultdict(float)
+        outflows = defaultdict(float)
+        for pc_id, date, amount in movements:
+            key = (pc_id, date.replace(day=1))
+            if flow == 'contribution' or (not flow and amount > 0):
+                inflows[key] += amount
+            elif flow == 'withdrawal' or (not flow and amount < 0):
+                outflows[key] -= amount
+        keys = sorted(set(inflows) | set(outflows))
+        if not keys:
+            return
+        params = {
+            'uid': self.env.uid,
+            'pc_ids': [pc_id for pc_id, _month in keys],
+            'months': [month for _pc_id, month in keys],
+            'inflows': [inflows[key] for key in keys],
+            'outflows': [outflows[key] for key in keys],
+        }
+        self.flush_model()
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (partner_contribution_id, company_id, contribution_type_id, partner_id, month,
+                                       inflow, outflow, net_flow, closing_balance,
+                                       create_uid, create_date, write_uid, write_date)
+            SELECT v.pc_id, pc.company_id, pc.contribution_type_id, pc.partner_id, v.month,
+                   0.0, 0.0, 0.0,
+                   COALESCE((SELECT r.closing_balance
+                               FROM {self._table} r
+                              WHERE r.partner_contribution_id = v.pc_id AND r.month < v.month
+                              ORDER BY r.month DESC
+                              LIMIT 1), 0.0),
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM unnest(%(pc_ids)s::int[], %(months)s::date[]) AS v(pc_id, month)
+              JOIN contributions_manager_partner_contribution pc ON pc.id = v.pc_id
+                ON CONFLICT (partner_contribution_id, month) DO NOTHING
+        """, params)
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS r
+               SET inflow = r.inflow + v.inflow,
+                   outflow = r.outflow + v.outflow,
+                   net_flow = r.net_flow + v.inflow - v.outflow
+              FROM unnest(%(pc_ids)s::int[], %(months)s::date[], %(inflows)s::float8[], %(outflows)s::float8[])
+                   AS v(pc_id, month, inflow, outflow)
+             WHERE r.partner_contribution_id = v.pc_id AND r.month = v.month
+        """, params)
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS r
+               SET closing_balance = r.closing_balance + x.amount,
+                   write_uid = %(uid)s,
+                   write_date = (now() at time zone 'UTC')
+              FROM (
+                    SELECT r2.id, SUM(v.inflow - v.outflow) AS amount
+                      FROM {self._table} r2
+                      JOIN unnest(%(pc_ids)s::int[], %(months)s::date[], %(inflows)s::float8[], %(outflows)s::float8[])
+                           AS v(pc_id, month, inflow, outflow)
+                        ON r2.partner_contribution_id = v.pc_id AND r2.month >= v.month
+                     GROUP BY r2.id
+                   ) AS x
+             WHERE r.id = x.id
+        """, params)
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild_report(self):
+        """
+            Rebuilds the whole report from the registered transaction history in a single statement.
+        """
+        for model in ('contributions.manager.contribution', 'contributions.manager.withdrawal', 'contributions.manager.interest.line'):
+            self.env[model].flush_model()
+        self.env.cr.execute(f"DELETE FROM {self._table}")
+        self.env.cr.execute(f"""
+            WITH flows AS ({REGISTERED_FLOWS_QUERY}),
+            months AS (
+                SELECT pc_id, date_trunc('month', date)::date AS month,
+                       SUM(GREATEST(amount, 0.0)) AS inflow,
+                       SUM(GREATEST(-amount, 0.0)) AS outflow
+                  FROM flows
+                 GROUP BY pc_id, date_trunc('month', date)::date
+            )
+            INSERT INTO {self._table} (partner_contribution_id, company_id, contribution_type_id, partner_id, month,
+                                       inflow, outflow, net_flow, closing_balance,
+                                       create_uid, create_date, write_uid, write_date)
+            SELECT m.pc_id, pc.company_id, pc.contribution_type_id, pc.partner_id, m.month,
+                   m.inflow, m.outflow, m.inflow - m.outflow,
+                   SUM(m.inflow - m.outflow) OVER (PARTITION BY m.pc_id ORDER BY m.month),
+                   %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+              FROM months m
+              JOIN contributions_manager_partner_contribution pc ON pc.id = m.pc_id
+        """, {'uid': self.env.uid})
+        self.invalidate_model()
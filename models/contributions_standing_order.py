@@ -0,0 +1,218 @@
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+from .transaction_posting import BULK_MODE_CONTEXT
+
+_logger = logging.getLogger(__name__)
+
+STANDING_ORDER_CHUNK = 5000
+FREQUENCY_STEPS = {
+    'weekly': relativedelta(weeks=1),
+    'biweekly': relativedelta(weeks=2),
+    'monthly': relativedelta(months=1),
+}
+
+
+class StandingOrder(models.Model):
+    """
+        DOCSTRING: StandingOrder model scheduling a recurring contribution on a partner contribution.
+        A cron job generates every due contribution with one multi-create per chunk, optionally confirms them or
+        sends them to the registration queue, and advances the next dates with one UPDATE. Each order generates
+        at most one contribution per period date (unique constraint on the contribution), so re-running is safe.
+        An order that fails (e.g. a disabled contribution type) keeps its error and is retried on the next run
+        without blocking the other orders.
+    """
+    _name = 'contributions.manager.standing.order'
+    _description = 'Contribution Standing Order'
+    _inherit = ['mail.thread']
+    _order = 'next_date, id'
+
+    partner_contribution_id = fields.Many2one('contributions.manager.partner.contribution', string='Aportación del Socio', required=True, tracking=True, ondelete='cascade', domain="[('enabled', '=', True)]")
+    partner_id = fields.Many2one(related='partner_contribution_id.partner_id', string='Cliente / Asociado', store=True)
+    contribution_type_id = fields.Many2one(related='partner_contribution_id.contribution_type_id', string='Tipo de Contribución', store=True)
+    company_id = fields.Many2one(related='partner_contribution_id.company_id', string='Empresa', store=True)
+    amount = fields.Float(string='Monto', required=True, tracking=True)
+    frequency = fields.Selection([
+        ('weekly', 'Semanal'),
+        ('biweekly', 'Quincenal (cada 2 semanas)'),
+        ('monthly', 'Mensual'),
+    ], string='Frecuencia', required=True, default='monthly', tracking=True)
+    start_date = fields.Date(string='Fecha de Inicio', required=True, default=fields.Date.context_today, tracking=True)
+    end_date = fields.Date(string='Fecha de Fin', tracking=True)
+    next_date = fields.Date(string='Próxima Fecha', readonly=True, copy=False)
+    generated_count = fields.Integer(string='Aportaciones Generadas', readonly=True, copy=False)
+    auto_process = fields.Selection([
+        ('draft', 'Dejar en Borrador'),
+        ('confirm', 'Confirmar'),
+        ('register', 'Confirmar y Contabilizar'),
+    ], string='Al Generar', required=True, default='confirm', tracking=True)
+    active = fields.Boolean(string='Activo', default=True, tracking=True)
+    contribution_ids = fields.One2many('contributions.manager.contribution', 'standing_order_id', string='Aportaciones', readonly=True)
+    last_error = fields.Text(string='Último Error', readonly=True, copy=False, help="Error de la última generación fallida; se borra cuando la orden vuelve a generar su aportación.")
+
+    # Validations
+    @api.constrains('amount', 'start_date', 'end_date')
+    def _check_schedule(self):
+        for order in self:
+            if order.amount <= 0:
+                raise ValidationError("El monto de la orden permanente debe ser mayor que 0.")
+            if order.end_date and order.end_date < order.start_date:
+                raise ValidationError("La fecha de fin no puede ser anterior a la fecha de inicio.")
+
+    # Overrides
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            vals['next_date'] = vals.get('start_date') or fields.Date.context_today(self)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'start_date' in vals or 'frequency' in vals:
+            for order in self:
+                if order.generated_count:
+                    raise ValidationError("No se puede cambiar la fecha de inicio ni la frecuencia de una orden que ya generó aportaciones.")
+        res = super().write(vals)
+        if 'start_date' in vals:
+            self.filtered(lambda order: not order.generated_count).write({'next_date': vals['start_date']})
+        return res
+
+    # Generation
+    @api.model
+    def _cron_generate_contributions(self):
+        self._generate_due_contributions(fields.Date.context_today(self))
+
+    @api.model
+    def _generate_due_contributions(self, until):
+        """
+            Generates every contribution due up to until. Orders late by several periods are caught up one period
+            per pass. Each chunk is locked with SKIP LOCKED, so concurrent runs never pick the same orders, and
+            orders that failed are left out for the rest of the run.
+            Returns the number of contributions created.
+        """
+        commit = not self.env.registry.in_test_mode()
+        created = 0
+        failed_ids = []
+        while True:
+            self.flush_model()
+            self.env.cr.execute(f"""
+                SELECT o.id
+                  FROM {self._table} o
+                  JOIN contributions_manager_partner_contribution pc ON pc.id = o.partner_contribution_id
+                 WHERE o.active
+                   AND pc.enabled
+                   AND o.next_date <= %(until)s
+                   AND (o.end_date IS NULL OR o.next_date <= o.end_date)
+                   AND o.id <> ALL(%(failed_ids)s::int[])
+                 ORDER BY o.id
+                 LIMIT %(limit)s
+                   FOR UPDATE OF o SKIP LOCKED
+            """, {'until': until, 'limit': STANDING_ORDER_CHUNK, 'failed_ids': failed_ids})
+            orders = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not orders:
+                return created
+            chunk_created, failed = orders._generate_isolating_failures()
+            created += chunk_created
+            failed_ids.extend(failed.ids)
+            if commit:
+                self.env.cr.commit()
+
+    def _generate_isolating_failures(self):
+        """
+            Generates the chunk in one pass and, if that fails, order by order, each in its own savepoint, so one
+            invalid order only rolls back itself. Failing orders keep their error in last_error.
+            Returns (created_count, failed_orders).
+        """
+        try:
+            with self.env.cr.savepoint():
+                return self._generate_next_contributions(), self.browse()
+        except Exception:
+            self.env.invalidate_all()
+        created = 0
+        failed = self.browse()
+        for order in self:
+            try:
+                with self.env.cr.savepoint():
+                    created += order._generate_next_contributions()
+            except Exception as error:
+                self.env.invalidate_all()
+                _logger.warning("Standing order %s failed: %s", order.id, error)
+                order.last_error = str(error)
+                failed |= order
+        return created, failed
+
+    def _generate_next_contributions(self):
+        """
+            Creates the contribution of the current period of every order in self with one multi-create, skips
+            periods already generated, processes the new contributions and advances the orders.
+        """
+        Contribution = self.env['contributions.manager.contribution'].with_context(**BULK_MODE_CONTEXT)
+        existing = {
+            (order.id, date)
+            for order, date in Contribution._read_group(
+                [('standing_order_id', 'in', self.ids), ('date', 'in', list(set(self.mapped('next_date'))))],
+                ['standing_order_id', 'date:day'],
+            )
+        }
+        to_generate = self.filtered(lambda order: (order.id, order.next_date) not in existing)
+        contributions = Contribution.create([{
+            'partner_id': order.partner_id.id,
+            'contribution_type_id': order.contribution_type_id.id,
+            'company_id': order.company_id.id,
+            'amount': order.amount,
+            'date': order.next_date,
+            'standing_order_id': order.id,
+        } for order in to_generate])
+        self._process_generated_contributions(contributions)
+        self._advance()
+        return len(contributions)
+
+    def _process_generated_contributions(self, contributions):
+        to_confirm = contributions.filtered(lambda rec: rec.standing_order_id.auto_process in ('confirm', 'register'))
+        if to_confirm:
+            to_confirm.action_confirm()
+        to_register = to_confirm.filtered(lambda rec: rec.standing_order_id.auto_process == 'register')
+        if to_register:
+            to_register.action_register_queued()
+
+    def _advance(self):
+        """
+            Moves every order to its next period with one UPDATE; next dates are computed from the start date, so
+            month-end days do not drift. Orders past their end date are archived.
+        """
+        values = []
+        for order in self:
+            count = order.generated_count + 1
+            next_date = order.start_date + FREQUENCY_STEPS[order.frequency] * count
+            values.append((order.id, count, next_date, not order.end_date or next_date <= order.end_date))
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS o
+               SET generated_count = v.generated_count,
+                   next_date = v.next_date,
+                   active = v.active,
+                   last_error = NULL,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::int[], %s::date[], %s::bool[]) AS v(id, generated_count, next_date, active)
+             WHERE o.id = v.id
+        """, [self.env.uid, *map(list, zip(*values))])
+        self.invalidate_recordset(['generated_count', 'next_date', 'active', 'last_error', 'write_uid', 'write_date'])
+
+
+class Contribution(models.Model):
+    _inherit = 'contributions.manager.contribution'
+
+    standing_order_id = fields.Many2one('contributions.manager.standing.order', string='Orden Permanente', readonly=True, copy=False, ondelete='set null', index='btree_not_null')
+
+    _sql_constraints = [
+        ('unique_standing_order_date', 'UNIQUE(standing_order_id, date)', 'La orden permanente ya generó una aportación para esta fecha.'),
+    ]
+
+
+class PartnerContribution(models.Model):
+    _inherit = 'contributions.manager.partner.contribution'
+
+    standing_order_ids = fields.One2many('contributions.manager.standing.order', 'partner_contribution_id', string='Órdenes Permanentes')
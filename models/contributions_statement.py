@@ -0,0 +1,247 @@
+import base64
+import datetime
+import logging
+import time
+from collections import defaultdict
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+STATEMENT_CRON_TIME_LIMIT = 240
+
+
+class StatementRun(models.Model):
+    """
+        DOCSTRING: StatementRun model generating member statements for a period in the background.
+        Partners are processed in chunks by a cron job: each chunk loads every transaction of its partners with
+        a few grouped queries, renders one PDF per partner, attaches it to the partner and commits, so memory
+        stays flat whatever the number of members and progress is visible while the run advances.
+    """
+    _name = 'contributions.manager.statement.run'
+    _description = 'Member Statements Run'
+    _inherit = ['mail.thread']
+    _order = 'id desc'
+
+    name = fields.Char(string='Descripción', required=True, tracking=True)
+    date_from = fields.Date(string='Desde', required=True, tracking=True)
+    date_to = fields.Date(string='Hasta', required=True, tracking=True)
+    partner_ids = fields.Many2many('res.partner', string='Socios', help="Dejar vacío para generar el estado de cuenta de todos los socios con aportaciones activas.")
+    company_id = fields.Many2one('res.company', string='Empresa', required=True, default=lambda self: self.env.company)
+    chunk_size = fields.Integer(string='Socios por Lote', required=True, default=200)
+    state = fields.Selection([
+        ('draft', 'Borrador'),
+        ('queued', 'En Cola'),
+        ('running', 'En Proceso'),
+        ('done', 'Terminado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', required=True, default='draft', readonly=True, tracking=True)
+    total_count = fields.Integer(string='Total de Socios', readonly=True)
+    processed_count = fields.Integer(string='Socios Procesados', readonly=True)
+    last_partner_id = fields.Integer(string='Último Socio Procesado', readonly=True, copy=False)
+    progress = fields.Float(string='Progreso (%)', compute='_compute_progress')
+    error_message = fields.Text(string='Error', readonly=True)
+
+    @api.depends('processed_count', 'total_count')
+    def _compute_progress(self):
+        for run in self:
+            run.progress = 100.0 * run.processed_count / run.total_count if run.total_count else 0.0
+
+    # Validations
+    @api.constrains('date_from', 'date_to', 'chunk_size')
+    def _check_period(self):
+        for run in self:
+            if run.date_from > run.date_to:
+                raise ValidationError("La fecha inicial no puede ser posterior a la fecha final.")
+            if run.chunk_size <= 0:
+                raise ValidationError("El tamaño del lote debe ser mayor que 0.")
+
+    # Actions
+    def action_start(self):
+        for run in self:
+            if run.state not in ('draft', 'failed'):
+                raise ValidationError("Solo se pueden iniciar generaciones en borrador o fallidas.")
+            run.write({
+                'state': 'queued',
+                'total_count': len(run._get_partner_ids()),
+                'processed_count': 0,
+                'last_partner_id': 0,
+                'error_message': False,
+            })
+        self.env.ref('tel_capp_csm.ir_cron_process_statement_runs')._trigger()
+
+    def action_view_attachments(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': f"Estados de Cuenta - {self.name}",
+            'res_model': 'ir.attachment',
+            'view_mode': 'list,form',
+            'domain': [('res_model', '=', 'res.partner'), ('description', '=', self._attachment_description())],
+        }
+
+    # Processing
+    @api.model
+    def _cron_process_statement_runs(self):
+        started = time.monotonic()
+        for run in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            while run.state in ('queued', 'running'):
+                if time.monotonic() - started > STATEMENT_CRON_TIME_LIMIT:
+                    self.env.ref('tel_capp_csm.ir_cron_process_statement_runs')._trigger()
+                    return
+                # A savepoint per chunk undoes a failing chunk only, without touching the rest of the
+                # transaction (the test transaction included).
+                try:
+                    with self.env.cr.savepoint():
+                        run._process_next_chunk()
+                except Exception as error:
+                    self.env.invalidate_all()
+                    _logger.exception("Statement run %s failed", run.id)
+                    run.write({'state': 'failed', 'error_message': str(error)})
+                if not self.env.registry.in_test_mode():
+                    self.env.cr.commit()
+
+    def _process_next_chunk(self):
+        self.ensure_one()
+        partner_ids = self._get_partner_ids(after_id=self.last_partner_id, limit=self.chunk_size)
+        if not partner_ids:
+            self.write({'state': 'done'})
+            self.message_post(body=f"Estados de cuenta generados: {self.processed_count}.")
+            return
+        statements = self._get_statement_data(partner_ids)
+        report = self.env.ref('tel_capp_csm.action_report_member_statement')
+        data = {'date_from': str(self.date_from), 'date_to': str(self.date_to), 'statements': statements}
+        attachments = []
+        for partner in self.env['res.partner'].browse(partner_ids):
+            pdf, _report_type = report._render_qweb_pdf(report.report_name, res_ids=partner.ids, data=data)
+            attachments.append({
+                'name': f"Estado de Cuenta {partner.name} {self.date_from} - {self.date_to}.pdf",
+                'type': 'binary',
+                'datas': base64.b64encode(pdf),
+                'mimetype': 'application/pdf',
+                'res_model': 'res.partner',
+                'res_id': partner.id,
+                'description': self._attachment_description(),
+            })
+        self.env['ir.attachment'].create(attachments)
+        self.write({
+            'state': 'running',
+            'processed_count': self.processed_count + len(partner_ids),
+            'last_partner_id': partner_ids[-1],
+        })
+        self.env.invalidate_all()
+
+    def _attachment_description(self):
+        return f"statement_run:{self.id}"
+
+    def _get_partner_ids(self, after_id=0, limit=None):
+        """
+            Returns the ids of the partners of the run greater than after_id, in id order. Chunks page through
+            them with last_partner_id as keyset cursor, so each chunk reads only its own partners from the index
+            instead of listing the whole run again.
+        """
+        self.ensure_one()
+        self.flush_recordset(['partner_ids'])
+        field = self._fields['partner_ids']
+        self.env.cr.execute(f"SELECT 1 FROM {field.relation} WHERE {field.column1} = %s LIMIT 1", [self.id])
+        if self.env.cr.fetchone():
+            query = f"""
+                SELECT {field.column2} FROM {field.relation}
+                 WHERE {field.column1} = %(run_id)s AND {field.column2} > %(after_id)s
+                 ORDER BY {field.column2}
+            """
+        else:
+            self.env['contributions.manager.partner.contribution'].flush_model(['partner_id', 'company_id', 'enabled'])
+            query = """
+                SELECT DISTINCT partner_id FROM contributions_manager_partner_contribution
+                 WHERE company_id = %(company_id)s AND enabled AND partner_id > %(after_id)s
+                 ORDER BY partner_id
+            """
+        if limit:
+            query += " LIMIT %(limit)s"
+        self.env.cr.execute(query, {
+            'run_id': self.id, 'company_id': self.company_id.id, 'after_id': after_id, 'limit': limit,
+        })
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    def _get_statement_data(self, partner_ids):
+        """
+            Returns {str(partner_id): [statement of each partner contribution]} for the chunk, using one grouped
+            query per source: partner contributions, opening and closing balances (ledger), contributions,
+            withdrawals (active and archived) and capitalized interest of the period.
+        """
+        self.ensure_one()
+        PartnerContribution = self.env['contributions.manager.partner.contribution']
+        pc_domain = [('partner_id', 'in', partner_ids), ('company_id', '=', self.company_id.id)]
+        partner_contributions = PartnerContribution.search_read(pc_domain, ['partner_id', 'contribution_type_id'])
+        opening = PartnerContribution.balances_at(self.date_from - datetime.timedelta(days=1), pc_domain)
+        closing = PartnerContribution.balances_at(self.date_to, pc_domain)
+
+        movements = defaultdict(list)
+        period = [
+            ('partner_id', 'in', partner_ids),
+            ('company_id', '=', self.company_id.id),
+            ('date', '>=', self.date_from),
+            ('date', '<=', self.date_to),
+        ]
+        for model, status_field, label, sign in (
+            ('contributions.manager.contribution', 'contribution_status', 'Aportación', 1),
+            ('contributions.manager.withdrawal', 'withdrawal_status', 'Retiro', -1),
+            ('contributions.manager.contribution.archive', None, 'Aportación', 1),
+            ('contributions.manager.withdrawal.archive', None, 'Retiro', -1),
+        ):
+            for row in self.env[model].search_read(
+                period + ([(status_field, '=', 'registered')] if status_field else []),
+                ['partner_id', 'contribution_type_id', 'date', 'reference', 'amount'], order='date, id'
+            ):
+                movements[(row['partner_id'][0], row['contribution_type_id'][0])].append(
+                    (str(row['date']), row['reference'], label, sign * row['amount'])
+                )
+        for row in self.env['contributions.manager.interest.line'].search_read(
+            period, ['partner_id', 'contribution_type_id', 'date', 'amount'], order='date, id'
+        ):
+            movements[(row['partner_id'][0], row['contribution_type_id'][0])].append(
+                (str(row['date']), '', 'Intereses', row['amount'])
+            )
+
+        statements = defaultdict(list)
+        for pc in partner_contributions:
+            key = (pc['partner_id'][0], pc['contribution_type_id'][0])
+            statements[str(key[0])].append({
+                'contribution_type': pc['contribution_type_id'][1],
+                'opening_balance': opening.get(pc['id'], 0.0),
+                'closing_balance': closing.get(pc['id'], 0.0),
+                'lines': [
+                    {'date': date, 'reference': reference, 'label': label, 'amount': amount}
+                    for date, reference, label, amount in sorted(movements[key])
+                ],
+            })
+        return dict(statements)
+
+
+class MemberStatementReport(models.AbstractModel):
+    _name = 'report.tel_capp_csm.report_member_statement'
+    _description = 'Member Statement Report'
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        data = dict(data or {})
+        if 'statements' not in data:
+            today = fields.Date.context_today(self)
+            run = self.env['contributions.manager.statement.run'].new({
+                'date_from': data.get('date_from') or today.replace(day=1),
+                'date_to': data.get('date_to') or today,
+                'company_id': self.env.company.id,
+            })
+            data.update({
+                'date_from': str(run.date_from),
+                'date_to': str(run.date_to),
+                'statements': run._get_statement_data(list(docids)),
+            })
+        return {
+            'doc_ids': docids,
+            'doc_model': 'res.partner',
+            'docs': self.env['res.partner'].browse(docids),
+            'data': data,
+        }
@@ -0,0 +1,44 @@
+import logging
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class IrSequence(models.Model):
+    _inherit = 'ir.sequence'
+
+    @api.model
+    def _next_by_code_batch(self, sequence_code, count):
+        """
+            Same as next_by_code() but reserves count consecutive values in a single round-trip and returns
+            them as a list, formatted exactly like next_by_code() would.
+        """
+        if count <= 0:
+            return []
+        self.check_access('read')
+        company_id = self.env.company.id
+        sequence = self.search([('code', '=', sequence_code), ('company_id', 'in', [company_id, False])], order='company_id', limit=1)
+        if not sequence:
+            _logger.debug("No ir.sequence has been found for code '%s'. Please make sure a sequence is set for current company.", sequence_code)
+            return [False] * count
+        sequence = sequence.sudo()
+        if sequence.use_date_range:
+            return [sequence._next() for _index in range(count)]
+
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ['ir_sequence_%03d' % sequence.id, count]
+            )
+            numbers = sorted(row[0] for row in self.env.cr.fetchall())
+        else:
+            self.env.cr.execute("SELECT number_next FROM ir_sequence WHERE id = %s FOR UPDATE NOWAIT", [sequence.id])
+            self.env.cr.execute(
+                "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s RETURNING number_next - %s",
+                [sequence.number_increment * count, sequence.id, sequence.number_increment * count]
+            )
+            first = self.env.cr.fetchone()[0]
+            numbers = [first + index * sequence.number_increment for index in range(count)]
+            sequence.invalidate_recordset(['number_next'])
+        return [sequence.get_next_char(number) for number in numbers]
@@ -0,0 +1,75 @@
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+_logger = logging.getLogger(__name__)
+
+PERF_SAMPLE_RATE_PARAM = 'tel_capp_csm.perf_sample_rate'
+PERF_STATE_KEY = 'tel_capp_csm.perf_stats'
+
+
+@contextmanager
+def profile_stage(records, stage, count=None):
+    """
+        Measures the call count, SQL queries and wall time of a hot-path stage run on records.
+        Sampling is decided per batch, on the outermost stage, with the probability set in the system parameter
+        tel_capp_csm.perf_sample_rate (0 disables it, the default; 1 samples every batch); nested stages follow
+        the decision of their batch. Samples are kept on the cursor and inserted with one query before commit.
+    """
+    cr = records.env.cr
+    state = cr.precommit.data.setdefault(PERF_STATE_KEY, {'depth': 0, 'sampled': False, 'rows': []})
+    if not state['depth']:
+        rate = float(records.env['ir.config_parameter'].sudo().get_param(PERF_SAMPLE_RATE_PARAM, 0) or 0)
+        state['sampled'] = rate > 0 and random.random() < rate
+    if not state['sampled']:
+        state['depth'] += 1
+        try:
+            yield
+        finally:
+            state['depth'] -= 1
+        return
+
+    state['depth'] += 1
+    queries_before = cr.sql_log_count
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state['depth'] -= 1
+    duration = (time.perf_counter() - started) * 1000.0
+    queries = cr.sql_log_count - queries_before
+    count = len(records) if count is None else count
+    _logger.debug("perf stage=%s model=%s records=%d queries=%d duration_ms=%.1f", stage, records._name, count, queries, duration)
+    if not state['rows']:
+        cr.precommit.add(functools.partial(_flush_stats, cr, records.env.uid))
+    state['rows'].append((stage, records._name, count, queries, duration))
+
+
+def _flush_stats(cr, uid):
+    state = cr.precommit.data.get(PERF_STATE_KEY)
+    if not state or not state['rows']:
+        return
+    stages, models, counts, queries, durations = map(list, zip(*state['rows']))
+    state['rows'] = []
+    cr.execute("""
+        INSERT INTO contributions_manager_perf_stat (date, stage, model, record_count, query_count, duration, user_id)
+        SELECT (now() at time zone 'UTC'), v.stage, v.model, v.record_count, v.query_count, v.duration, %s
+          FROM unnest(%s::varchar[], %s::varchar[], %s::int[], %s::int[], %s::float8[])
+               AS v(stage, model, record_count, query_count, duration)
+    """, [uid, stages, models, counts, queries, durations])
+
+
+def profiled(stage, count=None):
+    """
+        Decorator running a model method inside profile_stage(self, stage). Apply it below the api decorators.
+        count, called with the method arguments, gives the number of records of @api.model methods.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with profile_stage(self, stage, count(self, *args, **kwargs) if count else None):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,143 @@
+import logging
+import time
+
+from psycopg2 import OperationalError, errorcodes
+
+from odoo import api, fields, models, tools
+from odoo.exceptions import UserError, ValidationError
+
+from .transaction_posting import BULK_MODE_CONTEXT
+
+_logger = logging.getLogger(__name__)
+
+TRANSIENT_PG_ERRORS = (
+    errorcodes.SERIALIZATION_FAILURE,
+    errorcodes.DEADLOCK_DETECTED,
+    errorcodes.LOCK_NOT_AVAILABLE,
+)
+QUEUE_CRON_TIME_LIMIT = 240
+
+
+class RegistrationQueueMixin(models.AbstractModel):
+    """
+        DOCSTRING: RegistrationQueueMixin adds queued registration to the transaction models.
+        action_register_queued only marks confirmed records as pending; a cron worker drains the queue in
+        fixed-size batches with one commit per batch, retries transient database failures and records
+        per-record errors on the transaction. Records registered manually while pending are marked done.
+    """
+    _name = 'contributions.manager.registration.queue.mixin'
+    _description = 'Registration Queue'
+
+    _registration_status_field = None
+
+    queue_state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Procesado'),
+        ('failed', 'Fallido'),
+    ], string='Contabilización en Cola', readonly=True, copy=False)
+    queue_attempts = fields.Integer(string='Intentos', readonly=True, copy=False)
+    queue_error = fields.Text(string='Error de Contabilización', readonly=True, copy=False)
+    queue_processed_at = fields.Datetime(string='Procesado en Cola', readonly=True, copy=False, index='btree_not_null')
+
+    def init(self):
+        super().init()
+        if self._abstract:
+            return
+        tools.create_index(
+            self.env.cr, f'{self._table}_queue_pending_idx', self._table, ['id'], where="queue_state = 'pending'"
+        )
+
+    # Actions
+    def action_register_queued(self):
+        for rec in self:
+            if rec[self._registration_status_field] != 'confirmed' or rec.move_id:
+                raise ValidationError("Solo se pueden enviar a contabilizar registros confirmados sin asiento.")
+            if rec.queue_state == 'pending':
+                raise ValidationError("El registro ya se encuentra en la cola de contabilización.")
+        self.write({'queue_state': 'pending', 'queue_attempts': 0, 'queue_error': False})
+        self.env.ref('tel_capp_csm.ir_cron_process_registration_queue')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'message': f"{len(self)} registro(s) enviados a la cola de contabilización.",
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
+
+    # Worker
+    @api.model
+    def _cron_process_registration_queue(self):
+        started = time.monotonic()
+        for model in ('contributions.manager.contribution', 'contributions.manager.withdrawal'):
+            if not self.env[model]._process_registration_queue(started):
+                self.env.ref('tel_capp_csm.ir_cron_process_registration_queue')._trigger()
+                return
+
+    @api.model
+    def _process_registration_queue(self, started=None):
+        """
+            Drains the pending records of this model. Returns False when the time budget ran out or a transient
+            failure postponed the rest of the queue to the next run.
+        """
+        params = self.env['ir.config_parameter'].sudo()
+        batch_size = int(params.get_param('tel_capp_csm.registration_queue_batch_size', 200))
+        max_attempts = int(params.get_param('tel_capp_csm.registration_queue_max_attempts', 3))
+        commit = not self.env.registry.in_test_mode()
+        started = started or time.monotonic()
+        while True:
+            if time.monotonic() - started > QUEUE_CRON_TIME_LIMIT:
+                return False
+            batch = self.search([('queue_state', '=', 'pending')], order='id', limit=batch_size)
+            if not batch:
+                return True
+            # Records registered manually while pending already have their move: nothing left to do.
+            registered = batch.filtered('move_id')
+            if registered:
+                registered._mark_queue_done()
+                batch -= registered
+                if not batch:
+                    if commit:
+                        self.env.cr.commit()
+                    continue
+            try:
+                with self.env.cr.savepoint():
+                    batch.with_context(**BULK_MODE_CONTEXT).action_register()
+                batch._mark_queue_done()
+            except OperationalError as error:
+                if error.pgcode not in TRANSIENT_PG_ERRORS:
+                    raise
+                _logger.info("Transient failure registering %s batch, will retry: %s", self._name, error)
+                if commit:
+                    self.env.cr.rollback()
+                batch.browse(batch.ids)._mark_queue_retry(str(error), max_attempts)
+                if commit:
+                    self.env.cr.commit()
+                return False
+            except (ValidationError, UserError):
+                batch._register_one_by_one()
+            if commit:
+                self.env.cr.commit()
+
+    def _register_one_by_one(self):
+        for rec in self:
+            try:
+                with self.env.cr.savepoint():
+                    rec.action_register()
+                rec._mark_queue_done()
+            except (ValidationError, UserError) as error:
+                rec.write({
+                    'queue_state': 'failed',
+                    'queue_attempts': rec.queue_attempts + 1,
+                    'queue_error': str(error.args[0] if error.args else error),
+                })
+
+    def _mark_queue_done(self):
+        self.write({'queue_state': 'done', 'queue_error': False, 'queue_processed_at': fields.Datetime.now()})
+
+    def _mark_queue_retry(self, message, max_attempts):
+        exhausted = self.filtered(lambda rec: rec.queue_attempts + 1 >= max_attempts)
+        exhausted.write({'queue_state': 'failed', 'queue_attempts': max_attempts, 'queue_error': message})
+        for attempts, records in (self - exhausted).grouped('queue_attempts').items():
+            records.write({'queue_attempts': attempts + 1, 'queue_error': message})
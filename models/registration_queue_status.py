@@ -0,0 +1,45 @@
+from odoo import fields, models, tools
+
+
+class RegistrationQueueStatus(models.Model):
+    """
+        DOCSTRING: RegistrationQueueStatus SQL view showing the depth and throughput of the registration queue.
+    """
+    _name = 'contributions.manager.registration.queue.status'
+    _description = 'Registration Queue Status'
+    _auto = False
+
+    transaction_type = fields.Selection([('contribution', 'Aportaciones'), ('withdrawal', 'Retiros')], string='Transacción', readonly=True)
+    pending_count = fields.Integer(string='Pendientes', readonly=True)
+    failed_count = fields.Integer(string='Fallidos', readonly=True)
+    processed_last_hour = fields.Integer(string='Procesados (última hora)', readonly=True)
+    processed_last_day = fields.Integer(string='Procesados (últimas 24 horas)', readonly=True)
+    oldest_pending_date = fields.Datetime(string='Pendiente más Antiguo', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT 1 AS id, 'contribution' AS transaction_type, q.*
+                  FROM (
+                        SELECT COUNT(*) FILTER (WHERE queue_state = 'pending') AS pending_count,
+                               COUNT(*) FILTER (WHERE queue_state = 'failed') AS failed_count,
+                               COUNT(*) FILTER (WHERE queue_processed_at >= (now() at time zone 'UTC') - interval '1 hour') AS processed_last_hour,
+                               COUNT(*) FILTER (WHERE queue_processed_at >= (now() at time zone 'UTC') - interval '1 day') AS processed_last_day,
+                               MIN(write_date) FILTER (WHERE queue_state = 'pending') AS oldest_pending_date
+                          FROM contributions_manager_contribution
+                         WHERE queue_state IS NOT NULL
+                       ) AS q
+                 UNION ALL
+                SELECT 2, 'withdrawal', q.*
+                  FROM (
+                        SELECT COUNT(*) FILTER (WHERE queue_state = 'pending'),
+                               COUNT(*) FILTER (WHERE queue_state = 'failed'),
+                               COUNT(*) FILTER (WHERE queue_processed_at >= (now() at time zone 'UTC') - interval '1 hour'),
+                               COUNT(*) FILTER (WHERE queue_processed_at >= (now() at time zone 'UTC') - interval '1 day'),
+                               MIN(write_date) FILTER (WHERE queue_state = 'pending')
+                          FROM contributions_manager_withdrawal
+                         WHERE queue_state IS NOT NULL
+                       ) AS q
+            )
+        """)
@@ -1,9 +1,19 @@
-from odoo import api, fields, models
+from collections import defaultdict
+
+from odoo import api, fields, models, tools
+
+SAVINGS_TOTAL_FIELDS = [
+    'savings_balance', 'last_contribution_date', 'savings_ytd_contributions', 'savings_ytd_withdrawals', 'savings_ytd_year',
+]
 
 
 class ResPartner(models.Model):
     """
         DOCSTRING: ResPartner model inherits from res.partner and adds a new field called contributions_ids to the partner.
+        It also stores the savings totals of the partner (balance, last contribution date and year-to-date
+        contributions and withdrawals), maintained incrementally by PartnerContribution._apply_balance_deltas,
+        so partners can be filtered and sorted on them without reading their partner contributions.
+        Like the contribution models, the totals are restricted to the contributions user group.
     """
 
     _inherit = 'res.partner'
@@ -13,10 +23,165 @@ class ResPartner(models.Model):
         'partner_id',
         string='Aportaciones / Ahorros'
     )
+    savings_balance = fields.Float(string='Saldo de Ahorros', readonly=True, groups='tel_capp_csm.group_contributions_user', copy=False, index=True, help="Suma de los montos actuales de todas las aportaciones del socio.")
+    last_contribution_date = fields.Date(string='Última Aportación', readonly=True, groups='tel_capp_csm.group_contributions_user', copy=False, index=True)
+    savings_ytd_contributions = fields.Float(string='Aportaciones del Año', readonly=True, groups='tel_capp_csm.group_contributions_user', copy=False, index=True)
+    savings_ytd_withdrawals = fields.Float(string='Retiros del Año', readonly=True, groups='tel_capp_csm.group_contributions_user', copy=False, index=True)
+    savings_ytd_year = fields.Integer(string='Año de los Acumulados', readonly=True, groups='tel_capp_csm.group_contributions_user', copy=False)
+
+    def _auto_init(self):
+        new_totals = not tools.column_exists(self.env.cr, self._table, 'savings_balance')
+        res = super()._auto_init()
+        if new_totals:
+            # Contribution tables may not exist yet at this point: fill the totals once every model is ready.
+            self.pool.post_init(self._rebuild_savings_totals)
+        return res
+
+    # Savings Totals
+    @api.model
+    def _record_savings_movements(self, movements, flow=None):
+        """
+            Adds signed movements [(partner_contribution_id, date, amount), ...] to the savings totals of their
+            partners with one UPDATE. flow tells which year-to-date total the movements count in ('contribution'
+            or 'withdrawal'); other movements (interest) only change the balance. Partner rows are locked in id
+            order, like the partner contributions, so concurrent batches cannot deadlock.
+        """
+        year = fields.Date.context_today(self).year
+        balances = defaultdict(float)
+        ytd_contributions = defaultdict(float)
+        ytd_withdrawals = defaultdict(float)
+        last_dates = {}
+        for pc_id, date, amount in movements:
+            balances[pc_id] += amount
+            if flow == 'contribution':
+                if date.year == year:
+                    ytd_contributions[pc_id] += amount
+                if amount > 0:
+                    last_dates[pc_id] = max(date, last_dates.get(pc_id, date))
+            elif flow == 'withdrawal' and date.year == year:
+                ytd_withdrawals[pc_id] -= amount
+        pc_ids = sorted(balances)
+        if not pc_ids:
+            return
+        self.flush_model(SAVINGS_TOTAL_FIELDS)
+        self.env.cr.execute("""
+            SELECT id FROM res_partner
+             WHERE id IN (SELECT partner_id FROM contributions_manager_partner_contribution WHERE id = ANY(%s))
+             ORDER BY id FOR NO KEY UPDATE
+        """, [pc_ids])
+        partner_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.env.cr.execute("""
+            UPDATE res_partner AS p
+               SET savings_balance = p.savings_balance + x.balance,
+                   savings_ytd_contributions = CASE WHEN p.savings_ytd_year = %(year)s THEN p.savings_ytd_contributions ELSE 0.0 END + x.ytd_contributions,
+                   savings_ytd_withdrawals = CASE WHEN p.savings_ytd_year = %(year)s THEN p.savings_ytd_withdrawals ELSE 0.0 END + x.ytd_withdrawals,
+                   savings_ytd_year = %(year)s,
+                   last_contribution_date = GREATEST(p.last_contribution_date, x.last_date)
+              FROM (
+                    SELECT pc.partner_id,
+                           SUM(v.balance) AS balance,
+                           SUM(v.ytd_contributions) AS ytd_contributions,
+                           SUM(v.ytd_withdrawals) AS ytd_withdrawals,
+                           MAX(v.last_date) AS last_date
+                      FROM unnest(%(pc_ids)s::int[], %(balances)s::float8[], %(ytd_contributions)s::float8[],
+                                  %(ytd_withdrawals)s::float8[], %(last_dates)s::date[])
+                           AS v(pc_id, balance, ytd_contributions, ytd_withdrawals, last_date)
+                      JOIN contributions_manager_partner_contribution pc ON pc.id = v.pc_id
+                     GROUP BY pc.partner_id
+                   ) AS x
+             WHERE p.id = x.partner_id
+        """, {
+            'year': year,
+            'pc_ids': pc_ids,
+            'balances': [balances[pc_id] for pc_id in pc_ids],
+            'ytd_contributions': [ytd_contributions[pc_id] for pc_id in pc_ids],
+            'ytd_withdrawals': [ytd_withdrawals[pc_id] for pc_id in pc_ids],
+            'last_dates': [last_dates.get(pc_id) for pc_id in pc_ids],
+        })
+        if flow == 'contribution' and any(amount < 0 for _pc_id, _date, amount in movements):
+            # Reversed contributions may have been the latest ones.
+            self._rebuild_savings_totals(partner_ids, last_date_only=True)
+        self.browse(partner_ids).invalidate_recordset(SAVINGS_TOTAL_FIELDS)
 
+    @api.model
+    def _rebuild_savings_totals(self, partner_ids=None, last_date_only=False):
+        """
+            Recomputes the savings totals of partner_ids (every partner with partner contributions by default)
+            from the balances and the registered and archived transactions, in a single statement.
+        """
+        for model in ('contributions.manager.partner.contribution', 'contributions.manager.contribution',
+                      'contributions.manager.withdrawal', 'contributions.manager.contribution.archive',
+                      'contributions.manager.withdrawal.archive'):
+            self.env[model].flush_model()
+        set_clause = "last_contribution_date = c.last_date" if last_date_only else """
+                   savings_balance = COALESCE(b.balance, 0.0),
+                   last_contribution_date = c.last_date,
+                   savings_ytd_contributions = COALESCE(c.ytd, 0.0),
+                   savings_ytd_withdrawals = COALESCE(w.ytd, 0.0),
+                   savings_ytd_year = %(year)s"""
+        self.env.cr.execute(f"""
+            WITH partners AS (
+                SELECT DISTINCT partner_id AS id
+                  FROM contributions_manager_partner_contribution
+                 WHERE %(partner_ids)s::int[] IS NULL OR partner_id = ANY(%(partner_ids)s)
+            ),
+            b AS (
+                SELECT partner_id, SUM(current_amount) AS balance
+                  FROM contributions_manager_partner_contribution
+                 WHERE partner_id IN (SELECT id FROM partners)
+                 GROUP BY partner_id
+            ),
+            c AS (
+                SELECT partner_id, MAX(date) AS last_date,
+                       SUM(amount) FILTER (WHERE EXTRACT(YEAR FROM date) = %(year)s) AS ytd
+                  FROM (SELECT partner_id, date, amount FROM contributions_manager_contribution
+                         WHERE contribution_status = 'registered'
+                         UNION ALL
+                        SELECT partner_id, date, amount FROM contributions_manager_contribution_archive) t
+                 WHERE partner_id IN (SELECT id FROM partners)
+                 GROUP BY partner_id
+            ),
+            w AS (
+                SELECT partner_id, SUM(amount) AS ytd
+                  FROM (SELECT partner_id, date, amount FROM contributions_manager_withdrawal
+                         WHERE withdrawal_status = 'registered'
+                         UNION ALL
+                        SELECT partner_id, date, amount FROM contributions_manager_withdrawal_archive) t
+                 WHERE partner_id IN (SELECT id FROM partners) AND EXTRACT(YEAR FROM date) = %(year)s
+                 GROUP BY partner_id
+            )
+            UPDATE res_partner AS p
+               SET {set_clause}
+              FROM partners
+              LEFT JOIN b ON b.partner_id = partners.id
+              LEFT JOIN c ON c.partner_id = partners.id
+              LEFT JOIN w ON w.partner_id = partners.id
+             WHERE p.id = partners.id
+        """, {'partner_ids': partner_ids, 'year': fields.Date.context_today(self).year})
+        self.invalidate_model(SAVINGS_TOTAL_FIELDS)
+
+    @api.model
+    def _cron_roll_savings_year(self):
+        """
+            Resets the year-to-date totals of partners without movements in the current year yet.
+        """
+        year = fields.Date.context_today(self).year
+        self.flush_model(['savings_ytd_contributions', 'savings_ytd_withdrawals', 'savings_ytd_year'])
+        self.env.cr.execute("""
+            UPDATE res_partner
+               SET savings_ytd_contributions = 0.0,
+                   savings_ytd_withdrawals = 0.0,
+                   savings_ytd_year = %s
+             WHERE savings_ytd_year < %s
+        """, [year, year])
+        self.invalidate_model(['savings_ytd_contributions', 'savings_ytd_withdrawals', 'savings_ytd_year'])
+
+    # Methods
     def action_add_contribution(self):
         self.ensure_one()
-        existing_type_ids = self.contribution_ids.mapped('contribution_type_id').ids
+        existing_type_ids = self.env['contributions.manager.partner.contribution'].search([
+            ('partner_id', '=', self.id),
+        ]).contribution_type_id.ids
         return {
             'type': 'ir.actions.act_window',
             'name': 'Nueva Aportación',
@@ -29,3 +194,25 @@ class ResPartner(models.Model):
                 'exclude_contribution_type_ids': existing_type_ids,
             },
         }
+
+    def action_view_savings(self):
+        """
+            Opens the partner contributions of the partner; the partner form only shows the stored totals, so
+            the detail is loaded on demand.
+        """
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': f"Aportaciones y Ahorros de {self.name}",
+            'res_model': 'contributions.manager.partner.contribution',
+            'view_mode': 'list,form',
+            'views': [
+                (self.env.ref('tel_capp_csm.view_partner_contribution_tree_partner').id, 'list'),
+                (self.env.ref('tel_capp_csm.view_partner_contribution_form_partner').id, 'form'),
+            ],
+            'domain': [('partner_id', '=', self.id)],
+            'context': {
+                'default_partner_id': self.id,
+                'create': False,
+            },
+        }
@@ -0,0 +1,88 @@
+from psycopg2 import IntegrityError
+
+from odoo import api, fields, models
+
+IDEMPOTENCY_CREATE_ATTEMPTS = 3
+
+
+class TransactionIdempotencyMixin(models.AbstractModel):
+    """
+        DOCSTRING: TransactionIdempotencyMixin adds an optional external idempotency key to contributions and
+        withdrawals, unique per company (empty keys are not constrained). _create_or_get lets integrations and
+        imports retry whole batches: duplicate keys are resolved with one lookup and return the existing
+        records instead of failing the batch.
+    """
+    _name = 'contributions.manager.idempotency.mixin'
+    _description = 'Transaction Idempotency Key'
+
+    external_key = fields.Char(string='Clave Externa', readonly=True, copy=False, help="Clave de idempotencia enviada por el sistema de origen (nómina, caja). No puede repetirse en la empresa.")
+
+    _sql_constraints = [
+        ('unique_external_key_company', 'UNIQUE(company_id, external_key)', 'La clave externa ya fue utilizada en esta empresa.'),
+    ]
+
+    @api.model
+    def _create_or_get(self, vals_list):
+        """
+            Creates the records of vals_list whose external_key is not used yet in their company and returns
+            (records, created): records holds, in the order of vals_list, the new record or the existing one
+            of every row, and rows repeating a key of the same batch share one record. Keys of transactions
+            archived by a period close are also duplicates; those rows are left out of records.
+            A concurrent insert of the same key only makes the lookup run again.
+        """
+        rows = []
+        for vals in vals_list:
+            vals = dict(vals, external_key=(vals.get('external_key') or '').strip() or False)
+            rows.append(((vals.get('company_id') or self.env.company.id, vals['external_key']), vals))
+
+        for attempt in range(IDEMPOTENCY_CREATE_ATTEMPTS):
+            existing = self._get_by_external_keys([key for key, vals in rows if key[1]])
+            to_create = {}
+            for index, (key, vals) in enumerate(rows):
+                if not key[1]:
+                    to_create[index] = vals
+                elif key not in existing and key not in to_create:
+                    to_create[key] = vals
+            try:
+                with self.env.cr.savepoint():
+                    created = self.create(list(to_create.values()))
+                break
+            except IntegrityError:
+                if attempt == IDEMPOTENCY_CREATE_ATTEMPTS - 1:
+                    raise
+        by_key = dict(zip(to_create, created.ids))
+        ids = []
+        for index, (key, vals) in enumerate(rows):
+            record_id = by_key.get(index) or by_key.get(key) or existing.get(key)
+            if record_id:
+                ids.append(record_id)
+        return self.browse(ids), created
+
+    @api.model
+    def _get_by_external_keys(self, keys):
+        """
+            Returns {(company_id, external_key): id} for the given keys found in this model, with one query
+            answered by the unique index, plus {(company_id, external_key): False} for the keys of archived
+            transactions.
+        """
+        keys = list(set(keys))
+        if not keys:
+            return {}
+        self.flush_model(['company_id', 'external_key'])
+        company_ids = [company_id for company_id, _key in keys]
+        external_keys = [key for _company_id, key in keys]
+        self.env.cr.execute(f"""
+            SELECT t.company_id, t.external_key, t.id
+              FROM {self._table} t
+              JOIN unnest(%(company_ids)s::int[], %(keys)s::varchar[]) AS v(company_id, external_key)
+                ON t.company_id = v.company_id AND t.external_key = v.external_key
+             UNION ALL
+            SELECT a.company_id, a.external_key, NULL
+              FROM {self.env[f'{self._name}.archive']._table} a
+              JOIN unnest(%(company_ids)s::int[], %(keys)s::varchar[]) AS v(company_id, external_key)
+                ON a.company_id = v.company_id AND a.external_key = v.external_key
+        """, {'company_ids': company_ids, 'keys': external_keys})
+        result = {}
+        for company_id, key, record_id in self.env.cr.fetchall():
+            result[(company_id, key)] = result.get((company_id, key)) or record_id or False
+        return result
@@ -0,0 +1,212 @@
+from odoo import fields, models
+from odoo.exceptions import ValidationError
+
+from .profiling import profile_stage, profiled
+
+BULK_MODE_CONTEXT = {'contributions_bulk_mode': True, 'tracking_disable': True}
+
+
+class TransactionPostingMixin(models.AbstractModel):
+    """
+        DOCSTRING: TransactionPostingMixin posts the accounting entries of contributions and withdrawals.
+        Each transaction gets its own two-line move, except for contribution types with consolidated posting,
+        which get one move per journal, date and type holding one partner line per transaction and a single
+        summed bank counterpart. Every transaction keeps the link to its move and to its partner line.
+        Registered transactions are reversed in batches: whole moves with one _reverse_moves call, shared
+        consolidated moves with a counter-entry for the reversed lines only, and balances with one grouped update.
+        Batches run in bulk mode: per-record tracking is skipped and one summary message per contribution type
+        is posted instead, while single-record edits keep full tracking.
+    """
+    _name = 'contributions.manager.transaction.posting.mixin'
+    _description = 'Transaction Posting'
+
+    _posting_label = None
+    _saving_side = None
+    _balance_sign = None
+
+    move_line_id = fields.Many2one('account.move.line', string='Apunte Contable', readonly=True, copy=False, index='btree_not_null')
+    reversal_move_id = fields.Many2one('account.move', string='Asiento de Reversión', readonly=True, copy=False, index='btree_not_null')
+
+    # Bulk mode
+    def _is_bulk_mode(self):
+        return bool(self.env.context.get('contributions_bulk_mode')) or len(self) > 1
+
+    def _bulk_records(self):
+        """
+            Returns the recordset to process: without per-record tracking when running in bulk mode.
+        """
+        return self.with_context(**BULK_MODE_CONTEXT) if self._is_bulk_mode() else self
+
+    def _post_bulk_summary(self, action):
+        """
+            Posts one message per contribution type summarizing the batch (count, total and user), in place of
+            the per-record tracking skipped in bulk mode.
+        """
+        if not self._is_bulk_mode() or self.env.context.get('contributions_bulk_summary') is False:
+            return
+        for contrib_type, records in self.grouped('contribution_type_id').items():
+            currency = contrib_type.company_id.currency_id
+            total = currency.round(sum(records.mapped('amount')))
+            contrib_type.sudo().message_post(
+                body=f"{action} en lote ({self._description}): {len(records)} registros, "
+                     f"total {total:,.{currency.decimal_places}f}, usuario {self.env.user.name}."
+            )
+
+    # Posting
+    def _check_period_open(self):
+        cutoffs = self.env['contributions.manager.period.close']._get_closed_cutoffs(self.company_id.ids)
+        for rec in self:
+            cutoff = cutoffs.get(rec.company_id.id)
+            if cutoff and rec.date < cutoff:
+                raise ValidationError(f"El período está cerrado hasta el {cutoff}. No se pueden contabilizar transacciones anteriores.")
+
+    @profiled('accounting_moves')
+    def _post_accounting_moves(self):
+        """
+            Creates and posts the moves of the whole recordset at once.
+            Returns (moves, lines) in the same order as the records: the move of each record, repeated for the
+            records sharing a consolidated move, and its partner line on the saving account.
+        """
+        self._check_period_open()
+        consolidated = self.filtered(lambda rec: rec.contribution_type_id.consolidated_posting)
+        individual = self - consolidated
+        groups = list(consolidated.grouped(lambda rec: (rec.contribution_type_id, rec.date, rec.company_id)).values())
+        moves = self.env['account.move'].create(
+            [rec._prepare_accounting_move_vals() for rec in individual]
+            + [group._prepare_consolidated_move_vals() for group in groups]
+        )
+        with profile_stage(self, 'post_moves', len(moves)):
+            moves.action_post()
+
+        links = {}
+        for records, move in zip([*individual, *groups], moves):
+            saving_account = records.contribution_type_id.saving_account
+            lines = move.line_ids.filtered(lambda line: line.account_id == saving_account).sorted('id')
+            for rec, line in zip(records, lines):
+                links[rec.id] = (move.id, line.id)
+        return (
+            self.env['account.move'].browse([links[rec.id][0] for rec in self]),
+            self.env['account.move.line'].browse([links[rec.id][1] for rec in self]),
+        )
+
+    def _prepare_consolidated_move_vals(self, reverse_date=None):
+        """
+            Values of the consolidated move of records sharing the same type, date and company, or of its
+            counter-entry on reverse_date.
+        """
+        contrib_type = self.contribution_type_id
+        company = self.company_id
+        saving_side = self._saving_side
+        if reverse_date:
+            saving_side = 'debit' if saving_side == 'credit' else 'credit'
+        bank_side = 'debit' if saving_side == 'credit' else 'credit'
+        label = f"{'Reversión ' if reverse_date else ''}{self._posting_label} {contrib_type.contribution_name}"
+        amounts = [company.currency_id.round(rec.amount) for rec in self]
+        line_ids = [
+            (0, 0, {
+                'account_id': contrib_type.saving_account.id,
+                saving_side: amount,
+                bank_side: 0.0,
+                'partner_id': rec.partner_id.id,
+                'name': f"{label} {rec.reference}",
+            })
+            for rec, amount in zip(self, amounts)
+        ]
+        line_ids.append((0, 0, {
+            'account_id': contrib_type.deposit_bank_account.id,
+            bank_side: sum(amounts),
+            saving_side: 0.0,
+            'name': f"{label} ({len(self)} transacciones)",
+        }))
+        date = reverse_date or self[0].date
+        return {
+            'ref': f"{label} {date} ({len(self)} transacciones)",
+            'date': date,
+            'journal_id': contrib_type.journal.id,
+            'company_id': company.id,
+            'line_ids': line_ids,
+        }
+
+    def _set_move_links(self, moves, lines):
+        """
+            Links each record to its move and partner line (same order) with a single UPDATE instead of one write
+            per record.
+        """
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS t
+               SET move_id = v.move_id,
+                   move_line_id = v.move_line_id
+              FROM unnest(%s::int[], %s::int[], %s::int[]) AS v(id, move_id, move_line_id)
+             WHERE t.id = v.id
+        """, [self.ids, moves.ids, lines.ids])
+        self.invalidate_recordset(['move_id', 'move_line_id'])
+
+    # Reversal
+    def _reverse_transactions(self):
+        """
+            Reverses registered transactions in one batch: accounting moves, balances (dated on the original
+            transactions, so the ledger and the monthly report net to zero) and status.
+        """
+        status_field = self._registration_status_field
+        for rec in self:
+            if rec[status_field] != 'registered' or not rec.move_id:
+                raise ValidationError("Solo se pueden reversar transacciones contabilizadas.")
+        if not self:
+            return
+        self._check_period_open()
+        PartnerContribution = self.env['contributions.manager.partner.contribution']
+        partner_contributions = {
+            (pc.partner_id.id, pc.contribution_type_id.id, pc.company_id.id): pc.id
+            for pc in PartnerContribution.search([
+                ('partner_id', 'in', self.partner_id.ids),
+                ('contribution_type_id', 'in', self.contribution_type_id.ids),
+                ('company_id', 'in', self.company_id.ids),
+            ])
+        }
+        movements = [
+            (partner_contributions[(rec.partner_id.id, rec.contribution_type_id.id, rec.company_id.id)],
+             rec.date, -self._balance_sign * rec.amount)
+            for rec in self
+        ]
+        reversals = self._reverse_accounting_moves(fields.Date.context_today(self))
+        self.env.cr.execute(f"""
+            UPDATE {self._table} AS t
+               SET reversal_move_id = v.reversal_move_id
+              FROM unnest(%s::int[], %s::int[]) AS v(id, reversal_move_id)
+             WHERE t.id = v.id
+        """, [self.ids, reversals.ids])
+        self.invalidate_recordset(['reversal_move_id'])
+        self.write({status_field: 'reversed'})
+        PartnerContribution._apply_balance_deltas(movements, flow='contribution' if self._balance_sign > 0 else 'withdrawal')
+        self._post_bulk_summary("Reversión")
+
+    def _reverse_accounting_moves(self, date):
+        """
+            Reverses the moves of the recordset and returns the reversing move of each record (same order).
+            Moves whose transactions are all reversed are cancelled with a single _reverse_moves call; consolidated
+            moves shared with transactions that stay registered get a counter-entry for the reversed lines only.
+        """
+        counts = dict(self._read_group([('move_id', 'in', self.move_id.ids)], ['move_id'], ['__count']))
+        records_by_move = self.grouped('move_id')
+        full_moves = self.env['account.move'].browse([
+            move.id for move, records in records_by_move.items() if counts[move] == len(records)
+        ])
+        partial_groups = [records for move, records in records_by_move.items() if counts[move] != len(records)]
+
+        reversal_by_move = {}
+        if full_moves:
+            reversals = full_moves._reverse_moves([
+                {'date': date, 'ref': f"Reversión de {move.ref or move.name}"} for move in full_moves
+            ], cancel=True)
+            reversal_by_move.update(zip(full_moves.ids, reversals.ids))
+        reversal_by_record = {}
+        if partial_groups:
+            counter_entries = self.env['account.move'].create([
+                records._prepare_consolidated_move_vals(reverse_date=date) for records in partial_groups
+            ])
+            counter_entries.action_post()
+            for records, move in zip(partial_groups, counter_entries):
+                reversal_by_record.update(dict.fromkeys(records.ids, move.id))
+        return self.env['account.move'].browse([
+            reversal_by_record.get(rec.id) or reversal_by_move[rec.move_id.id] for rec in self
+        ])
@@ -1,16 +1,28 @@
-from odoo import models, fields, api, _
+from collections import defaultdict
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
 
+from .profiling import profile_stage, profiled
+
+RESERVATION_FIELDS = ('partner_id', 'contribution_type_id', 'company_id', 'amount')
+
 
 class Withdrawal(models.Model):
     """
         DOCSTRING: Withdrawal model representing a monetary withdrawal from a partner’s contribution.
         Each record is a transaction that reduces the partner’s current contribution balance.
+        Confirming a withdrawal reserves its amount on the partner contribution until it is registered or cancelled.
     """
     _name = 'contributions.manager.withdrawal'
     _description = 'Partner Withdrawals'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'contributions.manager.registration.queue.mixin',
+                'contributions.manager.idempotency.mixin', 'contributions.manager.transaction.posting.mixin']
     _rec_name = 'display_name'
+    _registration_status_field = 'withdrawal_status'
+    _posting_label = 'Retiro'
+    _saving_side = 'debit'
+    _balance_sign = -1
 
     reference = fields.Char(string='Referencia', readonly=True, copy=False, default=lambda self: _('New'), tracking=True)
     partner_id = fields.Many2one('res.partner', string='Cliente / Asociado', required=True, tracking=True)
@@ -19,14 +31,32 @@ class Withdrawal(models.Model):
     date = fields.Date(string='Fecha del Retiro', default=fields.Date.context_today, required=True, tracking=True)
     internal_use = fields.Boolean( string='Uso Interno', tracking=True, help="Marque esta casilla si este retiro se utilizará como pago interno.")
     company_id = fields.Many2one('res.company', string='Empresa', required=True, default=lambda self: self.env.company, tracking=True)
-    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, copy=False)
+    move_id = fields.Many2one('account.move', string='Asiento de Registro', readonly=True, copy=False, index='btree_not_null')
     invoice_id = fields.Many2one('account.move', string='Factura Pagada', help="Factura del mismo cliente a la que se aplicará este retiro.")
     payment_id = fields.Many2one('account.payment', string='Pago Realizado', readonly=True, help="Pago generado con este retiro de uso interno.")
     internal_used = fields.Boolean(string='Retiro Usado Internamente', default=False, help="Indica si este retiro de uso interno ya fue aplicado a un pago. No puede volver a utilizarse.")
-    withdrawal_status = fields.Selection([('draft', 'Borrador'), ('confirmed', 'Confirmado'), ('registered', 'Contabilizado')], string='Estado', required=True, default='draft', readonly=True, tracking=True)
+    withdrawal_status = fields.Selection([('draft', 'Borrador'), ('confirmed', 'Confirmado'), ('registered', 'Contabilizado'), ('reversed', 'Reversado'), ('cancelled', 'Cancelado')], string='Estado', required=True, default='draft', readonly=True, tracking=True)
     display_name = fields.Char(string='Nombre para Mostrar', compute='_compute_display_name', store=False)
     allowed_contribution_type_ids = fields.Many2many('contributions.manager.contribution.type', string='Tipos de Contribución Permitidos', compute='_compute_allowed_contribution_types', store=False)
 
+    def init(self):
+        super().init()
+        tools.create_index(
+            self.env.cr, 'contributions_manager_withdrawal_partner_type_status_date_idx', self._table,
+            ['partner_id', 'contribution_type_id', 'withdrawal_status', 'date']
+        )
+        tools.create_index(
+            self.env.cr, 'contributions_manager_withdrawal_type_company_date_registered_idx', self._table,
+            ['contribution_type_id', 'company_id', 'date'], where="withdrawal_status = 'registered'"
+        )
+        # Payment register domain: only registered internal-use withdrawals not used yet.
+        tools.create_index(
+            self.env.cr, 'contributions_manager_withdrawal_internal_unused_idx', self._table,
+            ['partner_id'], where="internal_use AND NOT internal_used AND withdrawal_status = 'registered'"
+        )
+        # Keyset pagination of the export API.
+        tools.create_index(self.env.cr, 'contributions_manager_withdrawal_write_date_id_idx', self._table, ['write_date', 'id'])
+
     # Computed Methods
     @api.depends('partner_id', 'contribution_type_id', 'amount')
     def _compute_display_name(self):
@@ -36,33 +66,25 @@ class Withdrawal(models.Model):
             rec.display_name = f"Retiro: {partner} - {ctype} ({rec.amount:.2f})"
 
     @api.depends('partner_id')
+    @profiled('allowed_types')
     def _compute_allowed_contribution_types(self):
+        types_by_partner = self.env['contributions.manager.partner.contribution']._get_enabled_types_by_partner(self.partner_id.ids, withdrawal_only=True)
+        ContributionType = self.env['contributions.manager.contribution.type']
         for rec in self:
-            if rec.partner_id:
-                allowed_types = self.env['contributions.manager.partner.contribution'].search([
-                    ('partner_id', '=', rec.partner_id.id),
-                    ('enabled', '=', True),
-                    ('contribution_type_id.allow_withdrawal', '=', True)
-                ]).mapped('contribution_type_id')
-                rec.allowed_contribution_type_ids = allowed_types
-            else:
-                rec.allowed_contribution_type_ids = [(5, 0, 0)]
+            rec.allowed_contribution_type_ids = ContributionType.browse(types_by_partner.get(rec.partner_id.id, []))
 
     # Validations
     @api.constrains('partner_id', 'contribution_type_id', 'amount')
+    @profiled('constraints')
     def _check_withdrawal_validity(self):
-        for rec in self:
-            if rec.withdrawal_status in ('confirmed', 'registered'):
-                continue
+        to_check = self.filtered(lambda rec: rec.withdrawal_status not in ('confirmed', 'registered'))
+        for rec in to_check:
             if rec.amount <= 0:
                 raise ValidationError("El monto del retiro debe ser mayor que 0.")
 
-            partner_contribution = self.env['contributions.manager.partner.contribution'].search([
-                ('partner_id', '=', rec.partner_id.id),
-                ('contribution_type_id', '=', rec.contribution_type_id.id),
-                ('company_id', '=', rec.company_id.id),
-                ('enabled', '=', True)
-            ], limit=1)
+        partner_contributions = self.env['contributions.manager.partner.contribution']._get_active_partner_contributions(to_check)
+        for rec in to_check:
+            partner_contribution = partner_contributions.get((rec.partner_id.id, rec.contribution_type_id.id, rec.company_id.id))
 
             if not partner_contribution:
                 raise ValidationError("El asociado no tiene este tipo de contribución activa.")
@@ -70,71 +92,163 @@ class Withdrawal(models.Model):
             if not rec.contribution_type_id.allow_withdrawal:
                 raise ValidationError("El tipo de contribución no permite retiros.")
 
-            if rec.amount > partner_contribution.current_amount:
+            if rec.amount > partner_contribution.available_amount:
                 raise ValidationError(
-                    f"El monto del retiro ({rec.amount}) no puede superar el monto disponible ({partner_contribution.current_amount})."
+                    f"El monto del retiro ({rec.amount}) no puede superar el monto disponible ({partner_contribution.available_amount})."
                 )
 
     # Overrides
-    @api.model
-    def create(self, vals):
-        if vals.get('reference', _('New')) == _('New'):
-            vals['reference'] = self.env['ir.sequence'].next_by_code('contributions.manager.withdrawal') or _('New')
-        return super(Withdrawal, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        pending = [vals for vals in vals_list if vals.get('reference', _('New')) == _('New')]
+        if pending:
+            references = self.env['ir.sequence']._next_by_code_batch('contributions.manager.withdrawal', len(pending))
+            for vals, reference in zip(pending, references):
+                vals['reference'] = reference or _('New')
+        return super(Withdrawal, self).create(vals_list)
+
+    def write(self, vals):
+        # The reservation and the balance movements of a withdrawal are keyed on these fields: once it is
+        # confirmed, changing them would release or post an amount different from the one reserved.
+        locked = [name for name in RESERVATION_FIELDS if name in vals]
+        if locked:
+            for rec in self.filtered(lambda rec: rec.withdrawal_status != 'draft'):
+                changed = [
+                    name for name in locked
+                    if rec._fields[name].convert_to_write(rec[name], rec) != vals[name]
+                ]
+                if changed:
+                    raise ValidationError(
+                        f"No se puede modificar {', '.join(rec._fields[name].string for name in changed)} "
+                        f"del retiro {rec.reference}: solo se permite en borrador."
+                    )
+        return super().write(vals)
+
+    def _track_finalize(self):
+        tracked = self.env.cr.precommit.data.get(f'mail.tracking.{self._name}', {})
+        with profile_stage(self, 'tracking', len(tracked)):
+            return super()._track_finalize()
 
     def unlink(self):
-        raise ValidationError("No se puede eliminar un retiro registrado. Contacte a administración para reversas.")
+        raise ValidationError("No se puede eliminar un retiro. Utilice la reversión para anular retiros contabilizados.")
 
     # Status methods
+    @profiled('confirm')
     def action_confirm(self):
+        """
+            Confirms the whole batch at once: the amounts are reserved on the partner contributions with one
+            guarded UPDATE, so concurrent confirmations can never reserve more than the available amount.
+        """
         for rec in self:
             if rec.withdrawal_status != 'draft':
                 raise ValidationError("Solo se pueden confirmar retiros en estado borrador.")
-            rec.write({'withdrawal_status': 'confirmed'})
+        if not self:
+            return
+        records = self._bulk_records()
+        records._apply_reservations(1)
+        records.write({'withdrawal_status': 'confirmed'})
+        records._post_bulk_summary("Confirmación")
 
+    def action_cancel(self):
+        for rec in self:
+            if rec.withdrawal_status not in ('draft', 'confirmed'):
+                raise ValidationError("Solo se pueden cancelar retiros en borrador o confirmados.")
+        records = self._bulk_records()
+        confirmed = records.filtered(lambda rec: rec.withdrawal_status == 'confirmed')
+        if confirmed:
+            confirmed._apply_reservations(-1, confirmed._get_reservation_partner_contributions(active_only=False))
+        records.write({'withdrawal_status': 'cancelled', 'queue_state': False})
+        records._post_bulk_summary("Cancelación")
+
+    @profiled('register')
     def action_register(self):
         for rec in self:
             if rec.withdrawal_status != 'confirmed':
                 raise ValidationError("Solo se pueden contabilizar retiros confirmados.")
             if rec.move_id:
                 raise ValidationError("Este retiro ya fue contabilizado.")
-            move = rec._create_accounting_move()
-            partner_contribution = self.env['contributions.manager.partner.contribution'].search([
-                ('partner_id', '=', rec.partner_id.id),
-                ('contribution_type_id', '=', rec.contribution_type_id.id),
-                ('company_id', '=', rec.company_id.id),
-                ('enabled', '=', True)
-            ], limit=1)
+        if not self:
+            return
+        self = self._bulk_records()
+        # The amounts were reserved at confirmation: registering turns the reservation into a balance movement,
+        # so available_amount does not change and no pending withdrawal has to be scanned.
+        partner_contributions = self._get_reservation_partner_contributions()
+        movements = [(partner_contributions[rec.id], rec.date, -rec.amount) for rec in self]
+        moves, lines = self._create_accounting_moves()
+        self._set_move_links(moves, lines)
+        self._apply_reservations(-1, partner_contributions)
+        self.env['contributions.manager.partner.contribution']._apply_balance_deltas(movements, flow='withdrawal')
+        self.write({'withdrawal_status': 'registered'})
+        self._post_bulk_summary("Contabilización")
+
+    def action_reverse(self):
+        for rec in self:
+            if rec.internal_used:
+                raise ValidationError("No se puede reversar un retiro de uso interno ya aplicado a un pago.")
+        self._bulk_records()._reverse_transactions()
+
+    # Internal Methods
+    def _get_reservation_partner_contributions(self, active_only=True):
+        """
+            Returns {withdrawal_id: partner_contribution_id} for the partner contribution of each withdrawal, which
+            must be active unless active_only is False (releasing the reservation of a disabled one).
+        """
+        PartnerContribution = self.env['contributions.manager.partner.contribution']
+        if active_only:
+            partner_contributions = PartnerContribution._get_active_partner_contributions(self)
+        else:
+            partner_contributions = {
+                (pc.partner_id.id, pc.contribution_type_id.id, pc.company_id.id): pc
+                for pc in PartnerContribution.search([
+                    ('partner_id', 'in', self.partner_id.ids),
+                    ('contribution_type_id', 'in', self.contribution_type_id.ids),
+                    ('company_id', 'in', self.company_id.ids),
+                ])
+            }
+        result = {}
+        for rec in self:
+            partner_contribution = partner_contributions.get((rec.partner_id.id, rec.contribution_type_id.id, rec.company_id.id))
             if not partner_contribution:
                 raise ValidationError(
                     "No se encontró la relación activa entre el asociado y el tipo de contribución."
                 )
-            if rec.amount > partner_contribution.current_amount:
-                raise ValidationError(
-                    f"El monto del retiro ({rec.amount}) excede el saldo disponible ({partner_contribution.current_amount})."
-                )
-            partner_contribution.current_amount -= rec.amount
-            rec.write({
-                'move_id': move.id,
-                'withdrawal_status': 'registered'
-            })
+            result[rec.id] = partner_contribution.id
+        return result
+
+    def _apply_reservations(self, sign, partner_contributions=None):
+        """
+            Reserves (sign 1) or releases (sign -1) the amounts of the recordset on their partner contributions.
+        """
+        partner_contributions = partner_contributions or self._get_reservation_partner_contributions()
+        deltas = defaultdict(float)
+        for rec in self:
+            deltas[partner_contributions[rec.id]] += sign * rec.amount
+        self.env['contributions.manager.partner.contribution']._apply_reservation_deltas(deltas)
 
-    # Internal Methods
     def _create_accounting_move(self):
         self.ensure_one()
-        contrib_type = self.contribution_type_id
+        return self._create_accounting_moves()[0]
+
+    def _create_accounting_moves(self):
+        """
+            Creates and posts the accounting moves of the whole recordset at once.
+            Returns (moves, lines) in the same order as the records, see _post_accounting_moves.
+        """
+        for contrib_type in self.contribution_type_id:
+            if not contrib_type.journal:
+                raise ValidationError("No se ha definido un diario contable para este tipo de contribución.")
 
-        journal = contrib_type.journal
-        if not journal:
-            raise ValidationError("No se ha definido un diario contable para este tipo de contribución.")
+        return self._post_accounting_moves()
 
+    def _prepare_accounting_move_vals(self):
+        self.ensure_one()
+        contrib_type = self.contribution_type_id
         debit_account = contrib_type.saving_account
         credit_account = contrib_type.deposit_bank_account
-
-        move_vals = {
+        return {
             'ref': self.reference,
             'date': self.date,
-            'journal_id': journal.id,
+            'journal_id': contrib_type.journal.id,
             'company_id': self.company_id.id,
             'line_ids': [
                 (0, 0, {
@@ -153,16 +267,32 @@ class Withdrawal(models.Model):
                 })
             ]
         }
-        move = self.env['account.move'].create(move_vals)
-        move.action_post()
-        return move
 
     def mark_as_used(self, payment, invoice=None):
-        for rec in self:
-            if rec.internal_used:
-                raise ValidationError("Este retiro ya fue utilizado internamente y no puede volver a usarse.")
-            rec.write({
-                'internal_used': True,
-                'payment_id': payment.id,
-                'invoice_id': invoice.id if invoice else False,
-            })
\ No newline at end of file
+        self._mark_as_used_batch([(rec, payment, invoice) for rec in self])
+
+    @api.model
+    def _mark_as_used_batch(self, allocations):
+        """
+            Marks the withdrawals of allocations [(withdrawal, payment, invoice), ...] as used with one guarded UPDATE,
+            so a withdrawal taken meanwhile by another payment makes the whole batch fail, then links payments and
+            invoices with one write per (payment, invoice) pair.
+        """
+        withdrawals = self.browse([withdrawal.id for withdrawal, _payment, _invoice in allocations])
+        if not withdrawals:
+            return
+        withdrawals.flush_recordset(['internal_used'])
+        self.env.cr.execute(f"""
+            UPDATE {self._table}
+               SET internal_used = TRUE
+             WHERE id = ANY(%s) AND NOT internal_used
+         RETURNING id
+        """, [withdrawals.ids])
+        if len(self.env.cr.fetchall()) != len(withdrawals):
+            raise ValidationError("Este retiro ya fue utilizado internamente y no puede volver a usarse.")
+        withdrawals.invalidate_recordset(['internal_used'])
+        links = defaultdict(list)
+        for withdrawal, payment, invoice in allocations:
+            links[(payment.id, invoice.id if invoice else False)].append(withdrawal.id)
+        for (payment_id, invoice_id), ids in links.items():
+            self.browse(ids).write({'payment_id': payment_id, 'invoice_id': invoice_id})
@@ -0,0 +1,148 @@
+"""
+    DOCSTRING: Lookup benchmark for the tel_capp_csm indexes.
+
+    Seeds partner contributions and 1M transactions with set-based SQL, then times the module's hot lookups
+    without and with the composite/partial indexes declared in the models' init(). Everything runs inside
+    one transaction that is rolled back at the end, so the database is left untouched.
+
+    Usage (from an Odoo shell, where `env` is defined):
+        odoo-bin shell -d <database> --no-http < scripts/benchmark_lookups.py
+"""
+import random
+import time
+
+PARTNERS = 5000
+TRANSACTIONS = 1000000
+SAMPLES = 200
+
+MODULE_INDEXES = {
+    'contributions_manager_partner_contribution': [
+        ('contributions_manager_partner_contribution_type_company_enabled_idx',
+         '(contribution_type_id, company_id, partner_id) WHERE enabled'),
+    ],
+    'contributions_manager_contribution': [
+        ('contributions_manager_contribution_partner_type_status_date_idx',
+         '(partner_id, contribution_type_id, contribution_status, date)'),
+        ('contributions_manager_contribution_type_company_date_registered_idx',
+         "(contribution_type_id, company_id, date) WHERE contribution_status = 'registered'"),
+    ],
+    'contributions_manager_withdrawal': [
+        ('contributions_manager_withdrawal_partner_type_status_date_idx',
+         '(partner_id, contribution_type_id, withdrawal_status, date)'),
+        ('contributions_manager_withdrawal_type_company_date_registered_idx',
+         "(contribution_type_id, company_id, date) WHERE withdrawal_status = 'registered'"),
+        ('contributions_manager_withdrawal_internal_unused_idx',
+         "(partner_id) WHERE internal_use AND NOT internal_used AND withdrawal_status = 'registered'"),
+    ],
+}
+
+LOOKUPS = {
+    'partner_contribution': """
+        SELECT id FROM contributions_manager_partner_contribution
+         WHERE partner_id = %(partner_id)s AND contribution_type_id = %(type_id)s
+           AND company_id = %(company_id)s AND enabled
+    """,
+    'contribution_history': """
+        SELECT id, amount, date FROM contributions_manager_contribution
+         WHERE partner_id = %(partner_id)s AND contribution_type_id = %(type_id)s
+           AND contribution_status = 'registered'
+         ORDER BY date
+    """,
+    'withdrawal_history': """
+        SELECT id, amount, date FROM contributions_manager_withdrawal
+         WHERE partner_id = %(partner_id)s AND contribution_type_id = %(type_id)s
+           AND withdrawal_status = 'registered'
+         ORDER BY date
+    """,
+    'internal_withdrawals': """
+        SELECT id FROM contributions_manager_withdrawal
+         WHERE internal_use AND NOT internal_used AND withdrawal_status = 'registered'
+           AND partner_id = %(partner_id)s
+    """,
+}
+
+
+def seed(env):
+    cr = env.cr
+    company = env.company
+    account = env['account.account'].search([('company_ids', 'in', company.id)], limit=1)
+    journal = env['account.journal'].search([('company_id', '=', company.id)], limit=1)
+    contribution_type = env['contributions.manager.contribution.type'].create({
+        'contribution_name': f'Benchmark {time.time()}',
+        'interest_rate': 5.0,
+        'days_per_year': '365',
+        'calculation_method': 'DAV',
+        'capitalization_date': '1',
+        'deposit_bank_account': account.id,
+        'saving_account': account.id,
+        'interest_payment_account': account.id,
+        'journal': journal.id,
+    })
+    partner_ids = env['res.partner'].create([{'name': f'Benchmark Partner {i}'} for i in range(PARTNERS)]).ids
+    env.flush_all()
+    cr.execute("""
+        INSERT INTO contributions_manager_partner_contribution (partner_id, contribution_type_id, company_id, current_amount, enabled)
+        SELECT unnest(%s::int[]), %s, %s, 0.0, true
+    """, [partner_ids, contribution_type.id, company.id])
+    for table, status_column, extra_columns, extra_values in (
+        ('contributions_manager_contribution', 'contribution_status', '', ''),
+        ('contributions_manager_withdrawal', 'withdrawal_status', ', internal_use, internal_used', ', (g %% 50 = 0), (g %% 100 = 0)'),
+    ):
+        cr.execute(f"""
+            INSERT INTO {table} (reference, partner_id, contribution_type_id, company_id, amount, date, {status_column}{extra_columns})
+            SELECT 'BENCH-' || g,
+                   (%(partner_ids)s::int[])[1 + g %% %(partners)s],
+                   %(type_id)s, %(company_id)s, 10.0,
+                   DATE '2015-01-01' + (g %% 3650),
+                   (ARRAY['draft', 'confirmed', 'registered'])[1 + g %% 3]{extra_values}
+              FROM generate_series(1, %(count)s) AS g
+        """, {
+            'partner_ids': partner_ids, 'partners': PARTNERS, 'type_id': contribution_type.id,
+            'company_id': company.id, 'count': TRANSACTIONS // 2,
+        })
+    cr.execute("ANALYZE contributions_manager_partner_contribution")
+    cr.execute("ANALYZE contributions_manager_contribution")
+    cr.execute("ANALYZE contributions_manager_withdrawal")
+    return partner_ids, contribution_type.id, company.id
+
+
+def measure(cr, partner_ids, type_id, company_id):
+    rng = random.Random(42)
+    params = [
+        {'partner_id': rng.choice(partner_ids), 'type_id': type_id, 'company_id': company_id}
+        for _index in range(SAMPLES)
+    ]
+    results = {}
+    for name, query in LOOKUPS.items():
+        timings = []
+        for values in params:
+            start = time.perf_counter()
+            cr.execute(query, values)
+            cr.fetchall()
+            timings.append((time.perf_counter() - start) * 1000.0)
+        timings.sort()
+        results[name] = (timings[len(timings) // 2], timings[int(len(timings) * 0.95) - 1])
+    return results
+
+
+def run(env):
+    cr = env.cr
+    partner_ids, type_id, company_id = seed(env)
+    for table, indexes in MODULE_INDEXES.items():
+        for name, _definition in indexes:
+            cr.execute(f'DROP INDEX IF EXISTS "{name}"')
+    before = measure(cr, partner_ids, type_id, company_id)
+    for table, indexes in MODULE_INDEXES.items():
+        for name, definition in indexes:
+            cr.execute(f'CREATE INDEX "{name}" ON "{table}" {definition}')
+        cr.execute(f'ANALYZE "{table}"')
+    after = measure(cr, partner_ids, type_id, company_id)
+
+    print(f"{'lookup':<24}{'p50 before':>12}{'p95 before':>12}{'p50 after':>12}{'p95 after':>12}  (ms)")
+    for name in LOOKUPS:
+        print(f"{name:<24}{before[name][0]:>12.3f}{before[name][1]:>12.3f}{after[name][0]:>12.3f}{after[name][1]:>12.3f}")
+    cr.rollback()
+
+
+if 'env' in globals():
+    run(env)  # noqa: F821
@@ -0,0 +1,151 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+with open(os.path.join(os.path.dirname(__file__), 'perf_budgets.json')) as budgets_file:
+    PERF_BUDGETS = json.load(budgets_file)
+
+
+class ContributionsPerformanceCommon(AccountTestInvoicingCommon):
+    """
+        DOCSTRING: Shared fixture for the performance suite.
+        Seeds partners and partner contributions through the ORM and the bulk of the registered history
+        through set-based SQL, with the volumes recorded in perf_budgets.json.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        volumes = PERF_BUDGETS['volumes']
+        env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+
+        cls.contribution_types = env['contributions.manager.contribution.type'].create([{
+            'contribution_name': f'Ahorro Rendimiento {index}',
+            'interest_rate': 4.0,
+            'days_per_year': '365',
+            'calculation_method': 'DAV',
+            'capitalization_date': '1',
+            'deposit_bank_account': cls.company_data['default_journal_bank'].default_account_id.id,
+            'saving_account': cls.company_data['default_account_payable'].id,
+            'interest_payment_account': cls.company_data['default_account_expense'].id,
+            'journal': cls.company_data['default_journal_misc'].id,
+            'company_id': cls.env.company.id,
+        } for index in range(volumes['contribution_types'])])
+        cls.partners = env['res.partner'].create([
+            {'name': f'Socio Rendimiento {index}'} for index in range(volumes['partners'])
+        ])
+        cls.partner_contributions = env['contributions.manager.partner.contribution'].create([
+            {'partner_id': partner.id, 'contribution_type_id': contrib_type.id, 'company_id': cls.env.company.id}
+            for partner in cls.partners for contrib_type in cls.contribution_types
+        ]).with_env(cls.env)
+        cls._seed_history(volumes['contributions'], volumes['withdrawals'])
+
+    @classmethod
+    def _seed_history(cls, contributions, withdrawals):
+        cls.env.flush_all()
+        params = {
+            'pc_ids': cls.partner_contributions.ids,
+            'count': len(cls.partner_contributions),
+            'uid': cls.env.uid,
+        }
+        for table, status_field, prefix, amount, count in (
+            ('contributions_manager_contribution', 'contribution_status', 'PERF-C-', 100.0, contributions),
+            ('contributions_manager_withdrawal', 'withdrawal_status', 'PERF-W-', 10.0, withdrawals),
+        ):
+            cls.env.cr.execute(f"""
+                INSERT INTO {table} (reference, partner_id, contribution_type_id, company_id, amount, date,
+                                     {status_field}, create_uid, create_date, write_uid, write_date)
+                SELECT %(prefix)s || g, pc.partner_id, pc.contribution_type_id, pc.company_id, %(amount)s,
+                       CURRENT_DATE - 1 - (g %% 730), 'registered',
+                       %(uid)s, (now() at time zone 'UTC'), %(uid)s, (now() at time zone 'UTC')
+                  FROM generate_series(1, %(rows)s) AS g
+                  JOIN contributions_manager_partner_contribution pc
+                    ON pc.id = (%(pc_ids)s::int[])[1 + g %% %(count)s]
+            """, dict(params, prefix=prefix, amount=amount, rows=count))
+        cls.env.cr.execute("""
+            UPDATE contributions_manager_partner_contribution pc
+               SET current_amount = totals.amount
+              FROM (
+                    SELECT pc2.id, COALESCE(c.amount, 0.0) - COALESCE(w.amount, 0.0) AS amount
+                      FROM contributions_manager_partner_contribution pc2
+                      LEFT JOIN (SELECT partner_id, contribution_type_id, SUM(amount) AS amount
+                                   FROM contributions_manager_contribution
+                                  WHERE contribution_status = 'registered'
+                                  GROUP BY partner_id, contribution_type_id) c
+                        ON c.partner_id = pc2.partner_id AND c.contribution_type_id = pc2.contribution_type_id
+                      LEFT JOIN (SELECT partner_id, contribution_type_id, SUM(amount) AS amount
+                                   FROM contributions_manager_withdrawal
+                                  WHERE withdrawal_status = 'registered'
+                                  GROUP BY partner_id, contribution_type_id) w
+                        ON w.partner_id = pc2.partner_id AND w.contribution_type_id = pc2.contribution_type_id
+                     WHERE pc2.id = ANY(%(pc_ids)s)
+                   ) AS totals
+             WHERE pc.id = totals.id
+        """, params)
+        cls.env.cr.execute("ANALYZE contributions_manager_contribution")
+        cls.env.cr.execute("ANALYZE contributions_manager_withdrawal")
+        cls.env['contributions.manager.balance.snapshot']._rebuild_snapshots()
+        cls.env['contributions.manager.report.monthly']._rebuild_report()
+        cls.env['res.partner']._rebuild_savings_totals()
+        cls.env['contributions.manager.partner.contribution']._rebuild_reservations()
+        cls.env.invalidate_all()
+
+    # Helpers
+    def _new_transactions(self, model, count, confirmed=False):
+        """
+            Creates count draft transactions of model spread over distinct partner contributions.
+        """
+        partner_contributions = self.partner_contributions[:count]
+        records = self.env[model].create([{
+            'partner_id': pc.partner_id.id,
+            'contribution_type_id': pc.contribution_type_id.id,
+            'company_id': pc.company_id.id,
+            'amount': 1.0,
+        } for pc in partner_contributions])
+        if confirmed:
+            records.action_confirm()
+        self.env.flush_all()
+        return records
+
+    @contextmanager
+    def _measure(self):
+        """
+            Yields a dict filled with the number of queries and the wall time spent inside the block.
+        """
+        self.env.flush_all()
+        stats = {}
+        queries_before = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        yield stats
+        self.env.flush_all()
+        stats['seconds'] = time.perf_counter() - started
+        stats['queries'] = self.env.cr.sql_log_count - queries_before
+
+    def _assert_budget(self, name, stats, records):
+        """
+            Checks stats against the budgets of name. Every measure is logged, so a run of the suite gives the
+            figures the budgets are set from.
+        """
+        _logger.info(
+            "perf budget %s: records=%d queries=%d seconds=%s", name, records, stats['queries'],
+            f"{stats['seconds']:.3f}" if 'seconds' in stats else '-',
+        )
+        budget = PERF_BUDGETS['queries'].get(name)
+        if budget:
+            limit = budget['fixed'] + budget['per_record'] * records
+            self.assertLessEqual(
+                stats['queries'], limit,
+                f"{name}: {stats['queries']} queries for {records} record(s), budget is {limit}."
+            )
+        seconds = PERF_BUDGETS['seconds'].get(name)
+        if seconds:
+            self.assertLessEqual(
+                stats['seconds'], seconds,
+                f"{name}: took {stats['seconds']:.3f}s for {records} record(s), budget is {seconds}s."
+            )
@@ -0,0 +1,817 @@
+import base64
+import datetime
+import random
+import threading
+import time
+
+from dateutil.relativedelta import relativedelta
+from psycopg2 import errors
+
+from odoo import SUPERUSER_ID, Command, api, fields
+from odoo.exceptions import ValidationError
+from odoo.modules.registry import Registry
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase, get_db_name
+
+from odoo.addons.tel_capp_csm.models.profiling import PERF_SAMPLE_RATE_PARAM, PERF_STATE_KEY
+from odoo.addons.tel_capp_csm.models.transaction_posting import BULK_MODE_CONTEXT
+
+from .common import PERF_BUDGETS, ContributionsPerformanceCommon
+
+TRANSACTION_MODELS = (
+    ('contribution', 'contributions.manager.contribution'),
+    ('withdrawal', 'contributions.manager.withdrawal'),
+)
+
+
+@tagged('post_install', '-at_install', 'csm_perf')
+class TestContributionsPerformance(ContributionsPerformanceCommon):
+    """
+        DOCSTRING: Query-count and wall-clock budgets of the savings hot paths.
+        Every scenario runs on a single record and on a batch; both must stay within
+        fixed + per_record * len(batch) queries and within the time budget of perf_budgets.json.
+    """
+
+    def _run_scaled(self, name, model, method, confirmed):
+        for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+            records = self._new_transactions(model, size, confirmed=confirmed)
+            with self._measure() as stats:
+                getattr(records, method)()
+            self._assert_budget(name, stats, size)
+
+    def _sampled_queries(self, stage):
+        """
+            Returns the query count of the last sample of stage buffered on the cursor (sampling must be on).
+        """
+        rows = self.env.cr.precommit.data[PERF_STATE_KEY]['rows']
+        return next(queries for row_stage, _model, _count, queries, _duration in reversed(rows) if row_stage == stage)
+
+    def test_confirm(self):
+        for prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                counts = []
+                for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+                    records = self._new_transactions(model, size).with_context(contributions_bulk_summary=False, **BULK_MODE_CONTEXT)
+                    with self._measure() as stats:
+                        records.action_confirm()
+                    self._assert_budget(f'{prefix}_confirm', stats, size)
+                    counts.append(stats['queries'])
+                self.assertEqual(counts[0], counts[1], f"{model}.action_confirm query count depends on the number of records.")
+
+    def test_register(self):
+        """
+            action_register creates and posts one account.move per transaction (sequence numbering is per move),
+            so {prefix}_register budgets that cost per record. Everything else the module does is set-based: the
+            queries outside the 'accounting_moves' stage, read from the hot-path samples, must be the same for
+            1 and for batch_size records.
+        """
+        self.env['ir.config_parameter'].sudo().set_param(PERF_SAMPLE_RATE_PARAM, '1')
+        for prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                counts = []
+                for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+                    records = self._new_transactions(model, size, confirmed=True)
+                    # Same path for both sizes: bulk mode without the per-type summary messages.
+                    records = records.with_context(contributions_bulk_summary=False, **BULK_MODE_CONTEXT)
+                    with self._measure() as stats:
+                        records.action_register()
+                    self._assert_budget(f'{prefix}_register', stats, size)
+                    counts.append(stats['queries'] - self._sampled_queries('accounting_moves'))
+                self.assertEqual(counts[0], counts[1], f"{model}.action_register query count outside the moves depends on the number of records.")
+
+    def test_register_consolidated(self):
+        self.contribution_types.consolidated_posting = True
+        for prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                self._run_scaled(f'{prefix}_register_consolidated', model, 'action_register', confirmed=True)
+                records = self._new_transactions(model, PERF_BUDGETS['volumes']['batch_size'], confirmed=True)
+                records.action_register()
+                self.assertEqual(len(records.move_id), len(records.grouped(lambda rec: (rec.contribution_type_id, rec.date))))
+                for rec in records:
+                    self.assertEqual(rec.move_line_id.move_id, rec.move_id)
+                    self.assertEqual(rec.move_line_id.partner_id, rec.partner_id)
+                    self.assertAlmostEqual(abs(rec.move_line_id.balance), rec.amount, places=2)
+
+    def test_bulk_mode_tracking(self):
+        Message = self.env['mail.message']
+        for _prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                records = self._new_transactions(model, PERF_BUDGETS['volumes']['batch_size'], confirmed=True)
+                messages_before = Message.search_count([])
+                records.action_register()
+                self.env.flush_all()
+                self.env.cr.precommit.run()
+                self.assertLessEqual(
+                    Message.search_count([]) - messages_before, len(records.contribution_type_id),
+                    "Bulk registration posted more than one summary message per contribution type."
+                )
+
+                single = self._new_transactions(model, 1, confirmed=True)
+                pc = self.partner_contributions[0]
+                pc_messages = len(pc.message_ids)
+                single.action_register()
+                self.env.flush_all()
+                self.env.cr.precommit.run()
+                pc.invalidate_recordset(['message_ids'])
+                self.assertEqual(len(pc.message_ids), pc_messages + 1, "Single registration did not track current_amount.")
+
+    def test_reverse(self):
+        for prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+                    records = self._new_transactions(model, size, confirmed=True)
+                    partner_contributions = self.partner_contributions[:size]
+                    balances = {pc.id: pc.current_amount for pc in partner_contributions}
+                    records.action_register()
+                    with self._measure() as stats:
+                        records.action_reverse()
+                    self._assert_budget(f'{prefix}_reverse', stats, size)
+                    self.assertEqual(set(records.mapped(records._registration_status_field)), {'reversed'})
+                    self.assertTrue(all(records.mapped('reversal_move_id')))
+                    for pc in partner_contributions:
+                        self.assertAlmostEqual(pc.current_amount, balances[pc.id], places=2)
+
+    def test_reverse_monthly_report(self):
+        """
+            After a reversal the incrementally maintained monthly report matches a rebuild from the registered
+            history, which leaves reversed transactions out.
+        """
+        Report = self.env['contributions.manager.report.monthly']
+        partner_contributions = self.partner_contributions[:10]
+        for _prefix, model in TRANSACTION_MODELS:
+            records = self._new_transactions(model, len(partner_contributions), confirmed=True)
+            records.action_register()
+            records[:5].action_reverse()
+
+        def report_rows():
+            Report.invalidate_model()
+            return {
+                (row.partner_contribution_id.id, row.month): (
+                    round(row.inflow, 2), round(row.outflow, 2), round(row.closing_balance, 2)
+                )
+                for row in Report.search([('partner_contribution_id', 'in', partner_contributions.ids)])
+                # A month whose only movements were reversed keeps an empty row that the rebuild does not create.
+                if row.inflow or row.outflow
+            }
+
+        incremental = report_rows()
+        Report._rebuild_report()
+        self.assertEqual(incremental, report_rows())
+
+    def test_reverse_consolidated_partially(self):
+        self.contribution_types.consolidated_posting = True
+        records = self._new_transactions('contributions.manager.contribution', 10, confirmed=True)
+        records.action_register()
+        shared = records.filtered(lambda rec: rec.move_id == records[0].move_id)
+        self.assertGreater(len(shared), 1)
+        shared[0].action_reverse()
+        self.assertEqual(shared[0].contribution_status, 'reversed')
+        self.assertEqual(shared[0].move_id.state, 'posted')
+        self.assertAlmostEqual(abs(shared[0].reversal_move_id.amount_total), shared[0].amount, places=2)
+        self.assertEqual(set(shared[1:].mapped('contribution_status')), {'registered'})
+
+    def test_registration_queue(self):
+        for _prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                size = PERF_BUDGETS['volumes']['batch_size']
+                records = self._new_transactions(model, size, confirmed=True)
+                records.action_register_queued()
+                with self._measure() as stats:
+                    self.assertTrue(self.env[model]._process_registration_queue())
+                self._assert_budget('registration_queue', stats, size)
+                self.assertEqual(set(records.mapped('queue_state')), {'done'})
+                self.assertTrue(all(records.mapped('move_id')))
+
+    def test_registration_queue_manually_registered(self):
+        for _prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                records = self._new_transactions(model, 5, confirmed=True)
+                records.action_register_queued()
+                records[0].action_register()
+                self.assertTrue(self.env[model]._process_registration_queue())
+                self.assertEqual(set(records.mapped('queue_state')), {'done'})
+                self.assertFalse(any(records.mapped('queue_error')))
+                self.assertEqual(len(records.move_id), 5)
+
+    def test_validity_constraints(self):
+        for prefix, model, check in (
+            ('contribution', 'contributions.manager.contribution', '_check_partner_contribution_validity'),
+            ('withdrawal', 'contributions.manager.withdrawal', '_check_withdrawal_validity'),
+        ):
+            with self.subTest(model=model):
+                counts = []
+                for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+                    records = self._new_transactions(model, size)
+                    records.mapped('amount')
+                    with self._measure() as stats:
+                        getattr(records, check)()
+                    self._assert_budget(f'{prefix}_validity', stats, size)
+                    counts.append(stats['queries'])
+                self.assertEqual(counts[0], counts[1], f"{check} query count depends on the number of records.")
+
+    def test_allowed_type_computes(self):
+        for prefix, model in TRANSACTION_MODELS:
+            with self.subTest(model=model):
+                counts = []
+                for size in (1, PERF_BUDGETS['volumes']['batch_size']):
+                    records = self._new_transactions(model, size)
+                    records.mapped('partner_id')
+                    records.invalidate_recordset(['allowed_contribution_type_ids'])
+                    with self._measure() as stats:
+                        records.mapped('allowed_contribution_type_ids')
+                    self._assert_budget(f'{prefix}_allowed_types', stats, size)
+                    counts.append(stats['queries'])
+                self.assertEqual(counts[0], counts[1], f"{model} allowed types query count depends on the number of records.")
+
+    def _internal_withdrawal_invoices(self, count, date=None):
+        self.company_data['default_journal_bank'].internal_use = True
+        withdrawals = self._new_transactions('contributions.manager.withdrawal', count)
+        withdrawals.internal_use = True
+        if date:
+            withdrawals.date = date
+        withdrawals.action_confirm()
+        withdrawals.action_register()
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': withdrawal.partner_id.id,
+            'invoice_date': fields.Date.today(),
+            'invoice_line_ids': [Command.create({'name': 'Servicio', 'quantity': 1, 'price_unit': withdrawal.amount})],
+        } for withdrawal in withdrawals])
+        invoices.action_post()
+        return withdrawals, invoices
+
+    def test_payment_register_internal_withdrawal(self):
+        withdrawals, invoices = self._internal_withdrawal_invoices(1)
+        wizard = self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoices.ids
+        ).create({'journal_id': self.company_data['default_journal_bank'].id})
+        self.assertEqual(wizard.internal_withdrawal_ids, withdrawals)
+        with self._measure() as stats:
+            payments = wizard._create_payments()
+        self._assert_budget('payment_register_internal_withdrawal', stats, 1)
+        self.assertTrue(withdrawals.internal_used)
+        self.assertEqual(withdrawals.payment_id, payments)
+        self.assertEqual(withdrawals.invoice_id, invoices)
+
+    def test_payment_register_internal_withdrawals_batch(self):
+        size = PERF_BUDGETS['volumes']['payment_batch_size']
+        withdrawals, invoices = self._internal_withdrawal_invoices(size)
+        wizard = self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoices.ids
+        ).create({'journal_id': self.company_data['default_journal_bank'].id, 'group_payment': False})
+        self.assertEqual(wizard.internal_withdrawal_ids, withdrawals)
+        with self._measure() as stats:
+            payments = wizard._create_payments()
+        self._assert_budget('payment_register_internal_withdrawals_batch', stats, size)
+        self.assertEqual(len(payments), size)
+        self.assertTrue(all(withdrawals.mapped('internal_used')))
+        for withdrawal in withdrawals:
+            self.assertEqual(withdrawal.payment_id.partner_id, withdrawal.partner_id)
+            self.assertEqual(withdrawal.invoice_id.partner_id, withdrawal.partner_id)
+
+    def test_payment_register_internal_withdrawals_several_invoices(self):
+        """
+            With several invoices of one partner paid separately, each payment carries only the withdrawals
+            allocated to its invoice, capped at the invoice residual, and withdrawals the invoices do not need
+            stay unused. An invoice left without withdrawals cannot be paid on the internal-use journal.
+        """
+        self.company_data['default_journal_bank'].internal_use = True
+        pc = self.partner_contributions.filtered(lambda pc: pc.available_amount > 300.0)[0]
+        withdrawals = self.env['contributions.manager.withdrawal'].create([{
+            'partner_id': pc.partner_id.id,
+            'contribution_type_id': pc.contribution_type_id.id,
+            'company_id': pc.company_id.id,
+            'amount': 60.0,
+            'date': fields.Date.today() - datetime.timedelta(days=4 - index),
+            'internal_use': True,
+        } for index in range(4)])
+        withdrawals.action_confirm()
+        withdrawals.action_register()
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': pc.partner_id.id,
+            'invoice_date': fields.Date.today() - datetime.timedelta(days=2 - index),
+            'invoice_line_ids': [Command.create({'name': 'Servicio', 'quantity': 1, 'price_unit': price, 'tax_ids': [Command.clear()]})],
+        } for index, price in enumerate((100.0, 50.0))])
+        invoices.action_post()
+
+        wizard = self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoices.ids
+        ).create({'journal_id': self.company_data['default_journal_bank'].id, 'group_payment': False})
+        self.assertEqual(wizard.internal_withdrawal_ids, withdrawals[:3])
+        wizard.internal_withdrawal_ids = withdrawals[:2]
+        with self.assertRaises(ValidationError), self.env.cr.savepoint():
+            wizard._create_payments()
+        wizard.internal_withdrawal_ids = withdrawals[:3]
+        payments = wizard._create_payments()
+        self.assertEqual(len(payments), 2)
+        self.assertEqual(withdrawals.mapped('internal_used'), [True, True, True, False])
+        self.assertEqual(withdrawals[:2].invoice_id, invoices[0])
+        self.assertEqual(withdrawals[2].invoice_id, invoices[1])
+        self.assertEqual(len(withdrawals[:2].payment_id), 1)
+        self.assertNotEqual(withdrawals[0].payment_id, withdrawals[2].payment_id)
+        self.assertAlmostEqual(withdrawals[0].payment_id.amount, 100.0, places=2)
+        self.assertAlmostEqual(withdrawals[2].payment_id.amount, 50.0, places=2)
+        self.assertEqual(withdrawals[2].payment_id.internal_withdrawal_id, withdrawals[2])
+        self.assertFalse(withdrawals[3].payment_id)
+
+    def test_period_close(self):
+        today = fields.Date.today()
+        cutoff = today - datetime.timedelta(days=365)
+        self.partner_contributions.last_capitalization_date = today
+        used_withdrawal, invoice = self._internal_withdrawal_invoices(1, date=cutoff - datetime.timedelta(days=10))
+        payment = self.env['account.payment.register'].with_context(
+            active_model='account.move', active_ids=invoice.ids
+        ).create({'journal_id': self.company_data['default_journal_bank'].id})._create_payments()
+        Contribution = self.env['contributions.manager.contribution']
+        to_archive = Contribution.search_count([('contribution_status', '=', 'registered'), ('date', '<', cutoff)])
+        close = self.env['contributions.manager.period.close'].create({'cutoff_date': cutoff})
+        with self._measure() as stats:
+            close.action_close()
+        self._assert_budget('period_close', stats, to_archive)
+        self.assertEqual(close.state, 'done')
+        self.assertEqual(close.archived_contribution_count, to_archive)
+        self.assertFalse(Contribution.search_count([('contribution_status', '=', 'registered'), ('date', '<', cutoff)]))
+        # Used internal-use withdrawals keep their payment link instead of being archived.
+        self.assertTrue(used_withdrawal.exists())
+        self.assertEqual(payment.internal_withdrawal_id, used_withdrawal)
+        for opening in close.opening_balance_ids:
+            self.assertAlmostEqual(opening.balance, opening.partner_contribution_id.balance_at(opening.date), places=2)
+
+        reconciliation = self.env['contributions.manager.reconciliation'].create({'company_ids': [Command.set(self.env.company.ids)]})
+        reconciliation._run()
+        self.assertFalse(reconciliation.line_ids.filtered(lambda line: round(line.transactions_difference, 2)))
+
+        backdated = self._new_transactions('contributions.manager.contribution', 1, confirmed=True)
+        backdated.date = cutoff - datetime.timedelta(days=1)
+        with self.assertRaises(ValidationError):
+            backdated.action_register()
+
+    def test_interest_catch_up(self):
+        """
+            A cron that missed capitalization dates capitalizes every one of them, in order, on its next run.
+            A partner contribution never capitalized accrues one period only, and a manual run with nothing due
+            is rejected.
+        """
+        today = fields.Date.today()
+        contrib_type = self.contribution_types[0]
+        self.contribution_types[1:].interest_rate = 0.0
+        contrib_type.capitalization_date = str(min(today.day, 28))
+        partner_contributions = self.partner_contributions.filtered(lambda pc: pc.contribution_type_id == contrib_type)
+        partner_contributions[10:].enabled = False
+        partner_contributions = partner_contributions[:10]
+        missed = [(today - relativedelta(months=months)).replace(day=min(today.day, 28)) for months in (2, 1, 0)]
+        partner_contributions.last_capitalization_date = missed[0] - relativedelta(months=1)
+        partner_contributions[-1].last_capitalization_date = False
+        self.assertEqual(contrib_type._get_due_capitalization_dates(partner_contributions[0].last_capitalization_date, today), missed)
+
+        self.env['contributions.manager.contribution.type']._cron_capitalize_interest()
+        lines = self.env['contributions.manager.interest.line'].search([('partner_contribution_id', 'in', partner_contributions.ids)])
+        self.assertEqual(sorted(set(lines.mapped('date'))), missed)
+        self.assertEqual(set(partner_contributions.mapped('last_capitalization_date')), {missed[-1]})
+        first_line = lines.filtered(lambda line: line.partner_contribution_id == partner_contributions[-1]).sorted('date')[:1]
+        self.assertEqual(first_line.period_start, missed[0] - relativedelta(months=1))
+        self.env['contributions.manager.contribution.type']._cron_capitalize_interest()
+        self.assertEqual(self.env['contributions.manager.interest.line'].search_count([('partner_contribution_id', 'in', partner_contributions.ids)]), len(lines))
+        with self.assertRaises(ValidationError):
+            contrib_type.action_capitalize_interest()
+
+    def test_import_decimal_commas_and_progress(self):
+        Import = self.env['contributions.manager.contribution.import']
+        self.assertEqual(Import._parse_amount('1.234,56'), 1234.56)
+        self.assertEqual(Import._parse_amount('1,234.56'), 1234.56)
+        self.assertEqual(Import._parse_amount('1234,5'), 1234.5)
+        self.assertEqual(Import._parse_amount('1,234', ','), 1.234)
+        self.assertEqual(Import._parse_amount('1,234', '.'), 1234.0)
+        for value in ('1,234', '1.234', '12.34.56', '1.2345,6'):
+            with self.assertRaises(ValueError):
+                Import._parse_amount(value)
+
+        partner_contributions = self.partner_contributions[:3]
+        for pc in partner_contributions:
+            pc.partner_id.ref = f'NOMINA-{pc.partner_id.id}'
+        lines = ['socio;tipo;monto;fecha'] + [
+            f"{pc.partner_id.ref};{pc.contribution_type_id.contribution_name};1.234,56;{fields.Date.today()}"
+            for pc in partner_contributions
+        ] + ['DESCONOCIDO;Ahorro Rendimiento 0;10,00;']
+        wizard = Import.create({
+            'file': base64.b64encode('\n'.join(lines).encode()),
+            'filename': 'nomina.csv',
+            'chunk_size': 1,
+        })
+        wizard.action_import()
+        self.assertEqual(wizard.state, 'done')
+        self.assertEqual((wizard.imported_count, wizard.error_count, wizard.processed_row), (3, 1, 5))
+        imported = self.env['contributions.manager.contribution'].search([('partner_id', 'in', partner_contributions.partner_id.ids), ('amount', '=', 1234.56)])
+        self.assertEqual(len(imported), 3)
+
+        # An interrupted import resumes after the last committed row.
+        wizard.write({'state': 'in_progress', 'processed_row': 3})
+        wizard.action_import()
+        self.assertEqual(wizard.error_count, 2)
+        self.assertEqual(wizard.duplicate_count, 0)
+        self.assertEqual(wizard.imported_count, 4)
+
+    def test_reconciliation_shared_saving_account(self):
+        """
+            The fixture types share one saving account: the ledger is compared with the sum of the partner's
+            types on that account and flagged as shared, while repair still rewrites current_amount from the
+            transactions of the partner contribution.
+        """
+        partner = self.env['res.partner'].create({'name': 'Socio Conciliación'})
+        partner_contributions = self.env['contributions.manager.partner.contribution'].create([
+            {'partner_id': partner.id, 'contribution_type_id': contrib_type.id} for contrib_type in self.contribution_types
+        ])
+        contributions = self.env['contributions.manager.contribution'].create([{
+            'partner_id': partner.id,
+            'contribution_type_id': pc.contribution_type_id.id,
+            'amount': 10.0 * (index + 1),
+        } for index, pc in enumerate(partner_contributions)])
+        contributions.action_confirm()
+        contributions.action_register()
+
+        Reconciliation = self.env['contributions.manager.reconciliation']
+        reconciliation = Reconciliation.create({'company_ids': [Command.set(self.env.company.ids)]})
+        reconciliation._run()
+        self.assertFalse(reconciliation.line_ids.filtered(lambda line: line.partner_contribution_id in partner_contributions))
+
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE contributions_manager_partner_contribution SET current_amount = current_amount + 5 WHERE id = %s",
+            [partner_contributions[0].id],
+        )
+        partner_contributions.invalidate_recordset(['current_amount'])
+        reconciliation = Reconciliation.create({'company_ids': [Command.set(self.env.company.ids)], 'repair': True})
+        reconciliation._run()
+        line = reconciliation.line_ids.filtered(lambda line: line.partner_contribution_id == partner_contributions[0])
+        self.assertTrue(line.shared_account)
+        self.assertTrue(line.repaired)
+        self.assertAlmostEqual(line.transactions_difference, 5.0, places=2)
+        self.assertAlmostEqual(line.ledger_difference, 5.0, places=2)
+        self.assertAlmostEqual(partner_contributions[0].current_amount, 10.0, places=2)
+
+        reconciliation = Reconciliation.create({'company_ids': [Command.set(self.env.company.ids)]})
+        reconciliation._run()
+        self.assertFalse(reconciliation.line_ids.filtered(lambda line: line.partner_contribution_id in partner_contributions))
+
+    def test_statement_run_chunks(self):
+        """
+            Chunks page through the partners of the run by id until every partner has its statement.
+        """
+        today = fields.Date.today()
+        partners = self.partner_contributions.partner_id[:5]
+        run = self.env['contributions.manager.statement.run'].create({
+            'name': 'Estados de prueba',
+            'date_from': today.replace(day=1),
+            'date_to': today,
+            'partner_ids': [Command.set(partners.ids)],
+            'chunk_size': 2,
+        })
+        run.action_start()
+        self.assertEqual(run.total_count, len(partners))
+        self.assertEqual(run._get_partner_ids(after_id=sorted(partners.ids)[1], limit=2), sorted(partners.ids)[2:4])
+        run._cron_process_statement_runs()
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(run.processed_count, len(partners))
+        self.assertEqual(self.env['ir.attachment'].search_count([('description', '=', run._attachment_description())]), len(partners))
+
+    def test_standing_orders(self):
+        today = fields.Date.today()
+        partner_contributions = self.partner_contributions[:PERF_BUDGETS['volumes']['batch_size']]
+        orders = self.env['contributions.manager.standing.order'].create([{
+            'partner_contribution_id': pc.id,
+            'amount': 5.0,
+            'frequency': 'monthly',
+            'start_date': today,
+            'auto_process': 'confirm',
+        } for pc in partner_contributions])
+        with self._measure() as stats:
+            created = orders._generate_due_contributions(today)
+        self._assert_budget('standing_orders', stats, len(orders))
+        self.assertEqual(created, len(orders))
+        self.assertEqual(set(orders.contribution_ids.mapped('contribution_status')), {'confirmed'})
+        self.assertEqual(set(orders.mapped('next_date')), {today + relativedelta(months=1)})
+        self.assertEqual(orders._generate_due_contributions(today), 0)
+
+    def test_standing_orders_isolate_failures(self):
+        """
+            An order whose contribution fails validation keeps its error and does not stop the other orders.
+        """
+        today = fields.Date.today()
+        orders = self.env['contributions.manager.standing.order'].create([{
+            'partner_contribution_id': pc.id,
+            'amount': 5.0,
+            'start_date': today,
+        } for pc in self.partner_contributions[:10]])
+        self.env.flush_all()
+        self.env.cr.execute("UPDATE contributions_manager_standing_order SET amount = 0 WHERE id = %s", [orders[3].id])
+        orders.invalidate_recordset(['amount'])
+        self.assertEqual(orders._generate_due_contributions(today), len(orders) - 1)
+        self.assertTrue(orders[3].last_error)
+        self.assertFalse(orders[3].contribution_ids)
+        self.assertEqual(orders[3].next_date, today)
+        self.assertFalse(any((orders - orders[3]).mapped('last_error')))
+        self.assertEqual(set((orders - orders[3]).mapped('next_date')), {today + relativedelta(months=1)})
+
+    def test_partner_savings_totals(self):
+        """
+            The stored partner totals maintained by registrations and reversals must match a full rebuild.
+        """
+        batch_size = PERF_BUDGETS['volumes']['batch_size']
+        contributions = self._new_transactions('contributions.manager.contribution', batch_size, confirmed=True)
+        contributions.action_register()
+        self._new_transactions('contributions.manager.withdrawal', batch_size, confirmed=True).action_register()
+        contributions[:batch_size // 2].action_reverse()
+        partners = self.partner_contributions[:batch_size].partner_id
+        fields_names = ['savings_balance', 'last_contribution_date', 'savings_ytd_contributions', 'savings_ytd_withdrawals']
+        incremental = {partner.id: [partner[name] for name in fields_names] for partner in partners}
+        self.env['res.partner']._rebuild_savings_totals(partners.ids)
+        for partner in partners:
+            for name, value in zip(fields_names, incremental[partner.id]):
+                if name == 'last_contribution_date':
+                    self.assertEqual(partner[name], value)
+                else:
+                    self.assertAlmostEqual(partner[name], value, places=2)
+
+        with self._measure() as stats:
+            self.env['res.partner'].search([('savings_balance', '>', 0)], order='savings_balance desc', limit=80)
+        self._assert_budget('partner_savings_search', stats, 1)
+
+    def test_hot_path_sampling(self):
+        Stat = self.env['contributions.manager.perf.stat']
+        self.env['ir.config_parameter'].sudo().set_param('tel_capp_csm.perf_sample_rate', '1')
+        records = self._new_transactions('contributions.manager.contribution', PERF_BUDGETS['volumes']['batch_size'], confirmed=True)
+        records.action_register()
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+        stages = {stat.stage: stat for stat in Stat.search([('model', '=', records._name)])}
+        for stage in ('register', 'accounting_moves', 'post_moves'):
+            self.assertEqual(stages[stage].record_count, len(records))
+        self.assertIn('balances', {stat.stage for stat in Stat.search([])})
+        self.assertTrue(self.env['contributions.manager.perf.stat.report'].search_count([('stage', '=', 'register')]))
+
+        self.env['ir.config_parameter'].sudo().set_param('tel_capp_csm.perf_sample_rate', '0')
+        samples = Stat.search_count([])
+        self._new_transactions('contributions.manager.contribution', 10, confirmed=True).action_register()
+        self.env.cr.precommit.run()
+        self.assertEqual(Stat.search_count([]), samples)
+
+    def test_withdrawal_reservations(self):
+        Withdrawal = self.env['contributions.manager.withdrawal']
+        pc = self.partner_contributions.filtered(lambda pc: pc.available_amount > 1.0)[0]
+        half = round(pc.available_amount / 2 + 0.5, 2)
+        first, second = Withdrawal.create([{
+            'partner_id': pc.partner_id.id,
+            'contribution_type_id': pc.contribution_type_id.id,
+            'company_id': pc.company_id.id,
+            'amount': half,
+        } for _index in range(2)])
+        available = pc.available_amount
+        first.action_confirm()
+        self.assertAlmostEqual(pc.reserved_amount, half, places=2)
+        self.assertAlmostEqual(pc.available_amount, available - half, places=2)
+        with self.assertRaises(ValidationError):
+            second.action_confirm()
+        # A confirmed withdrawal keeps the amount it reserved, and a release cannot exceed the reservation.
+        with self.assertRaises(ValidationError):
+            first.amount = half / 2
+        with self.assertRaises(ValidationError):
+            pc._apply_reservation_deltas({pc.id: -(half + 1.0)})
+        self.assertAlmostEqual(pc.reserved_amount, half, places=2)
+        first.action_cancel()
+        self.assertAlmostEqual(pc.available_amount, available, places=2)
+        second.action_confirm()
+        current = pc.current_amount
+        second.action_register()
+        self.assertAlmostEqual(pc.reserved_amount, 0.0, places=2)
+        self.assertAlmostEqual(pc.current_amount, current - half, places=2)
+        self.assertAlmostEqual(pc.available_amount, available - half, places=2)
+
+    def test_idempotent_create(self):
+        Contribution = self.env['contributions.manager.contribution']
+        size = PERF_BUDGETS['volumes']['batch_size']
+        vals_list = [{
+            'partner_id': pc.partner_id.id,
+            'contribution_type_id': pc.contribution_type_id.id,
+            'company_id': pc.company_id.id,
+            'amount': 1.0,
+            'external_key': f'NOMINA-{pc.id}',
+        } for pc in self.partner_contributions[:size]]
+        records, created = Contribution._create_or_get(vals_list)
+        self.assertEqual(created, records)
+        self.assertEqual(len(created), size)
+        with self._measure() as stats:
+            retried, created_again = Contribution._create_or_get(vals_list + vals_list[:1])
+        self._assert_budget('idempotent_create_retry', stats, size)
+        self.assertFalse(created_again)
+        self.assertEqual(retried.ids, records.ids + records[:1].ids)
+
+    def test_interest_simulation(self):
+        contrib_type = self.contribution_types[0]
+        balances = {pc.id: pc.current_amount for pc in self.partner_contributions}
+        simulation = self.env['contributions.manager.interest.simulation'].create({
+            'contribution_type_id': contrib_type.id,
+            'rates': '3.5, 4, 5',
+            'days_per_year': '360',
+        })
+        with self._measure() as stats:
+            simulation.action_simulate()
+        self._assert_budget('interest_simulation', stats, 1)
+        self.assertEqual(simulation.member_count, len(self.partner_contributions.filtered(lambda pc: pc.contribution_type_id == contrib_type)))
+        self.assertEqual(len(simulation.scenario_ids), 4)
+        current = simulation.scenario_ids.filtered('is_current')
+        self.assertAlmostEqual(current.difference, 0.0, places=2)
+        totals = simulation.scenario_ids.filtered(lambda scenario: not scenario.is_current).sorted('interest_rate').mapped('total_interest')
+        self.assertEqual(totals, sorted(totals))
+        self.assertTrue(simulation.breakdown_file)
+        self.partner_contributions.invalidate_recordset(['current_amount'])
+        self.assertEqual({pc.id: pc.current_amount for pc in self.partner_contributions}, balances)
+
+        # The closed form must agree with the month-by-month projection.
+        month_rates = simulation._month_rates(4.0, 365)
+        members = [(1, 'A', '', 1000.0, 50.0)]
+        self.assertAlmostEqual(
+            simulation._project_interest(members, [(4.0, 365)])[0][0],
+            simulation._project_member(1000.0, 50.0, month_rates), places=6,
+        )
+
+    def test_monthly_report_closing_balance(self):
+        """
+            Closing balances are not summed when grouping (members without movements in a month have no row),
+            and the last row of each partner contribution matches the balance ledger at the end of its month.
+        """
+        Report = self.env['contributions.manager.report.monthly']
+        groups = Report.read_group([], ['closing_balance', 'net_flow'], ['month:month'], lazy=False)
+        self.assertTrue(groups)
+        self.assertTrue(all('closing_balance' not in group for group in groups))
+
+        partner_contributions = self.partner_contributions[:50]
+        last_rows = {}
+        for row in Report.search([('partner_contribution_id', 'in', partner_contributions.ids)], order='month'):
+            last_rows[row.partner_contribution_id] = row
+        for pc, row in last_rows.items():
+            month_end = row.month + relativedelta(months=1, days=-1)
+            self.assertAlmostEqual(row.closing_balance, pc.balance_at(month_end), places=2)
+
+    def test_dashboard_read_group(self):
+        with self._measure() as stats:
+            self.env['contributions.manager.partner.contribution'].read_group(
+                [], ['current_amount:sum'], ['partner_id', 'contribution_type_id'], lazy=False
+            )
+            self.env['contributions.manager.withdrawal'].read_group(
+                [], ['amount:sum'], ['date:month', 'contribution_type_id'], lazy=False
+            )
+            self.env['contributions.manager.report.monthly'].read_group(
+                [], ['inflow:sum', 'outflow:sum', 'net_flow:sum'], ['month:month', 'contribution_type_id'], lazy=False
+            )
+        self._assert_budget('dashboard_read_group', stats, 1)
+
+    def test_no_balance_drift(self):
+        """
+            Interleaved batches of registrars on the same partner contributions must leave current_amount,
+            the transaction totals and the balance ledger in agreement.
+        """
+        batch_size = PERF_BUDGETS['volumes']['batch_size']
+        for _round in range(4):
+            self._new_transactions('contributions.manager.contribution', batch_size, confirmed=True).action_register()
+            self._new_transactions('contributions.manager.withdrawal', batch_size, confirmed=True).action_register()
+        reconciliation = self.env['contributions.manager.reconciliation'].create({'company_ids': [Command.set(self.env.company.ids)]})
+        reconciliation._run()
+        drifted = reconciliation.line_ids.filtered(lambda line: round(line.transactions_difference, 2))
+        self.assertFalse(drifted, "current_amount drifted from the registered transactions.")
+        touched = self.partner_contributions[:batch_size]
+        ledger = touched.balances_at(fields.Date.today(), [('id', 'in', touched.ids)])
+        for pc in touched:
+            self.assertAlmostEqual(ledger[pc.id], pc.current_amount, places=2)
+
+
+@tagged('post_install', '-at_install', 'csm_perf')
+class TestConcurrentRegistration(BaseCase):
+    """
+        DOCSTRING: Concurrent registrars on committed data.
+        Several threads, each on its own cursor, register contribution and withdrawal batches against the same
+        partner contributions (in different orders) and commit. Serialization failures are retried as the RPC
+        layer does; a deadlock fails the test. The fixture is committed, so it is deleted with SQL afterwards.
+    """
+    registrars = 4
+    batches = 3
+    partner_count = 20
+    max_tries = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.registry = Registry(get_db_name())
+        cls.addClassCleanup(cls._delete_fixture)
+        with cls.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {'tracking_disable': True})
+            accounts = env['account.account'].create([
+                {'name': 'Banco Ahorros Concurrencia', 'code': '1CSMC', 'account_type': 'asset_cash'},
+                {'name': 'Ahorros Concurrencia', 'code': '2CSMC', 'account_type': 'liability_payable', 'reconcile': True},
+                {'name': 'Intereses Concurrencia', 'code': '5CSMC', 'account_type': 'expense'},
+            ])
+            journal = env['account.journal'].create({'name': 'Ahorros Concurrencia', 'code': 'CSMC', 'type': 'general'})
+            contrib_type = env['contributions.manager.contribution.type'].create({
+                'contribution_name': 'Ahorro Concurrencia',
+                'interest_rate': 4.0,
+                'days_per_year': '365',
+                'calculation_method': 'DAV',
+                'capitalization_date': '1',
+                'deposit_bank_account': accounts[0].id,
+                'saving_account': accounts[1].id,
+                'interest_payment_account': accounts[2].id,
+                'journal': journal.id,
+            })
+            partners = env['res.partner'].create([{'name': f'Socio Concurrencia {index}'} for index in range(cls.partner_count)])
+            cls.account_ids, cls.journal_id, cls.type_id, cls.partner_ids = accounts.ids, journal.id, contrib_type.id, partners.ids
+            cls.pc_ids = env['contributions.manager.partner.contribution'].create([
+                {'partner_id': partner.id, 'contribution_type_id': contrib_type.id} for partner in partners
+            ]).ids
+            opening = cls._create_transactions(env, 'contributions.manager.contribution', 1000.0)
+            opening.action_register()
+
+            # One contribution batch and one withdrawal batch per registrar and round, each over every partner
+            # contribution in its own order, so the batches overlap on every row.
+            cls.jobs = []
+            for _index in range(cls.registrars * cls.batches):
+                contributions = cls._create_transactions(env, 'contributions.manager.contribution', 10.0)
+                withdrawals = cls._create_transactions(env, 'contributions.manager.withdrawal', 7.0)
+                cls.jobs.append([(contributions._name, contributions.ids), (withdrawals._name, withdrawals.ids)])
+
+    @classmethod
+    def _create_transactions(cls, env, model, amount):
+        partners = env['res.partner'].browse(random.sample(cls.partner_ids, len(cls.partner_ids)))
+        records = env[model].create([{
+            'partner_id': partner.id,
+            'contribution_type_id': cls.type_id,
+            'amount': amount,
+        } for partner in partners])
+        records.action_confirm()
+        return records
+
+    @classmethod
+    def _delete_fixture(cls):
+        if not getattr(cls, 'type_id', None):
+            return
+        with cls.registry.cursor() as cr:
+            for query in (
+                "DELETE FROM contributions_manager_contribution WHERE contribution_type_id = %(type_id)s",
+                "DELETE FROM contributions_manager_withdrawal WHERE contribution_type_id = %(type_id)s",
+                "DELETE FROM account_move WHERE journal_id = %(journal_id)s",
+                "DELETE FROM contributions_manager_partner_contribution WHERE contribution_type_id = %(type_id)s",
+                "DELETE FROM contributions_manager_contribution_type WHERE id = %(type_id)s",
+                "DELETE FROM res_partner WHERE id = ANY(%(partner_ids)s)",
+                "DELETE FROM account_journal WHERE id = %(journal_id)s",
+                "DELETE FROM account_account WHERE id = ANY(%(account_ids)s)",
+            ):
+                cr.execute(query, {
+                    'type_id': cls.type_id, 'journal_id': cls.journal_id,
+                    'partner_ids': cls.partner_ids, 'account_ids': cls.account_ids,
+                })
+
+    def _register(self, jobs, failures):
+        for model, ids in jobs:
+            for attempt in range(1, self.max_tries + 1):
+                try:
+                    with self.registry.cursor() as cr:
+                        api.Environment(cr, SUPERUSER_ID, {})[model].browse(ids).action_register()
+                    break
+                except (errors.SerializationFailure, errors.LockNotAvailable):
+                    if attempt == self.max_tries:
+                        failures.append(f"{model} {ids[:3]}...: still conflicting after {attempt} tries.")
+                        return
+                    time.sleep(random.uniform(0.0, 0.05 * attempt))
+                except Exception as exc:
+                    failures.append(f"{model} {ids[:3]}...: {exc!r}")
+                    return
+
+    def test_concurrent_registrars(self):
+        failures = []
+        threads = [
+            threading.Thread(target=self._register, args=(
+                [job for jobs in self.jobs[index::self.registrars] for job in jobs], failures,
+            ))
+            for index in range(self.registrars)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(failures, "Concurrent registrations failed (a DeadlockDetected here means rows were locked out of order).")
+
+        with self.registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            partner_contributions = env['contributions.manager.partner.contribution'].browse(self.pc_ids)
+            ledger = partner_contributions.balances_at(fields.Date.today(), [('id', 'in', self.pc_ids)])
+            expected = 1000.0 + self.registrars * self.batches * (10.0 - 7.0)
+            for pc in partner_contributions:
+                self.assertAlmostEqual(pc.current_amount, expected, places=2)
+                self.assertAlmostEqual(ledger[pc.id], pc.current_amount, places=2)
+                self.assertAlmostEqual(pc.reserved_amount, 0.0, places=2)
+            for model, status_field in (
+                ('contributions.manager.contribution', 'contribution_status'),
+                ('contributions.manager.withdrawal', 'withdrawal_status'),
+            ):
+                self.assertFalse(env[model].search_count([
+                    ('contribution_type_id', '=', self.type_id), (status_field, '!=', 'registered'),
+                ]))